@@ -1,38 +1,70 @@
+# Startup clock first, so the report covers the imports below
+from startup import startup
+
 import sys
-import win32pipe
-import win32file
-import json
+import argparse
+import asyncio
 import csv
 import os
-
-from collections import Counter
-from knn_detection import load_knn_model, predict_from_sensors
-
-# ========================= Audio model config =================================
+import signal
+
+# Only what the sensor / KNN path needs is imported here. The audio
+# subsystem (librosa, scipy, sounddevice, the audio model) is imported by
+# the audio process (or thread), which starts once sensor clients can connect.
+from audio_process import N_MFCC, AudioSlot, AudioSupervisor, run_audio
+from kalman import CHANNEL_PARAMS, DEFAULT_CHANNELS, SensorFilter
+from ingest_queue import QUEUE_POLICIES, QUEUE_SIZE, ReadingQueue
+from knn_detection import get_knn_model
+from metrics import metrics, serve_metrics, start_summary
+from recognition import SensorPipeline, decode_sensor_message, knn_inputs
+from sensor_logger import SensorLogger
+from shards import ShardPool
+from transport import TransportClosed, default_transport, serve_streams
+from voting import VOTE_WINDOW, add_voting_arguments, voting_options
+
+# ========================= Audio =============================================
+# Audio model and window config live in audio_process.py
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import sounddevice as sd
-import librosa
-import joblib
-
-AUDIO_MODEL_PATH = "./ml_sound/sound_model.pkl"     # your audio RF model
-WINDOW_SECONDS = 3.0                     # length of each audio window in seconds
-SAMPLE_RATE = 16000                      # must match training
-N_MFCC = 20
-CONF_THRESHOLD = 0.6                     # if max probability < threshold -> treat as Unknown
-
-# Shared variables between audio thread and main thread
-audio_label = None
-audio_confidence = 0.0
-audio_lock = threading.Lock()
 
-# ===== Kalman Filter for distance =====
-kf_x = 800.0       # initial guess (mm)
-kf_P = 500.0       # initial uncertainty
-kf_Q = 50.0        # process noise
-kf_R = 300.0       # measurement noise
-kf_threshold = 600 # outlier threshold (mm)
+AUDIO_STALE_SECONDS = 10.0               # older audio results are not shown
+
+# Latest audio result (audio_process.AudioSlot), written by the audio
+# process or thread; None with --audio off
+audio_slot = None
+audio_supervisor = None
+audio_windows_collected = 0     # audio windows whose timings are in the metrics
+
+# Peers (transport.serve_streams receive.peer) whose client disconnected
+# and has not come back yet
+disconnected_peers = set()
+
+# ========================= Metrics (metrics.py) ===============================
+STAGE_HELP = "Seconds per batch (usually one reading) spent in each sensor pipeline stage"
+RECEIVE_TIME = metrics.histogram("sensor_stage_seconds", STAGE_HELP, stage="receive")
+DECODE_TIME = metrics.histogram("sensor_stage_seconds", STAGE_HELP, stage="decode")
+LOG_TIME = metrics.histogram("sensor_stage_seconds", STAGE_HELP, stage="log")
+FILTER_TIME = metrics.histogram("sensor_stage_seconds", STAGE_HELP, stage="filter")
+QUEUE_WAIT = metrics.histogram("sensor_stage_seconds", STAGE_HELP, stage="queue")
+KNN_TIME = metrics.histogram("sensor_stage_seconds", STAGE_HELP, stage="knn")
+VOTE_TIME = metrics.histogram("sensor_stage_seconds", STAGE_HELP, stage="vote")
+OUTPUT_TIME = metrics.histogram("sensor_stage_seconds", STAGE_HELP, stage="output")
+MESSAGES = metrics.counter("sensor_messages_total", "Sensor messages received")
+DECODE_FAILURES = metrics.counter("sensor_decode_failures_total", "Messages skipped as undecodable or invalid readings")
+CONNECTIONS = metrics.counter("sensor_connections_total", "Sensor clients connected")
+RECONNECTS = metrics.counter("sensor_reconnects_total",
+                             "Sensor clients connected from a peer (TCP host, socket or pipe) whose client had disconnected")
+DISCONNECTS = metrics.counter("sensor_disconnects_total", "Sensor clients disconnected")
+DROPPED = metrics.counter("sensor_dropped_total", "Readings dropped by the drop-oldest queue policy")
+COALESCED = metrics.counter("sensor_coalesced_total", "Readings replaced by a newer one by the latest queue policy")
+QUEUE_DEPTH = metrics.gauge("sensor_queue_depth", "Readings waiting for KNN, all streams")
+AUDIO_HELP = "Seconds per audio window spent in each audio stage"
+AUDIO_FEATURE_TIME = metrics.histogram("audio_stage_seconds", AUDIO_HELP, stage="features")
+AUDIO_PREDICT_TIME = metrics.histogram("audio_stage_seconds", AUDIO_HELP, stage="predict")
+AUDIO_WINDOWS = metrics.counter("audio_windows_total", "Audio windows classified")
+AUDIO_RESTARTS = metrics.counter("audio_restarts_total", "Audio process restarts")
 
 
 def extract_features_from_raw(y: np.ndarray, sr: int) -> np.ndarray:
@@ -40,6 +72,8 @@ def extract_features_from_raw(y: np.ndarray, sr: int) -> np.ndarray:
     Extract MFCC-based features from a raw audio array.
     This matches the preprocessing used in realtime_pred.py.
     """
+    import librosa
+
     # Ensure mono 1D
     if y.ndim > 1:
         y = y[:, 0]
@@ -59,68 +93,6 @@ def extract_features_from_raw(y: np.ndarray, sr: int) -> np.ndarray:
     return features
 
 
-def audio_detection_thread():
-    """
-    Background thread that continuously listens to the microphone
-    and updates the global audio_label / audio_confidence.
-    Logic is adapted from realtime_pred.main().
-    """
-    global audio_label, audio_confidence
-
-    try:
-        model_obj = joblib.load(AUDIO_MODEL_PATH)
-    except Exception as e:
-        print(f"[AUDIO] Failed to load {AUDIO_MODEL_PATH}: {e}")
-        return
-
-    rf = model_obj["rf"]
-    le = model_obj["label_encoder"]
-    sr_model = model_obj.get("sample_rate", SAMPLE_RATE)
-
-    if sr_model != SAMPLE_RATE:
-        print(f"[AUDIO] Warning: model sample_rate={sr_model}, but using {SAMPLE_RATE}")
-
-    print("=== Audio thread: real-time cooking sound detection started ===")
-
-    try:
-        while True:
-            # Record one audio window
-            frames = int(WINDOW_SECONDS * SAMPLE_RATE)
-            audio = sd.rec(
-                frames,
-                samplerate=SAMPLE_RATE,
-                channels=1,
-                dtype="float32"
-            )
-            sd.wait()  # wait until recording is finished
-
-            y = audio.squeeze()
-            feat = extract_features_from_raw(y, SAMPLE_RATE).reshape(1, -1)
-
-            # Predict probabilities with RF
-            proba = rf.predict_proba(feat)[0]
-            pred_idx = int(np.argmax(proba))
-            confidence = float(proba[pred_idx])
-
-            pred_label = le.inverse_transform([pred_idx])[0]
-            timestamp = time.strftime("%H:%M:%S")
-
-            if confidence < CONF_THRESHOLD:
-                display_label = "Unknown / silence"
-            else:
-                display_label = pred_label
-
-            # Update shared variables
-            with audio_lock:
-                audio_label = display_label
-                audio_confidence = confidence
-
-            # Optional: print audio-only prediction stream
-            # print(f"[AUDIO {timestamp}] {display_label} (p={confidence:.2f})")
-
-    except KeyboardInterrupt:
-        print("\n[AUDIO] Stopped audio thread.")
-
 # ==============================================================================
 
 
@@ -167,132 +139,439 @@ def print_sensor_data(sensor_data):
     print(f"Time of Flight: {sensor_data['time_of_flight']} ns")
 
 
-def receive(named_pipe, pipe_buffer):
-    result, data = win32file.ReadFile(named_pipe, pipe_buffer)
-    if result == 0:
-        # decode bytes into string
-        message = data.decode('utf-8').rstrip('\x00')
-        return message
-    return None
+def print_vote(stream_id, vote):
+    """
+    Print a 5-reading vote and, when cooking, the latest audio prediction.
+    """
+    current_status, counts = vote
+    print(f"[5-sec vote] [{stream_id}] Final Status = {current_status}  |  Votes = {dict(counts)}")
+
+    # ---- only when cooking, also show audio model result ----
+    if current_status and "cooking," in current_status.lower():
+        # Never blocks: a copy of the latest result from shared memory
+        latest = audio_slot.read() if audio_slot is not None else None
+        local_audio_label = local_audio_conf = None
+        if latest is not None and time.time() - latest[2] <= AUDIO_STALE_SECONDS:
+            local_audio_label, local_audio_conf = latest[0], latest[1]
+
+        if local_audio_label is not None:
+            print(f"[COMBINED] [{stream_id}] Status={current_status} | "
+                f"Cooking sound={local_audio_label} (p={local_audio_conf:.2f})")
+        else:
+            print(f"[COMBINED] [{stream_id}] Status={current_status} | Cooking sound=No audio prediction yet")
+
+
+def skip_reading(stream_id, error, data):
+    """
+    A message or reading that cannot be used: count it, show it, go on.
+    """
+    DECODE_FAILURES.inc()
+    print(f"[{stream_id}] Skipping bad reading ({error!r}). Raw message:", data)
+
+
+async def classify_and_vote(stream_id, readings, timestamps, pipeline, executor, shard_pool=None):
+    """
+    KNN and voting for a list of readings of one stream. timestamps:
+    time.monotonic() when each reading was received, for time-based votes.
+
+    Returns:
+        labels, confidences, votes (one entry per reading)
+    """
+    if shard_pool is not None:
+        # KNN and voting both run in the worker, which times them
+        labels, confs, votes, knn_seconds, vote_seconds = await shard_pool.process(stream_id, readings, timestamps)
+        KNN_TIME.observe(knn_seconds)
+        VOTE_TIME.observe(vote_seconds)
+        return labels, confs, votes
+
+    clock = time.perf_counter
+    t0 = clock()
+
+    # All readings of this batch in one vectorized KNN call, off the event loop
+    loop = asyncio.get_running_loop()
+    labels, confs = await loop.run_in_executor(executor, pipeline.classify_batch, readings)
+    t1 = clock()
+    KNN_TIME.observe(t1 - t0)
+    # ====== Every 5 readings → voting ======
+    votes = [pipeline.vote(label, conf, timestamp)
+             for label, conf, timestamp in zip(labels, confs, timestamps)]
+    VOTE_TIME.observe(clock() - t1)
+    return labels, confs, votes
+
+
+async def process_stream(stream_id, queue, pipeline, executor, shard_pool=None):
+    """
+    Processing side of a stream: KNN, voting and output for the readings
+    taken from its queue, until the queue is closed and empty.
+    """
+    clock = time.perf_counter
+
+    while True:
+        batch = await queue.get_batch()
+        if not batch:
+            return
+        QUEUE_WAIT.observe(clock() - batch[0][0])
+        timestamps = [received for _, received, _ in batch]
+        readings = [sensor_data for _, _, sensor_data in batch]
+
+        try:
+            labels, confs, votes = await classify_and_vote(stream_id, readings, timestamps, pipeline,
+                                                           executor, shard_pool)
+        except Exception:
+            # Classify one by one, so only the reading at fault is lost
+            labels, confs, votes = [], [], []
+            for sensor_data, timestamp in zip(readings, timestamps):
+                try:
+                    result = await classify_and_vote(stream_id, [sensor_data], [timestamp], pipeline,
+                                                     executor, shard_pool)
+                except Exception as e:
+                    skip_reading(stream_id, e, sensor_data)
+                    continue
+                for results, values in zip((labels, confs, votes), result):
+                    results.extend(values)
+        t3 = clock()
+
+        for label, conf, vote in zip(labels, confs, votes):
+            # print(f"[1-sec KNN] [{stream_id}] {label} (conf={conf:.2f})")
+            if vote is not None:
+                print_vote(stream_id, vote)
+            print("-" * 50)
+        OUTPUT_TIME.observe(clock() - t3)
+
+
+async def handle_stream(stream_id, receive, knn_model, executor, sensor_logger=None, shard_pool=None,
+                        kalman_channels=None, vote_window=VOTE_WINDOW, voting=None,
+                        queue_size=QUEUE_SIZE, queue_policy="block"):
+    """
+    Serve one connected sensor: decode its messages, run KNN on the shared
+    model in the executor and vote with this stream's own voting state.
+    With a shard_pool, KNN and voting run in the stream's worker process.
+    kalman_channels: channels to Kalman filter before KNN (None = off).
+    vote_window, voting: voting window options (see voting.VotingEngine).
+
+    Receiving (receive, decode, log, filter) runs here; KNN, voting and
+    output run in process_stream(), behind a ReadingQueue of queue_size
+    readings with queue_policy (see ingest_queue.py) for when it falls behind.
+    """
+    print(f"Connected to sensor client ({stream_id})")
+    CONNECTIONS.inc()
+    peer = getattr(receive, "peer", stream_id)
+    if peer in disconnected_peers:
+        disconnected_peers.discard(peer)
+        RECONNECTS.inc()
+    clock = time.perf_counter
+
+    # Kalman filter + KNN + 5-second voting, one per stream
+    sensor_filter = SensorFilter(kalman_channels) if kalman_channels else None
+    pipeline = SensorPipeline(knn_model, vote_window, **(voting or {}))
+    queue = ReadingQueue(queue_size, queue_policy, dropped=DROPPED, coalesced=COALESCED, depth=QUEUE_DEPTH)
+    processor = asyncio.ensure_future(process_stream(stream_id, queue, pipeline, executor, shard_pool))
+    # a failed processor must not leave the receiver waiting for room
+    processor.add_done_callback(lambda _: queue.close())
+
+    try:
+        while not processor.done():
+            t0 = clock()
+            messages = await receive()
+            t1 = clock()
+            # votes use the arrival time, not when KNN gets to the reading
+            received = time.monotonic()
+            RECEIVE_TIME.observe(t1 - t0)
+            MESSAGES.inc(len(messages))
+
+            decoded = []
+            for data in messages:
+                try:
+                    # load json data
+                    sensor_data = decode_sensor_message(data)
+                    # a reading without usable KNN inputs never reaches the queue
+                    knn_inputs(sensor_data)
+                except Exception as e:
+                    skip_reading(stream_id, e, data)
+                    continue
+                decoded.append(sensor_data)
+            t2 = clock()
+            DECODE_TIME.observe(t2 - t1)
+
+            #print_sensor_data(sensor_data)
+            if sensor_logger is not None:
+                # every reading is logged, also those the queue drops later
+                for sensor_data in decoded:
+                    sensor_logger.log(sensor_data)
+                t3 = clock()
+                LOG_TIME.observe(t3 - t2)
+                t2 = t3
+            if sensor_filter is not None:
+                # Kalman filtered distance (and gas / humidity) for KNN; raw values are logged
+                filtered = []
+                for sensor_data in decoded:
+                    try:
+                        filtered.append(sensor_filter.filter(sensor_data))
+                    except Exception as e:
+                        skip_reading(stream_id, e, sensor_data)
+                decoded = filtered
+                FILTER_TIME.observe(clock() - t2)
+
+            for sensor_data in decoded:
+                await queue.put((clock(), received, sensor_data))
+    except TransportClosed:
+        DISCONNECTS.inc()
+        disconnected_peers.add(peer)
+        print(f"Sensor client {stream_id} disconnected")
+    finally:
+        # process what was received, then stop
+        queue.close()
+        try:
+            await processor
+        finally:
+            if queue.dropped or queue.coalesced:
+                print(f"Sensor client {stream_id}: {queue.dropped} readings dropped, "
+                      f"{queue.coalesced} coalesced by the {queue_policy} queue policy")
+            if shard_pool is not None:
+                shard_pool.close_stream(stream_id)
+
+
+async def serve(args, knn_model, sensor_logger, shard_pool=None, on_ready=None):
+    """
+    Accept any number of sensor clients; every stream gets its own task and
+    voting state, all of them share knn_model and one inference executor
+    (or are sharded across the worker processes of shard_pool).
+    on_ready() runs once clients can connect.
+    """
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        async def on_stream(stream_id, receive):
+            await handle_stream(stream_id, receive, knn_model, executor, sensor_logger, shard_pool,
+                                args.kalman, args.vote_window, voting_options(args),
+                                args.queue_size, args.queue_policy)
+
+        print("Waiting for connections...")
+        await serve_streams(args.transport, args.address, on_stream, on_ready)
+
+
+def run_until_interrupted(coro):
+    """
+    asyncio.run(coro), except that Ctrl-C cancels coro instead of raising
+    KeyboardInterrupt wherever the loop happens to be (possibly in asyncio's
+    own cleanup). Later Ctrl-Cs are ignored, so the shutdown that follows
+    is not cut short.
+
+    Returns:
+        True if interrupted, False if coro finished by itself
+    """
+    interrupted = threading.Event()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(coro)
+
+        def on_interrupt(signum, frame):
+            # ignored from now on, until the process has exited
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            interrupted.set()
+            loop.call_soon_threadsafe(task.cancel)
+
+        signal.signal(signal.SIGINT, on_interrupt)
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not interrupted.is_set():
+                raise
+
+    asyncio.run(run())
+    return interrupted.is_set()
+
+
+def audio_window_metrics(feature_seconds, predict_seconds):
+    AUDIO_FEATURE_TIME.observe(feature_seconds)
+    AUDIO_PREDICT_TIME.observe(predict_seconds)
+    AUDIO_WINDOWS.inc()
+
+
+def collect_audio_metrics():
+    """
+    Audio metrics of the audio process (it has its own metrics registry):
+    the stage timings it published in the slot since the last collection.
+    """
+    global audio_windows_collected
+    windows, timings = audio_slot.timings(after=audio_windows_collected)
+    for feature_seconds, predict_seconds in timings:
+        AUDIO_FEATURE_TIME.observe(feature_seconds)
+        AUDIO_PREDICT_TIME.observe(predict_seconds)
+    audio_windows_collected = windows
+    AUDIO_WINDOWS.value = windows
+    AUDIO_RESTARTS.value = audio_supervisor.restarts
+
+
+def start_audio(mode="process", source="mic"):
+    """
+    Sensor path is up: report startup so far and bring audio online in the
+    background (its imports and model load no longer delay sensor data).
+    mode: "process" (supervised child process), "thread" or "off".
+    """
+    global audio_slot, audio_supervisor
+
+    startup.mark("accepting sensor connections")
+    startup.report("Sensor path ready")
+    if mode == "process":
+        audio_supervisor = AudioSupervisor(source).start()
+        audio_slot = audio_supervisor.slot
+        metrics.add_collector(collect_audio_metrics)
+    elif mode == "thread":
+        audio_slot = AudioSlot()
+        audio_thread = threading.Thread(target=run_audio, name="audio", daemon=True,
+                                        args=(audio_slot.publish, source),
+                                        kwargs={"on_window": audio_window_metrics})
+        audio_thread.start()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--transport",
+        choices=["pipe", "unix", "tcp", "stdin", "file"],
+        default=default_transport(),
+        help="How sensor messages arrive (default: pipe on Windows, unix elsewhere)"
+    )
+    parser.add_argument(
+        "--address",
+        type=str,
+        default=None,
+        help="Pipe name, socket path, host:port or file path for the transport"
+    )
+    parser.add_argument(
+        "--log",
+        type=str,
+        default=None,
+        help="Log every reading to this CSV in the background (e.g. sensor_log.csv)"
+    )
+    parser.add_argument(
+        "--log-rotate",
+        choices=["size", "daily"],
+        default=None,
+        help="Start a new log file by size or every day"
+    )
+    parser.add_argument(
+        "--log-columnar",
+        choices=["npz", "parquet"],
+        default=None,
+        help="Also write the log in a columnar format"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Threads for KNN inference shared by all sensor streams"
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=0,
+        help="Shard sensor streams across this many KNN worker processes (0 = in process)"
+    )
+    parser.add_argument(
+        "--kalman",
+        nargs="*",
+        choices=list(CHANNEL_PARAMS),
+        default=None,
+        help="Kalman filter these channels before KNN (no value: us_raw)"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=QUEUE_SIZE,
+        help="Readings per stream waiting for KNN before block / drop-oldest apply"
+    )
+    parser.add_argument(
+        "--queue-policy",
+        choices=QUEUE_POLICIES,
+        default="block",
+        help="When the queue is full: wait (default), drop the oldest reading, "
+             "or keep only the latest reading"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics"
+    )
+    parser.add_argument(
+        "--metrics-summary",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Print a one-line metrics summary this often"
+    )
+    parser.add_argument(
+        "--no-metrics",
+        action="store_true",
+        help="Turn off stage timing and counters"
+    )
+    parser.add_argument(
+        "--audio",
+        choices=["process", "thread", "off"],
+        default="process",
+        help="Run audio inference in a supervised child process (default), a thread, or not at all"
+    )
+    parser.add_argument(
+        "--audio-source",
+        choices=["mic", "synthetic"],
+        default="mic",
+        help="Microphone, or generated test audio (no microphone needed)"
+    )
+    add_voting_arguments(parser)
+    args = parser.parse_args()
+    if args.kalman == []:
+        args.kalman = DEFAULT_CHANNELS
+    if args.no_metrics:
+        metrics.disable()
+
     print("\nRunning Pattern Recognition")
-    
-    audio_thread = threading.Thread(target=audio_detection_thread, daemon=True)
-    audio_thread.start()
+    startup.mark("sensor imports")
 
     try:
-        knn_model = load_knn_model("knn_cooking_model.pkl")
+        with startup.stage("load KNN model"):
+            knn_model = get_knn_model("knn_cooking_model.pkl")
         print("Loaded KNN model.")
     except Exception as e:
         print("Failed to load KNN model:", e)
         sys.exit(1)
 
-    pipe_name = "\\\\.\\pipe\\test_pipe"
-    pipe_buffer_size = 512
-
-    # For 5-second voting
-    prediction_buffer = []
-    current_status = None
-
-    while True :
-        # create named pipe
-        named_pipe = win32pipe.CreateNamedPipe(
-            pipe_name,
-            win32pipe.PIPE_ACCESS_DUPLEX,
-            win32pipe.PIPE_TYPE_MESSAGE | win32pipe.PIPE_WAIT | win32pipe.PIPE_READMODE_MESSAGE,
-            win32pipe.PIPE_UNLIMITED_INSTANCES,
-            pipe_buffer_size,
-            pipe_buffer_size,
-            0,
-            None
-        )
+    # First prediction pays for lazy setup; do it before real readings arrive
+    with startup.stage("first KNN inference"):
+        knn_model.predict(knn_model.xmin[None, :])
 
-        try:
-            if named_pipe:
-                print("Waiting for connection...")
-                win32pipe.ConnectNamedPipe(named_pipe, None)
-                print("Connected to C++ client")
-
-                while True:
-
-                    data = receive(named_pipe, pipe_buffer_size)
-                    if data:
-                        try:
-                            # load json data
-                            sensor_data = json.loads(data)
-                            #print_sensor_data(sensor_data)
-                            #save_sensor_to_csv(sensor_data)
-                            temp = float(sensor_data["temperature"])
-                            rh = float(sensor_data["humidity"])
-                            distance = float(sensor_data["us_raw"])
-                            # raw_d = float(sensor_data["us_raw"])
-
-                            # # KF prediction
-                            # kf_x_pred = kf_x
-                            # kf_P_pred = kf_P + kf_Q
-
-                            # # Outlier handling（0 或跳动太大）
-                            # if raw_d == 0 or abs(raw_d - kf_x_pred) > kf_threshold:
-                            #     # skip update
-                            #     kf_x = kf_x_pred
-                            #     kf_P = kf_P_pred
-                            # else:
-                            #     # Normal KF update
-                            #     K = kf_P_pred / (kf_P_pred + kf_R)
-                            #     kf_x = kf_x_pred + K * (raw_d - kf_x_pred)
-                            #     kf_P = (1 - K) * kf_P_pred
-
-                            # distance = kf_x      # ← 用滤波后的distance喂KNN
-
-                            air_quality = float(sensor_data["gas"])
-
-                            label, conf = predict_from_sensors(
-                                temp=temp,
-                                rh=rh,
-                                distance=distance,
-                                air_quality=air_quality,
-                                model_path="knn_cooking_model.pkl"
-                            )
-                            # print(f"[1-sec KNN] {label} (conf={conf:.2f})")
-
-                            prediction_buffer.append(label)
-
-                            # ====== Every 5 readings → voting ======
-                            if len(prediction_buffer) >= 5:
-                                counts = Counter(prediction_buffer)
-                                voted_label, vote_count = counts.most_common(1)[0]
-
-                                current_status = voted_label
-                                print(f"[5-sec vote] Final Status = {current_status}  |  Votes = {dict(counts)}")
-
-
-                                # ---- only when cooking, also show audio model result ----
-                                if current_status and "cooking," in current_status.lower():
-                                    with audio_lock:
-                                        local_audio_label = audio_label
-                                        local_audio_conf = audio_confidence
-
-                                    if local_audio_label is not None:
-                                        print(f"[COMBINED] Status={current_status} | "
-                                            f"Cooking sound={local_audio_label} (p={local_audio_conf:.2f})")
-                                    else:
-                                        print(f"[COMBINED] Status={current_status} | Cooking sound=No audio prediction yet")
-
-                                prediction_buffer.clear()
-                            print("-" * 50)
-                            
-                        except json.JSONDecodeError:
-                            print("Raw message:", data)
-                        print("-" * 50)
-        except KeyboardInterrupt:
+    if args.metrics_port is not None and not args.no_metrics:
+        serve_metrics(args.metrics_port)
+        print(f"Metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+    if args.metrics_summary and not args.no_metrics:
+        start_summary(args.metrics_summary)
+
+    sensor_logger = None
+    if args.log:
+        sensor_logger = SensorLogger(args.log, rotate=args.log_rotate, columnar=args.log_columnar).start()
+
+    shard_pool = None
+    if args.shards > 0:
+        with startup.stage("start KNN worker processes"):
+            shard_pool = ShardPool("knn_cooking_model.pkl", workers=args.shards,
+                                   vote_window=args.vote_window, voting=voting_options(args)).start()
+        print(f"Started {args.shards} KNN worker processes.")
+
+    try:
+        if run_until_interrupted(serve(args, knn_model, sensor_logger, shard_pool,
+                                       on_ready=lambda: start_audio(args.audio, args.audio_source))):
             print("Keyboard interrupt. Exiting...")
             print("Exit Pattern Recognition")
-            if named_pipe:
-                win32pipe.DisconnectNamedPipe(named_pipe)
-                win32file.CloseHandle(named_pipe)
-            sys.exit(0)
-        except Exception as e:
-            print("Pipe closed. Try to reopen...")
-            continue
\ No newline at end of file
+        else:
+            print("Input closed. Exit Pattern Recognition")
+    except KeyboardInterrupt:
+        # before the event loop was running
+        print("Keyboard interrupt. Exiting...")
+        print("Exit Pattern Recognition")
+    finally:
+        if audio_supervisor is not None:
+            audio_supervisor.stop()
+        if shard_pool is not None:
+            shard_pool.close()
+        if sensor_logger is not None:
+            sensor_logger.close()
@@ -0,0 +1,199 @@
+"""
+Pickle-free, memory-mappable model artifacts.
+
+An artifact is a directory:
+    manifest.json   format name and version, model kind, metadata (plain
+                    JSON: features, k, label names, sample rate, ...) and
+                    the list of arrays with their dtype and shape
+    <name>.npy      one plain .npy file per array (never object dtype)
+
+Arrays are opened with np.load(mmap_mode="r"), so loading unpickles
+nothing (safe for files from elsewhere), takes almost no time, and every
+process that opens the same artifact shares its pages through the OS
+page cache instead of holding a private copy.
+
+The manifest records the SHA-1 of the pickle an artifact was converted
+from, so loaders can tell whether the artifact still matches it.
+
+Convert the existing pickles:
+    python artifacts.py knn_cooking_model.pkl knn_cooking_model
+    python artifacts.py ml_sound/sound_model.pkl ml_sound/sound_model
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+# ======= Configuration =======
+ARTIFACT_FORMAT = "sensorreader-model"
+ARTIFACT_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"Cannot read {MANIFEST} in {path}: {e}")
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ArtifactError(f"{path} is not a {ARTIFACT_FORMAT} artifact")
+    if manifest.get("version") != ARTIFACT_VERSION:
+        raise ArtifactError(f"{path}: unsupported artifact version {manifest.get('version')}")
+    return manifest
+
+
+def save_artifact(path, kind, meta, arrays, source=None):
+    """
+    Write an artifact directory. It is built next to path and swapped in
+    at the end, so readers never see a half-written artifact.
+
+    meta:   JSON-serializable dict
+    arrays: dict name -> array (numeric or fixed-width string dtype)
+    source: pickle the artifact was made from (its SHA-1 is recorded)
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    entries = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise ArtifactError(f"Array {name!r} has object dtype; artifacts are pickle-free")
+        np.save(os.path.join(tmp_path, name + ".npy"), array, allow_pickle=False)
+        entries[name] = {"file": name + ".npy", "dtype": array.dtype.str, "shape": list(array.shape)}
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "kind": kind,
+        "meta": meta,
+        "arrays": entries,
+        "source_sha1": file_sha1(source) if source else None,
+    }
+    with open(os.path.join(tmp_path, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def load_artifact(path, kind=None, mmap=True):
+    """
+    Open an artifact.
+
+    Returns:
+        meta (dict), arrays (dict name -> read-only memory-mapped array,
+        or in-memory arrays with mmap=False)
+    """
+    manifest = read_manifest(path)
+    if kind is not None and manifest.get("kind") != kind:
+        raise ArtifactError(f"{path} holds a {manifest.get('kind')!r} model, not {kind!r}")
+
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        array = np.load(os.path.join(path, entry["file"]), mmap_mode="r" if mmap else None,
+                        allow_pickle=False)
+        if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+            raise ArtifactError(f"{path}: {entry['file']} does not match the manifest")
+        arrays[name] = array
+    return manifest["meta"], arrays
+
+
+def artifact_matches(path, source):
+    """
+    True if the artifact exists and was converted from source as it is
+    now (or source is gone, leaving the artifact as the only model).
+    """
+    if not is_artifact(path):
+        return False
+    if not os.path.exists(source):
+        return True
+    try:
+        recorded = read_manifest(path).get("source_sha1")
+    except ArtifactError:
+        return False
+    return recorded is not None and recorded == file_sha1(source)
+
+
+def model_mtime(path):
+    """
+    Modification time of a pickle or artifact (its manifest).
+    """
+    if os.path.isdir(path):
+        return os.path.getmtime(os.path.join(path, MANIFEST))
+    return os.path.getmtime(path)
+
+
+# ---------- audio RandomForest ----------
+
+def save_audio_artifact(model_obj, path, source=None):
+    """
+    Audio model dict ({"rf", "label_encoder", "sample_rate"}) as an
+    artifact of the flat forest arrays (see ml_sound/forest_export.py).
+    """
+    from ml_sound.forest_export import export_forest
+
+    forest = export_forest(model_obj)
+    scalars = ("format", "max_depth", "n_features", "sample_rate")
+    meta = {name: int(forest[name]) for name in scalars}
+    meta["classes"] = [str(c) for c in forest["classes"]]
+    arrays = {name: value for name, value in forest.items() if name not in scalars and name != "classes"}
+    save_artifact(path, "audio_forest", meta, arrays, source)
+
+
+def load_audio_artifact(path, mmap=True):
+    """
+    ForestModel on the memory-mapped arrays of an audio artifact.
+    """
+    from ml_sound.forest_export import ForestModel
+
+    meta, arrays = load_artifact(path, "audio_forest", mmap)
+    return ForestModel({**meta, **arrays})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a model pickle to an artifact directory")
+    parser.add_argument("pickle", help="knn_cooking_model.pkl or ml_sound/sound_model.pkl")
+    parser.add_argument("output", nargs="?", default=None, help="artifact directory (default: pickle name without .pkl)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.pickle)[0]
+    import joblib   # reads both plain pickles and joblib files
+    model_obj = joblib.load(args.pickle)
+
+    if "rf" in model_obj:
+        save_audio_artifact(model_obj, output, source=args.pickle)
+    elif "X_train" in model_obj:
+        from knn_detection import save_knn_artifact
+        save_knn_artifact(model_obj, output, source=args.pickle)
+    else:
+        raise SystemExit(f"Unknown model in {args.pickle}: keys {sorted(model_obj)}")
+
+    manifest = read_manifest(output)
+    size = sum(os.path.getsize(os.path.join(output, e["file"])) for e in manifest["arrays"].values())
+    print(f"Converted {args.pickle} -> {output} ({manifest['kind']}, {len(manifest['arrays'])} arrays, "
+          f"{size / 1024:.0f} KiB)")
@@ -0,0 +1,352 @@
+"""
+Audio inference (microphone -> MFCC -> RandomForest) for PatternRecognition.
+
+run_audio() is the audio loop. It can run
+    - in a supervised child process (AudioSupervisor): MFCC and the forest
+      no longer compete with sensor decoding and KNN for the GIL, and the
+      process is restarted if it crashes
+    - in a thread of the service process, as before
+
+Either way the latest result is published in an AudioSlot: a fixed-size
+shared-memory record guarded by a sequence counter (seqlock). The audio
+side is the only writer; readers never lock or wait, they copy the record
+and retry if the writer was in the middle of an update.
+
+Usage:
+    supervisor = AudioSupervisor().start()
+    latest = supervisor.slot.read()     # None, or (label, confidence, timestamp, windows)
+    windows, timings = supervisor.slot.timings(after=0)
+    supervisor.stop()
+"""
+import multiprocessing
+import signal
+import threading
+import time
+
+import numpy as np
+
+from startup import startup
+
+# ======= Configuration =======
+AUDIO_MODEL_PATH = "./ml_sound/sound_model.pkl"     # your audio RF model
+AUDIO_ARTIFACT_PATH = "./ml_sound/sound_model"      # same forest, pickle-free and memory-mapped (artifacts.py)
+WINDOW_SECONDS = 3.0                     # length of each audio window in seconds
+HOP_SECONDS = 0.5                        # a new (overlapping) window every hop (~0.512 s, whole STFT frames)
+SAMPLE_RATE = 16000                      # must match training
+N_MFCC = 20
+CONF_THRESHOLD = 0.6                     # if max probability < threshold -> treat as Unknown
+
+LABEL_BYTES = 64
+READ_RETRIES = 100          # a reader gives up (keeps its last value) after this many torn reads
+RESTART_DELAY = 1.0         # seconds before restarting a crashed audio process...
+MAX_RESTART_DELAY = 30.0    # ...doubling up to this while it keeps crashing
+STABLE_SECONDS = 60.0       # a process that ran this long resets the delay
+TIMING_WINDOWS = 256        # stage timings of the last this many windows are kept in the slot
+
+SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"),          # odd while the writer is updating
+    ("windows", "<u8"),      # windows classified so far
+    ("confidence", "<f8"),
+    ("timestamp", "<f8"),    # time.time() of the window
+    ("label", f"S{LABEL_BYTES}"),
+    # seconds spent per window, window n at index (n - 1) % TIMING_WINDOWS
+    ("feature_seconds", "<f8", (TIMING_WINDOWS,)),
+    ("predict_seconds", "<f8", (TIMING_WINDOWS,)),
+])
+
+
+class AudioSlot:
+    """
+    Latest audio prediction in shared memory (single writer, lock-free reads).
+    """
+
+    def __init__(self, buffer=None):
+        if buffer is None:
+            buffer = multiprocessing.get_context("spawn").RawArray("b", SLOT_DTYPE.itemsize)
+        self.buffer = buffer
+        self.record = np.frombuffer(buffer, dtype=SLOT_DTYPE, count=1)
+        self.last = None
+
+    def publish(self, label, confidence, timestamp=None, feature_seconds=0.0, predict_seconds=0.0):
+        record = self.record
+        # round down: a writer that died mid-update leaves seq odd
+        seq = int(record["seq"][0]) & ~1
+        record["seq"][0] = seq + 1
+        record["label"][0] = str(label).encode("utf-8")[:LABEL_BYTES]
+        record["confidence"][0] = confidence
+        record["timestamp"][0] = time.time() if timestamp is None else timestamp
+        i = int(record["windows"][0]) % TIMING_WINDOWS
+        record["feature_seconds"][0, i] = feature_seconds
+        record["predict_seconds"][0, i] = predict_seconds
+        record["windows"][0] += 1
+        record["seq"][0] = seq + 2
+
+    def _snapshot(self):
+        """
+        A consistent copy of the record, or None after READ_RETRIES torn reads.
+        """
+        record = self.record
+        for _ in range(READ_RETRIES):
+            seq = int(record["seq"][0])
+            if seq % 2:
+                continue
+            copy = record[0].copy()
+            if int(record["seq"][0]) == seq:
+                return copy
+        return None
+
+    def read(self):
+        """
+        Returns:
+            None before the first window, else
+            (label, confidence, timestamp, windows)
+        """
+        copy = self._snapshot()
+        if copy is not None:
+            if copy["windows"] == 0:
+                return None
+            self.last = (copy["label"].decode("utf-8"), float(copy["confidence"]),
+                         float(copy["timestamp"]), int(copy["windows"]))
+        return self.last
+
+    def timings(self, after=0):
+        """
+        Stage timings of the windows classified after the first `after`
+        (at most the last TIMING_WINDOWS of them).
+
+        Returns:
+            (windows, [(feature_seconds, predict_seconds), ...] oldest first);
+            (after, []) if the writer kept the record busy
+        """
+        copy = self._snapshot()
+        if copy is None:
+            return after, []
+        windows = int(copy["windows"])
+        first = max(after, windows - TIMING_WINDOWS)
+        return windows, [(float(copy["feature_seconds"][n % TIMING_WINDOWS]),
+                          float(copy["predict_seconds"][n % TIMING_WINDOWS]))
+                         for n in range(first, windows)]
+
+
+class SyntheticCapture:
+    """
+    Stand-in for StreamingAudioCapture (same windows() interface) producing
+    tones and noise, speed times faster than real time (0 = no pacing).
+    For benchmarks and machines without a microphone.
+    """
+
+    def __init__(self, sample_rate, window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS, speed=1.0):
+        self.sample_rate = sample_rate
+        self.window = int(round(window_seconds * sample_rate))
+        self.hop = max(int(round(hop_seconds * sample_rate)), 1)
+        self.speed = speed
+        self.rng = np.random.default_rng(0)
+        self.running = False
+        self.window_end = 0
+
+    def start(self):
+        self.running = True
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def _samples(self, start, n):
+        t = (start + np.arange(n)) / self.sample_rate
+        tone = np.sin(2 * np.pi * 440 * t) * (1 + np.sin(2 * np.pi * 0.2 * t))
+        return (0.3 * tone + 0.05 * self.rng.standard_normal(n)).astype(np.float32)
+
+    def windows(self):
+        y = self._samples(0, self.window)
+        end = self.window
+        started = time.perf_counter()
+        while self.running:
+            if self.speed > 0:
+                delay = started + (end - self.window) / self.sample_rate / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.window_end = end
+            yield y
+            y = np.concatenate([y[self.hop:], self._samples(end, self.hop)])
+            end += self.hop
+
+
+def load_audio_classifier(model_path=AUDIO_MODEL_PATH, artifact_path=AUDIO_ARTIFACT_PATH):
+    """
+    The audio forest: the artifact when it matches the pickle, else the
+    pickle (imports sklearn; convert it with artifacts.py). Also used by
+    the ml_sound tools and benchmarks.
+
+    Returns:
+        model (has predict_proba), class_names, sample_rate
+    """
+    from artifacts import artifact_matches, load_audio_artifact
+
+    if artifact_matches(artifact_path, model_path):
+        rf = load_audio_artifact(artifact_path)
+        return rf, rf.classes_, rf.sample_rate or None
+
+    print(f"[AUDIO] {artifact_path} missing or out of date; loading the pickle "
+          f"(python artifacts.py {model_path} {artifact_path})")
+    import joblib
+    model_obj = joblib.load(model_path)
+    return model_obj["rf"], model_obj["label_encoder"].classes_, model_obj.get("sample_rate")
+
+
+def run_audio(publish, source="mic", speed=1.0, stop_event=None, on_window=None):
+    """
+    Continuously listen to the microphone (or a SyntheticCapture with
+    source="synthetic") and publish(label, confidence, feature_seconds=,
+    predict_seconds=) every window. on_window(feature_seconds,
+    predict_seconds) is called after each one.
+    Returns when stop_event is set, or if the model or microphone fails.
+    """
+    with startup.stage("audio imports"):
+        from ml_sound.audio_stream import StreamingAudioCapture
+        from ml_sound.incremental_mfcc import IncrementalMFCC
+
+    try:
+        with startup.stage("load audio model"):
+            rf, class_names, sr_model = load_audio_classifier()
+    except Exception as e:
+        print(f"[AUDIO] Failed to load {AUDIO_MODEL_PATH}: {e}")
+        return
+
+    sr_model = sr_model or SAMPLE_RATE
+
+    if sr_model != SAMPLE_RATE:
+        print(f"[AUDIO] Warning: model sample_rate={sr_model}, but using {SAMPLE_RATE}")
+
+    print("=== Audio: real-time cooking sound detection started ===")
+
+    with startup.stage("audio feature extractor"):
+        extractor = IncrementalMFCC(SAMPLE_RATE, N_MFCC, WINDOW_SECONDS, HOP_SECONDS)
+    try:
+        with startup.stage("open microphone"):
+            hop_seconds = extractor.hop / SAMPLE_RATE
+            if source == "synthetic":
+                capture = SyntheticCapture(SAMPLE_RATE, WINDOW_SECONDS, hop_seconds, speed).start()
+            else:
+                capture = StreamingAudioCapture(SAMPLE_RATE, WINDOW_SECONDS, hop_seconds).start()
+    except Exception as e:
+        print(f"[AUDIO] Failed to open the microphone: {e}")
+        return
+
+    first_window = True
+    try:
+        for y in capture.windows():
+            if stop_event is not None and stop_event.is_set():
+                break
+            if first_window:
+                # the first window needs WINDOW_SECONDS of audio
+                inference_start = startup.elapsed()
+
+            # Same features as extract_features_from_raw, only new frames computed
+            t0 = time.perf_counter()
+            feat = extractor.update(y, capture.window_end).reshape(1, -1)
+            t1 = time.perf_counter()
+
+            # Predict probabilities with RF
+            proba = rf.predict_proba(feat)[0]
+            t2 = time.perf_counter()
+
+            if first_window:
+                first_window = False
+                startup.record("first audio inference", inference_start, startup.elapsed() - inference_start)
+                startup.mark("audio online")
+                startup.report("Audio online")
+            pred_idx = int(np.argmax(proba))
+            confidence = float(proba[pred_idx])
+
+            pred_label = class_names[pred_idx]
+
+            if confidence < CONF_THRESHOLD:
+                display_label = "Unknown / silence"
+            else:
+                display_label = pred_label
+
+            publish(display_label, confidence, feature_seconds=t1 - t0, predict_seconds=t2 - t1)
+            if on_window is not None:
+                on_window(t1 - t0, t2 - t1)
+
+    except KeyboardInterrupt:
+        print("\n[AUDIO] Stopped audio.")
+    finally:
+        capture.stop()
+
+
+def _audio_process(buffer, source, speed):
+    """
+    Child process entry point: run_audio() publishing into the shared slot.
+    """
+    # Ctrl-C reaches the whole process group; the supervisor stops this process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_audio(AudioSlot(buffer).publish, source, speed)
+
+
+class AudioSupervisor:
+    """
+    Run run_audio() in a child process and restart it whenever it exits
+    (crash, failed microphone, ...) until stop(), with a growing delay
+    while it keeps failing.
+    """
+
+    def __init__(self, source="mic", speed=1.0):
+        self.source = source
+        self.speed = speed
+        # spawn on every platform: the service already runs threads
+        self.ctx = multiprocessing.get_context("spawn")
+        self.slot = AudioSlot(self.ctx.RawArray("b", SLOT_DTYPE.itemsize))
+        self.process = None
+        self.monitor = None
+        self.stopping = threading.Event()
+
+        # Counters
+        self.starts = 0
+        self.restarts = 0
+
+    def _spawn(self):
+        record = self.slot.record
+        seq = int(record["seq"][0])
+        if seq % 2:
+            # The last process died mid-update: drop its possibly torn
+            # result (timestamp 0 is never shown) and make seq even again
+            print("[AUDIO] Audio process died while publishing; clearing the last result")
+            record["label"][0] = b""
+            record["confidence"][0] = 0.0
+            record["timestamp"][0] = 0.0
+            record["seq"][0] = seq + 1
+        self.process = self.ctx.Process(target=_audio_process, args=(self.slot.buffer, self.source, self.speed),
+                                        name="audio", daemon=True)
+        self.process.start()
+        self.starts += 1
+
+    def start(self):
+        self._spawn()
+        self.monitor = threading.Thread(target=self._monitor, name="audio-supervisor", daemon=True)
+        self.monitor.start()
+        return self
+
+    def _monitor(self):
+        delay = RESTART_DELAY
+        while not self.stopping.is_set():
+            started = time.monotonic()
+            self.process.join()
+            if self.stopping.is_set():
+                break
+            if time.monotonic() - started >= STABLE_SECONDS:
+                delay = RESTART_DELAY
+            print(f"[AUDIO] Audio process exited (code {self.process.exitcode}); restarting in {delay:g} s")
+            if self.stopping.wait(delay):
+                break
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+            self.restarts += 1
+            self._spawn()
+
+    def stop(self):
+        self.stopping.set()
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5.0)
+        if self.monitor is not None:
+            self.monitor.join(timeout=5.0)
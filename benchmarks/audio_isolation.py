@@ -0,0 +1,114 @@
+"""
+Sensor-path latency while audio inference runs (audio_process.py).
+
+Replays sensor_log.csv through a SensorPipeline (decode -> KNN -> vote,
+one message at a time, paced at --rate messages/s) and records the
+latency of every message, with audio inference
+    off       no audio
+    thread    run_audio() in a thread of this process (shares the GIL)
+    process   run_audio() in a supervised child process
+Audio comes from a SyntheticCapture, --audio-speed times faster than real
+time (0 = as fast as possible, the worst case for the sensor path), so no
+microphone is needed. Reports p50 / p99 / max latency per mode and how
+many audio windows were classified meanwhile.
+
+Run from the repository root:
+    python -m benchmarks.audio_isolation
+    python -m benchmarks.audio_isolation --messages 5000 --rate 500 --audio-speed 1
+"""
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from audio_process import AudioSlot, AudioSupervisor, run_audio
+from knn_detection import MODEL_PATH, get_knn_model
+from recognition import SensorPipeline
+from replay import format_sensor_json, load_readings
+
+# ======= Configuration =======
+MODES = ["off", "thread", "process"]
+AUDIO_WARMUP = 120.0     # seconds to wait for the first audio window
+
+
+def wait_for_audio(slot, timeout=AUDIO_WARMUP):
+    deadline = time.monotonic() + timeout
+    while slot.read() is None:
+        if time.monotonic() > deadline:
+            raise RuntimeError("no audio window classified; is the audio model available?")
+        time.sleep(0.1)
+
+
+def sensor_latencies(pipeline, messages, rate):
+    """
+    Process messages paced at rate per second; latency of each in seconds.
+    """
+    latencies = np.empty(len(messages))
+    interval = 1.0 / rate if rate > 0 else 0.0
+    start = time.perf_counter()
+    for i, message in enumerate(messages):
+        delay = start + i * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        t0 = time.perf_counter()
+        pipeline.process(message)
+        latencies[i] = time.perf_counter() - t0
+    return latencies
+
+
+def run_mode(mode, model, messages, rate, audio_speed):
+    """
+    Returns (latencies, audio windows classified while measuring).
+    """
+    slot, supervisor, stop = None, None, threading.Event()
+    if mode == "thread":
+        slot = AudioSlot()
+        threading.Thread(target=run_audio, name="audio", daemon=True,
+                         args=(slot.publish, "synthetic", audio_speed, stop)).start()
+    elif mode == "process":
+        supervisor = AudioSupervisor("synthetic", audio_speed).start()
+        slot = supervisor.slot
+
+    try:
+        if slot is not None:
+            wait_for_audio(slot)
+        windows_before = slot.read()[3] if slot is not None else 0
+        latencies = sensor_latencies(SensorPipeline(model), messages, rate)
+        windows = slot.read()[3] - windows_before if slot is not None else 0
+    finally:
+        stop.set()
+        if supervisor is not None:
+            supervisor.stop()
+    return latencies, windows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensor latency with audio off / in a thread / in a process")
+    parser.add_argument("--csv", default="sensor_log.csv")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200.0, help="sensor messages per second (0 = unpaced)")
+    parser.add_argument("--audio-speed", type=float, default=0.0,
+                        help="synthetic audio speed vs real time (0 = as fast as possible)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    rows, _ = load_readings(args.csv)
+    messages = [format_sensor_json(rows[i % len(rows)]).encode("utf-8") + b"\x00"
+                for i in range(args.messages)]
+    model = get_knn_model(args.model)
+    SensorPipeline(model).process(messages[0])     # warm up
+
+    print(f"{args.messages} messages at {args.rate:g}/s, audio speed {args.audio_speed:g}, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'audio':>8s} {'p50 us':>9s} {'p99 us':>9s} {'max us':>10s} {'windows':>8s}")
+    for mode in args.modes:
+        latencies, windows = run_mode(mode, model, messages, args.rate, args.audio_speed)
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+        print(f"{mode:>8s} {p50:9.1f} {p99:9.1f} {latencies.max() * 1e6:10.1f} {windows:8d}")
+
+
+if __name__ == "__main__":
+    main()
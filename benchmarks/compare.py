@@ -0,0 +1,86 @@
+"""
+Compare two benchmark result files from benchmarks/suite.py.
+
+For every case in both files it prints the median time per item before
+and after and the ratio, and flags a regression when the new median is
+more than --threshold slower (10% by default). Exits with status 1 if
+any case regressed, so it can gate a change in a script.
+
+Medians from different machines, or runs with a different number of
+training rows or batch size, are not comparable; a warning is printed
+when the recorded environments differ.
+
+Run from the repository root:
+    python -m benchmarks.compare before.json after.json
+    python -m benchmarks.compare before.json after.json --threshold 0.05
+"""
+import argparse
+import json
+import sys
+
+# ======= Configuration =======
+THRESHOLD = 0.10     # slower by more than this fraction -> regression
+COMPARABLE = ["machine", "cpus", "python", "numpy", "train_rows", "batch"]
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(before, after, threshold=THRESHOLD):
+    """
+    Returns:
+        rows: list of (case, before per-item s, after per-item s, ratio, status)
+              status is "regression", "faster" or ""
+    """
+    rows = []
+    for name, old in before["results"].items():
+        new = after["results"].get(name)
+        if new is None:
+            continue
+        ratio = new["per_item_s"] / old["per_item_s"]
+        if ratio > 1.0 + threshold:
+            status = "regression"
+        elif ratio < 1.0 / (1.0 + threshold):
+            status = "faster"
+        else:
+            status = ""
+        rows.append((name, old["per_item_s"], new["per_item_s"], ratio, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag benchmark regressions between two result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="relative slowdown that counts as a regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    before, after = load_results(args.before), load_results(args.after)
+    env_before, env_after = before.get("environment", {}), after.get("environment", {})
+    for key in COMPARABLE:
+        if env_before.get(key) != env_after.get(key):
+            print(f"Warning: {key} differs ({env_before.get(key)} vs {env_after.get(key)})")
+    print(f"before: {env_before.get('commit')} {env_before.get('time')}")
+    print(f"after:  {env_after.get('commit')} {env_after.get('time')}")
+
+    rows = compare(before, after, args.threshold)
+    print(f"{'case':<22s} {'before us':>10s} {'after us':>10s} {'ratio':>7s}")
+    for name, old, new, ratio, status in rows:
+        print(f"{name:<22s} {old * 1e6:10.2f} {new * 1e6:10.2f} {ratio:6.2f}x  {status}")
+
+    only = sorted(set(before["results"]) ^ set(after["results"]))
+    if only:
+        print(f"Not in both files: {', '.join(only)}")
+
+    regressions = [row[0] for row in rows if row[4] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
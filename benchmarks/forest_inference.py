@@ -0,0 +1,68 @@
+"""
+Benchmark the array-based audio forest (ml_sound/forest_export.py, loaded
+from its artifact like the service does) against sklearn's
+RandomForestClassifier.predict_proba on the pickle.
+
+Samples are drawn from a normal distribution with the scale of the MFCC
+features. For every batch size it reports the median latency of both and
+checks that the probabilities are identical.
+
+Run from the repository root:
+    python -m benchmarks.forest_inference
+    python -m benchmarks.forest_inference --batches 1 16 256
+"""
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+from audio_process import load_audio_classifier
+from ml_sound.forest_export import ForestModel
+
+MODEL_PATH = os.path.join("ml_sound", "sound_model.pkl")
+ARTIFACT_PATH = os.path.join("ml_sound", "sound_model")
+BATCHES = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+
+def median_time(fn, X, min_runs=5, min_seconds=0.2):
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_runs or time.perf_counter() - start < min_seconds:
+        t0 = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--artifact", default=ARTIFACT_PATH)
+    parser.add_argument("--batches", type=int, nargs="+", default=BATCHES)
+    args = parser.parse_args()
+
+    rf = joblib.load(args.model)["rf"]
+    forest, _, _ = load_audio_classifier(args.model, args.artifact)
+    if not isinstance(forest, ForestModel):
+        raise SystemExit(f"{args.artifact} does not match {args.model}: "
+                         f"python artifacts.py {args.model} {args.artifact}")
+
+    rng = np.random.default_rng(0)
+    X_all = rng.normal(0.0, 50.0, size=(max(args.batches), rf.n_features_in_))
+
+    print(f"{len(forest.roots)} trees, {len(forest.feature)} nodes, max depth {forest.max_depth}, "
+          f"sklearn n_jobs={rf.n_jobs}")
+    print(f"{'batch':>6s} {'sklearn ms':>11s} {'arrays ms':>10s} {'speedup':>8s} {'identical':>10s}")
+    for batch in args.batches:
+        X = X_all[:batch]
+        same = np.array_equal(rf.predict_proba(X), forest.predict_proba(X))
+        t_sklearn = median_time(rf.predict_proba, X)
+        t_forest = median_time(forest.predict_proba, X)
+        print(f"{batch:6d} {t_sklearn * 1e3:11.3f} {t_forest * 1e3:10.3f} "
+              f"{t_sklearn / t_forest:7.1f}x {'yes' if same else 'NO':>10s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark brute-force KNN against KD-tree / ball tree indexes.
+
+Synthetic training sets are drawn around the rows of sensor_log.csv
+(with a little jitter) so the feature distribution looks like real data.
+For each training set size it reports the time for single-sample queries
+and for one batch of queries, and prints where an index starts to win.
+
+Run from the repository root:
+    python -m benchmarks.knn_index
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from knn_detection import (FEATURES, LABEL_COL, KNNModel, build_index,
+                           normalize_features)
+
+SIZES = [100, 300, 1000, 3000, 10000, 30000, 100000, 300000]
+INDEX_TYPES = ["brute", "kd_tree", "ball_tree"]
+# Brute force is only timed up to this training set size (it scans every
+# row per query; far past the crossover it just takes minutes)
+BRUTE_MAX_SIZE = 100000
+
+
+def synthetic_training_set(csv_path, n, rng):
+    """
+    Sample n rows from the CSV and add jitter of ~1% of each feature's range.
+    """
+    df = pd.read_csv(csv_path)
+    X = df[FEATURES].values.astype(float)
+    y = df[LABEL_COL].values
+
+    rows = rng.integers(0, len(X), size=n)
+    spread = X.max(axis=0) - X.min(axis=0)
+    X_syn = X[rows] + rng.normal(0.0, 0.01, size=(n, X.shape[1])) * spread
+    return X_syn, y[rows]
+
+
+def time_queries(model, X_query, single_count):
+    """
+    Returns (seconds per single-sample query, seconds for the whole batch).
+    """
+    start = time.perf_counter()
+    for row in X_query[:single_count]:
+        model.predict(row[None, :])
+    single = (time.perf_counter() - start) / single_count
+
+    start = time.perf_counter()
+    model.predict(X_query)
+    batch = time.perf_counter() - start
+    return single, batch
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default="sensor_log.csv")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--queries", type=int, default=1000, help="batch size")
+    parser.add_argument("--single", type=int, default=200, help="number of single-sample queries")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--brute-max", type=int, default=BRUTE_MAX_SIZE,
+                        help="largest training set to time brute force on")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X_query_raw, _ = synthetic_training_set(args.csv, args.queries, rng)
+
+    # Warm up so the sklearn import is not counted as build time
+    for index_type in INDEX_TYPES:
+        build_index(np.zeros((2, len(FEATURES))), index_type)
+
+    print(f"{'n_train':>8s} {'index':>10s} {'build ms':>9s} {'single us':>10s} {'batch ms':>9s}")
+    crossover = {}
+    for n in args.sizes:
+        X_raw, y = synthetic_training_set(args.csv, n, rng)
+        X_norm, xmin, xmax = normalize_features(X_raw)
+
+        results = {}
+        for index_type in INDEX_TYPES:
+            if index_type == "brute" and n > args.brute_max:
+                print(f"{n:8d} {index_type:>10s}   skipped (--brute-max {args.brute_max})")
+                continue
+            start = time.perf_counter()
+            index = build_index(X_norm, index_type)
+            build = time.perf_counter() - start
+
+            model = KNNModel(X_norm, y, xmin, xmax, k=args.k, index=index)
+            single, batch = time_queries(model, X_query_raw, args.single)
+            results[index_type] = (single, batch)
+            print(f"{n:8d} {index_type:>10s} {build * 1e3:9.2f} {single * 1e6:10.1f} {batch * 1e3:9.2f}")
+
+        for index_type in INDEX_TYPES[1:]:
+            if "brute" not in results:
+                break
+            for mode, col in (("single", 0), ("batch", 1)):
+                key = (index_type, mode)
+                if key not in crossover and results[index_type][col] < results["brute"][col]:
+                    crossover[key] = n
+        print()
+
+    print("Smallest training set where the index beats brute force:")
+    for index_type in INDEX_TYPES[1:]:
+        for mode in ("single", "batch"):
+            n = crossover.get((index_type, mode))
+            print(f"  {index_type:>10s} {mode:>6s}: {n if n is not None else 'not reached'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Load test for sharded KNN inference (shards.py).
+
+Replays sensor_log.csv as many simulated sensor streams (each stream
+starts at a different row) and pushes them through a ShardPool with a
+growing number of worker processes. Every stream sends its readings in
+small batches, like a service that receives a few readings per socket
+read. Reports readings/s per worker count and checks that every stream
+got exactly the votes of an in-process SensorPipeline, in order.
+
+Run from the repository root:
+    python -m benchmarks.shard_load
+    python -m benchmarks.shard_load --streams 500 --workers 1 2 4 8
+"""
+import argparse
+import os
+import time
+
+from knn_detection import MODEL_PATH, get_knn_model
+from recognition import SensorPipeline
+from replay import load_readings
+from shards import ShardPool
+
+
+def stream_readings(rows, n_streams, per_stream):
+    """
+    per_stream readings for each stream, wrapping around the CSV.
+    """
+    step = max(len(rows) // n_streams, 1)
+    streams = {}
+    for s in range(n_streams):
+        start = s * step
+        streams[f"stream-{s}"] = [rows[(start + i) % len(rows)] for i in range(per_stream)]
+    return streams
+
+
+def expected_votes(knn_model, streams):
+    votes = {}
+    for stream_id, readings in streams.items():
+        pipeline = SensorPipeline(knn_model)
+        labels, confs = pipeline.classify_batch(readings)
+        votes[stream_id] = [pipeline.vote(label, conf) for label, conf in zip(labels, confs)]
+    return votes
+
+
+def run_load(pool, streams, batch_size):
+    """
+    Submit every stream batch by batch, round robin over the streams, and
+    wait for all results. Returns (elapsed seconds, votes per stream).
+    """
+    futures = {stream_id: [] for stream_id in streams}
+    per_stream = len(next(iter(streams.values())))
+
+    start = time.perf_counter()
+    for i in range(0, per_stream, batch_size):
+        for stream_id, readings in streams.items():
+            futures[stream_id].append(pool.submit(stream_id, readings[i:i + batch_size]))
+
+    votes = {}
+    for stream_id, stream_futures in futures.items():
+        votes[stream_id] = []
+        for future in stream_futures:
+            _, _, batch_votes, _, _ = future.result()
+            votes[stream_id] += batch_votes
+    return time.perf_counter() - start, votes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default="sensor_log.csv")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--readings", type=int, default=200, help="readings per stream")
+    parser.add_argument("--batch", type=int, default=5, help="readings per request")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+        help="worker counts to try"
+    )
+    args = parser.parse_args()
+
+    rows, _ = load_readings(args.csv)
+    streams = stream_readings(rows, args.streams, args.readings)
+    n = args.streams * args.readings
+    expected = expected_votes(get_knn_model(args.model), streams)
+
+    print(f"{args.streams} streams x {args.readings} readings, {args.batch} readings per request, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>8s} {'seconds':>9s} {'readings/s':>11s} {'speedup':>8s} {'in order':>9s}")
+    base = None
+    for workers in args.workers:
+        pool = ShardPool(args.model, workers=workers).start()
+        try:
+            run_load(pool, streams, args.batch)     # warm up
+            for stream_id in streams:
+                pool.close_stream(stream_id)
+            elapsed, votes = run_load(pool, streams, args.batch)
+        finally:
+            pool.close()
+
+        rate = n / elapsed
+        base = base or rate
+        ok = "yes" if votes == expected else "NO"
+        print(f"{workers:8d} {elapsed:9.3f} {rate:11.0f} {rate / base:7.2f}x {ok:>9s}")
+
+
+if __name__ == "__main__":
+    main()
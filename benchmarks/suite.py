@@ -0,0 +1,380 @@
+"""
+Benchmark suite for the hot paths of the recognition pipeline.
+
+Every case runs on synthetic data with a fixed seed: sensor readings are
+rows of sensor_log.csv with jitter of ~1% of each field's range, audio is
+a mix of tones and noise at the model's sample rate. Each case is timed
+until it has run at least min_runs times and for min_seconds, and the
+median time per call (and per item, for batches) is saved as JSON so
+runs can be compared with benchmarks/compare.py.
+
+Cases:
+    knn_predict_*            knn_detection.knn_predict (no cached model)
+    predict_from_sensors     one reading through the cached model
+    knn_model_batch          KNNModel.predict on a batch
+    normalize_features       min-max normalization of a batch
+    decode_json              decode_sensor_message on sensorDataToJson text
+    save_sensor_to_csv       PatternRecognition.save_sensor_to_csv, one row
+    extract_features         extract_features_from_raw on one audio window
+    incremental_mfcc         IncrementalMFCC.update for one hop
+    forest_proba_*           audio ForestModel.predict_proba
+    sklearn_proba_*          the same forest through sklearn predict_proba
+                             (what ForestModel replaces)
+    vote                     one label into the 5-sample voting window
+    pipeline_process         decode -> KNN -> vote for one message
+
+Run from the repository root:
+    python -m benchmarks.suite                         # -> benchmarks/results/latest.json
+    python -m benchmarks.suite --output before.json --only knn
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from knn_detection import FEATURES, LABEL_COL, knn_predict, normalize_features
+from sensor_frame import INT_FIELDS, SENSOR_FIELDS
+
+# ======= Configuration =======
+CSV_PATH = "sensor_log.csv"
+RESULTS_PATH = os.path.join("benchmarks", "results", "latest.json")
+SEED = 0
+TRAIN_ROWS = 5000        # synthetic KNN training set
+BATCH = 256              # readings per batch case
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_WINDOW_SECONDS = 3.0
+AUDIO_HOP_SECONDS = 0.5
+N_MFCC = 20
+MIN_RUNS = 5
+MIN_SECONDS = 0.5
+
+# name -> setup(data); setup returns (function to time, items per call)
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+# ---------- synthetic data ----------
+
+class SyntheticData:
+    """
+    Seeded synthetic sensor readings and audio, plus a temporary
+    directory for the files some cases write.
+    """
+
+    def __init__(self, csv_path=CSV_PATH, seed=SEED):
+        self.rng = np.random.default_rng(seed)
+        self.tmp = tempfile.TemporaryDirectory()
+
+        df = pd.read_csv(csv_path)
+        for field in SENSOR_FIELDS:
+            if field not in df.columns:
+                df[field] = 0
+        self.source = df
+
+        self.train = self.sensor_frame(TRAIN_ROWS)
+        self.X_train = self.train[FEATURES].values.astype(float)
+        self.y_train = self.train[LABEL_COL].values
+        self.readings = self.sensor_frame(BATCH)[SENSOR_FIELDS].to_dict("records")
+        self.X_batch = np.array([[r[f] for f in FEATURES] for r in self.readings], dtype=float)
+
+        self.model_path = os.path.join(self.tmp.name, "knn_model.pkl")
+        self.audio = self.audio_signal(AUDIO_WINDOW_SECONDS + 64 * AUDIO_HOP_SECONDS)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def sensor_frame(self, n):
+        """
+        n rows drawn from the CSV with jitter of ~1% of each field's range.
+        """
+        rows = self.rng.integers(0, len(self.source), size=n)
+        df = self.source.iloc[rows].reset_index(drop=True).copy()
+        for field in SENSOR_FIELDS:
+            values = df[field].values.astype(float)
+            spread = float(self.source[field].max() - self.source[field].min())
+            values = values + self.rng.normal(0.0, 0.01, size=n) * spread
+            df[field] = np.round(values).astype(int) if field in INT_FIELDS else values
+        return df
+
+    def audio_signal(self, seconds):
+        """
+        Tones with a slow amplitude envelope plus noise, float32 in [-1, 1].
+        """
+        t = np.arange(int(seconds * AUDIO_SAMPLE_RATE)) / AUDIO_SAMPLE_RATE
+        freqs = self.rng.uniform(100.0, 4000.0, size=5)
+        y = sum(np.sin(2 * np.pi * f * t) for f in freqs) / len(freqs)
+        y *= 0.5 + 0.5 * np.sin(2 * np.pi * 0.3 * t)
+        y += self.rng.normal(0.0, 0.1, size=len(t))
+        return (y / np.abs(y).max()).astype(np.float32)
+
+    def close(self):
+        self.tmp.cleanup()
+
+
+# ---------- KNN ----------
+
+@case("knn_predict_single")
+def setup_knn_predict_single(data):
+    X_norm, xmin, xmax = normalize_features(data.X_train)
+    x = (data.X_batch[:1] - xmin) / (xmax - xmin + 1e-8)
+    return lambda: knn_predict(X_norm, data.y_train, x, k=5), 1
+
+
+@case("knn_predict_batch")
+def setup_knn_predict_batch(data):
+    X_norm, xmin, xmax = normalize_features(data.X_train)
+    X = (data.X_batch - xmin) / (xmax - xmin + 1e-8)
+    return lambda: knn_predict(X_norm, data.y_train, X, k=5), len(X)
+
+
+def saved_model(data):
+    from knn_detection import train_and_save_knn
+
+    if not os.path.exists(data.model_path):
+        csv_path = data.path("train.csv")
+        data.train.to_csv(csv_path, index=False)
+        train_and_save_knn(csv_path, k=5, model_path=data.model_path)
+    return data.model_path
+
+
+@case("predict_from_sensors")
+def setup_predict_from_sensors(data):
+    from knn_detection import get_knn_model, predict_from_sensors
+
+    model_path = saved_model(data)
+    get_knn_model(model_path)   # load once, as the service does
+    temp, rh, distance, gas = data.X_batch[0]
+    return lambda: predict_from_sensors(temp, rh, distance, gas, model_path=model_path), 1
+
+
+@case("knn_model_batch")
+def setup_knn_model_batch(data):
+    from knn_detection import get_knn_model
+
+    model = get_knn_model(saved_model(data))
+    return lambda: model.predict(data.X_batch), len(data.X_batch)
+
+
+@case("normalize_features")
+def setup_normalize_features(data):
+    return lambda: normalize_features(data.X_train), len(data.X_train)
+
+
+# ---------- sensor messages ----------
+
+@case("decode_json")
+def setup_decode_json(data):
+    from recognition import decode_sensor_message
+    from replay import format_sensor_json
+
+    messages = [format_sensor_json(r).encode("utf-8") + b"\x00" for r in data.readings]
+
+    def decode_all():
+        for message in messages:
+            decode_sensor_message(message)
+    return decode_all, len(messages)
+
+
+@case("save_sensor_to_csv")
+def setup_save_sensor_to_csv(data):
+    from PatternRecognition import save_sensor_to_csv
+
+    csv_path = data.path("sensor_log.csv")
+    reading = data.readings[0]
+    return lambda: save_sensor_to_csv(reading, csv_path), 1
+
+
+@case("vote")
+def setup_vote(data):
+    from recognition import SensorPipeline
+
+    pipeline = SensorPipeline(knn_model=None)
+    labels = list(data.y_train[:BATCH])
+
+    def vote_all():
+        for label in labels:
+            pipeline.vote(label, 1.0)
+    return vote_all, len(labels)
+
+
+@case("pipeline_process")
+def setup_pipeline_process(data):
+    from knn_detection import get_knn_model
+    from recognition import SensorPipeline
+    from replay import format_sensor_json
+
+    pipeline = SensorPipeline(get_knn_model(saved_model(data)))
+    messages = [format_sensor_json(r).encode("utf-8") + b"\x00" for r in data.readings]
+
+    def process_all():
+        for message in messages:
+            pipeline.process(message)
+    return process_all, len(messages)
+
+
+# ---------- audio ----------
+
+@case("extract_features")
+def setup_extract_features(data):
+    from PatternRecognition import extract_features_from_raw
+
+    window = data.audio[:int(AUDIO_WINDOW_SECONDS * AUDIO_SAMPLE_RATE)]
+    return lambda: extract_features_from_raw(window, AUDIO_SAMPLE_RATE), 1
+
+
+@case("incremental_mfcc")
+def setup_incremental_mfcc(data):
+    from ml_sound.incremental_mfcc import IncrementalMFCC
+
+    extractor = IncrementalMFCC(AUDIO_SAMPLE_RATE, N_MFCC, AUDIO_WINDOW_SECONDS, AUDIO_HOP_SECONDS)
+    window, hop = extractor.window_len, extractor.hop
+    n_hops = (len(data.audio) - window) // hop
+    state = {"i": 0}
+
+    def next_window():
+        # Slide over the synthetic signal; start over at the end
+        i = state["i"] % n_hops
+        if i == 0:
+            extractor.reset()
+        end = window + i * hop
+        extractor.update(data.audio[end - window:end], end)
+        state["i"] += 1
+    return next_window, 1
+
+
+def forest_model():
+    from artifacts import load_audio_artifact
+    return load_audio_artifact(os.path.join("ml_sound", "sound_model"))
+
+
+def sklearn_forest():
+    import joblib
+    return joblib.load(os.path.join("ml_sound", "sound_model.pkl"))["rf"]
+
+
+@case("forest_proba_single")
+def setup_forest_proba_single(data):
+    forest = forest_model()
+    X = data.rng.normal(0.0, 50.0, size=(1, forest.n_features))
+    return lambda: forest.predict_proba(X), 1
+
+
+@case("forest_proba_batch")
+def setup_forest_proba_batch(data):
+    forest = forest_model()
+    X = data.rng.normal(0.0, 50.0, size=(BATCH, forest.n_features))
+    return lambda: forest.predict_proba(X), BATCH
+
+
+@case("sklearn_proba_single")
+def setup_sklearn_proba_single(data):
+    rf = sklearn_forest()
+    X = data.rng.normal(0.0, 50.0, size=(1, rf.n_features_in_))
+    return lambda: rf.predict_proba(X), 1
+
+
+@case("sklearn_proba_batch")
+def setup_sklearn_proba_batch(data):
+    rf = sklearn_forest()
+    X = data.rng.normal(0.0, 50.0, size=(BATCH, rf.n_features_in_))
+    return lambda: rf.predict_proba(X), BATCH
+
+
+# ---------- runner ----------
+
+def time_case(fn, min_runs=MIN_RUNS, min_seconds=MIN_SECONDS):
+    """
+    Seconds per call: median, min and number of runs.
+    """
+    fn()    # warm up (caches, lazy imports)
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_runs or time.perf_counter() - start < min_seconds:
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)), float(np.min(times)), len(times)
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "seed": SEED,
+        "train_rows": TRAIN_ROWS,
+        "batch": BATCH,
+    }
+
+
+def run_suite(names, min_runs=MIN_RUNS, min_seconds=MIN_SECONDS, csv_path=CSV_PATH):
+    data = SyntheticData(csv_path)
+    results = {}
+    try:
+        print(f"{'case':<22s} {'median ms':>10s} {'per item us':>12s} {'runs':>6s}")
+        for name in names:
+            try:
+                fn, items = CASES[name](data)
+            except ImportError as e:
+                print(f"{name:<22s} skipped ({e})")
+                continue
+            median, best, runs = time_case(fn, min_runs, min_seconds)
+            results[name] = {
+                "median_s": median,
+                "min_s": best,
+                "runs": runs,
+                "items": items,
+                "per_item_s": median / items,
+            }
+            print(f"{name:<22s} {median * 1e3:10.3f} {median / items * 1e6:12.2f} {runs:6d}")
+    finally:
+        data.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recognition pipeline hot paths")
+    parser.add_argument("--output", default=RESULTS_PATH, help="JSON results file")
+    parser.add_argument("--only", nargs="+", default=None, help="run cases whose name contains any of these")
+    parser.add_argument("--csv", default=CSV_PATH, help="value distributions for the synthetic readings")
+    parser.add_argument("--min-runs", type=int, default=MIN_RUNS)
+    parser.add_argument("--min-seconds", type=float, default=MIN_SECONDS)
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(CASES))
+        return
+
+    names = [name for name in CASES if args.only is None or any(part in name for part in args.only)]
+    results = run_suite(names, args.min_runs, args.min_seconds, args.csv)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
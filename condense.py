@@ -0,0 +1,196 @@
+"""
+Training-set condensation (prototype selection) for the KNN model.
+
+sensor_log.csv is logged at 1 Hz, so most rows are near-duplicates of
+the rows before them. Keeping all of them makes the model, and the cost
+of every query, grow with logging time without adding accuracy. These
+methods keep a small set of prototypes instead; train_and_save_knn
+stores the prototypes as X_train, so predict_from_sensors and everything
+else that loads the model use them without any change.
+
+Methods (all on normalized features):
+    "grid"  one prototype per occupied grid cell and class: the mean of
+            the rows of that class in the cell. The number of cells stops
+            growing once the feature space is covered, so the model stays
+            the same size however long the log gets.
+    "cnn"   Wilson editing (drop rows their own neighbors outvote), then
+            Hart's condensed nearest neighbor: keep only the rows the
+            prototypes kept so far would misclassify with k neighbors.
+
+Confidences (majority ratios) are computed over prototypes instead of
+raw rows, so they are coarser than those of the full model.
+
+Usage:
+    python condense.py sensor_log.csv                  # evaluate both methods
+    python condense.py sensor_log.csv --method cnn --save
+"""
+import argparse
+
+import numpy as np
+
+from knn_detection import (FEATURES, LABEL_COL, MODEL_PATH, kneighbors,
+                           kneighbors_excluding_self, knn_vote,
+                           normalize_features)
+
+# ======= Configuration =======
+CONDENSE_METHODS = ["grid", "cnn"]
+GRID_RESOLUTION = 0.02   # cell size in normalized units (features span 0..1)
+EDIT_K = 3               # neighbors for Wilson editing
+CNN_BATCH = 64           # rows checked against the prototypes at once
+HOLDOUT_FRACTION = 0.2
+HOLDOUT_BLOCK = 20       # consecutive rows held out together (neighbors are near-duplicates)
+
+
+def knn_codes(X_ref, y_ref, X_query, k):
+    """
+    Predicted label codes of X_query with the rows of X_ref as training set.
+    """
+    codes, _ = knn_vote(y_ref[kneighbors(X_ref, X_query, k)], k)
+    return codes
+
+
+def grid_prototypes(X, y, resolution=GRID_RESOLUTION):
+    """
+    Mean of every (grid cell, class) group.
+
+    Returns:
+        X_proto, y_proto
+    """
+    cells = np.floor(X / resolution).astype(np.int64)
+    keys = np.column_stack([cells, y])
+    _, group, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    group = group.ravel()
+
+    X_proto = np.zeros((len(counts), X.shape[1]))
+    np.add.at(X_proto, group, X)
+    X_proto /= counts[:, None]
+    y_proto = np.empty(len(counts), dtype=y.dtype)
+    y_proto[group] = y
+    return X_proto, y_proto
+
+
+def wilson_edit(X, y, k=EDIT_K):
+    """
+    Boolean mask of the rows kept by Wilson's edited nearest neighbor:
+    rows whose k nearest other rows vote for a different label are noise
+    (or sit on a class boundary) and are dropped.
+    """
+    if len(X) <= k:
+        return np.ones(len(X), dtype=bool)
+    codes, _ = knn_vote(y[kneighbors_excluding_self(X, k)], k)
+    return codes == y
+
+
+def condensed_nearest_neighbor(X, y, k, batch=CNN_BATCH):
+    """
+    Indices of the prototypes chosen by Hart's condensed nearest neighbor.
+
+    Starts with k evenly spaced rows of every class, then repeatedly
+    passes over the other rows, batch by batch, adding the rows the
+    current prototypes misclassify, until a full pass adds nothing.
+    """
+    keep = np.zeros(len(X), dtype=bool)
+    for code in np.unique(y):
+        rows = np.flatnonzero(y == code)
+        keep[rows[np.linspace(0, len(rows) - 1, min(k, len(rows))).astype(int)]] = True
+
+    added = True
+    while added:
+        added = False
+        for start in range(0, len(X), batch):
+            rows = np.arange(start, min(start + batch, len(X)))
+            rows = rows[~keep[rows]]
+            if len(rows) == 0:
+                continue
+            kept = np.flatnonzero(keep)
+            wrong = rows[knn_codes(X[kept], y[kept], X[rows], k) != y[rows]]
+            if len(wrong):
+                keep[wrong] = True
+                added = True
+    return np.flatnonzero(keep)
+
+
+def condense(X, y, k, method):
+    """
+    Prototypes for a normalized training set.
+    y may hold label names or codes.
+
+    Returns:
+        X_proto, y_proto
+    """
+    labels, codes = np.unique(np.asarray(y), return_inverse=True)
+    if method == "grid":
+        X_proto, y_proto = grid_prototypes(X, codes)
+    elif method == "cnn":
+        edited = np.flatnonzero(wilson_edit(X, codes))
+        kept = edited[condensed_nearest_neighbor(X[edited], codes[edited], k)]
+        X_proto, y_proto = X[kept], codes[kept]
+    else:
+        raise ValueError(f"Unknown condensation method: {method} (one of {CONDENSE_METHODS})")
+    return X_proto, labels[y_proto]
+
+
+def holdout_mask(n, fraction=HOLDOUT_FRACTION, block=HOLDOUT_BLOCK):
+    """
+    Held-out rows: whole blocks of consecutive rows, spread evenly over
+    the log, so held-out readings do not have a near-duplicate from the
+    next second in the training part.
+    """
+    every = max(int(round(1 / fraction)), 2)
+    return (np.arange(n) // block) % every == every - 1
+
+
+def evaluate_condensation(X, y, k, method):
+    """
+    Condense the non-held-out rows and compare the full and the condensed
+    training set on the held-out rows.
+
+    Returns a dict with: n_train, n_prototypes, reduction (fraction of
+    rows removed), accuracy_full, accuracy_condensed.
+    """
+    y = np.asarray(y)
+    test = holdout_mask(len(X))
+    X_train, y_train = X[~test], y[~test]
+    X_proto, y_proto = condense(X_train, y_train, k, method)
+
+    labels, codes = np.unique(y, return_inverse=True)
+    full = knn_codes(X_train, codes[~test], X[test], k)
+    condensed = knn_codes(X_proto, np.searchsorted(labels, y_proto), X[test], k)
+    return {
+        "n_train": len(X_train),
+        "n_prototypes": len(X_proto),
+        "reduction": 1.0 - len(X_proto) / len(X_train),
+        "accuracy_full": float(np.mean(full == codes[test])),
+        "accuracy_condensed": float(np.mean(condensed == codes[test])),
+    }
+
+
+def print_evaluation(method, result):
+    print(f"[CONDENSE] {method}: {result['n_train']} -> {result['n_prototypes']} rows "
+          f"({result['reduction']:.1%} removed), held-out accuracy "
+          f"{result['accuracy_full']:.3f} -> {result['accuracy_condensed']:.3f} "
+          f"({result['accuracy_condensed'] - result['accuracy_full']:+.3f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate KNN training-set condensation")
+    parser.add_argument("csv", nargs="?", default="sensor_log.csv")
+    parser.add_argument("--method", choices=CONDENSE_METHODS, nargs="+", default=CONDENSE_METHODS)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--save", action="store_true",
+                        help="train on all rows with the (first) method and save to --model")
+    parser.add_argument("--model", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    from sensor_logger import load_sensor_log
+    df = load_sensor_log(args.csv)
+    X_norm, _, _ = normalize_features(df[FEATURES].values.astype(float))
+    y = df[LABEL_COL].values
+
+    if args.save:
+        # Reports the held-out evaluation itself
+        from knn_detection import train_and_save_knn
+        train_and_save_knn(args.csv, k=args.k, model_path=args.model, condense_method=args.method[0])
+    else:
+        for method in args.method:
+            print_evaluation(method, evaluate_condensation(X_norm, y, args.k, method))
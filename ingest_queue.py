@@ -0,0 +1,125 @@
+"""
+Bounded queue between receiving and processing sensor readings.
+
+PatternRecognition receives and decodes the readings of a stream in one
+task and runs KNN, voting and output in another, with a ReadingQueue in
+between. When processing falls behind (slow inference, a blocked
+console), the policy decides:
+
+    block        once maxsize readings wait, the receiver waits for room,
+                 so the sender sees the backpressure (the pipe fills up);
+                 nothing is lost
+    drop-oldest  once maxsize readings wait, the oldest is dropped for
+                 the new one
+    latest       a new reading replaces whatever still waits, so at most
+                 one (the newest) reading is ever queued; maxsize unused
+
+With drop-oldest and latest the receiver always keeps reading, so the
+sensor bridge never blocks on a slow stage; the results just skip the
+readings that were dropped or coalesced. latest never lets stale
+readings pile up, but also coalesces readings that arrive together in
+one receive (the processor gets the newest of them).
+
+Usage:
+    queue = ReadingQueue(256, "drop-oldest")
+    await queue.put(reading)            # receiver
+    readings = await queue.get_batch()  # processor; [] once closed and empty
+    queue.close()
+"""
+import asyncio
+from collections import deque
+
+# ======= Configuration =======
+QUEUE_SIZE = 256        # readings queued per stream
+QUEUE_POLICIES = ["block", "drop-oldest", "latest"]
+MAX_BATCH = 64          # readings handed to the processor at a time
+
+
+class ReadingQueue:
+    """
+    Bounded FIFO of readings for one asyncio event loop.
+
+    dropped / coalesced / depth: optional metrics (metrics.py) updated
+    along with the queue's own dropped and coalesced counts.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE, policy="block", dropped=None, coalesced=None, depth=None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r} (expected one of {QUEUE_POLICIES})")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.items = deque()
+        self.closed = False
+        self.not_empty = asyncio.Event()
+        self.not_full = asyncio.Event()
+        self.not_full.set()
+
+        # Counters
+        self.dropped = 0
+        self.coalesced = 0
+        self.dropped_metric = dropped
+        self.coalesced_metric = coalesced
+        self.depth_metric = depth
+
+    def __len__(self):
+        return len(self.items)
+
+    def _remove(self, n):
+        for _ in range(n):
+            self.items.popleft()
+        if self.depth_metric is not None:
+            self.depth_metric.dec(n)
+
+    async def put(self, item):
+        """
+        Queue one reading. Returns False (and discards it) once closed.
+        """
+        while self.policy == "block" and len(self.items) >= self.maxsize and not self.closed:
+            self.not_full.clear()
+            await self.not_full.wait()
+        if self.closed:
+            return False
+
+        if self.policy == "latest" and self.items:
+            # processing is behind: the new reading supersedes the queued ones
+            n = len(self.items)
+            self._remove(n)
+            self.coalesced += n
+            if self.coalesced_metric is not None:
+                self.coalesced_metric.inc(n)
+        elif self.policy == "drop-oldest" and len(self.items) >= self.maxsize:
+            self._remove(1)
+            self.dropped += 1
+            if self.dropped_metric is not None:
+                self.dropped_metric.inc()
+
+        self.items.append(item)
+        if self.depth_metric is not None:
+            self.depth_metric.inc()
+        self.not_empty.set()
+        return True
+
+    async def get_batch(self, max_items=MAX_BATCH):
+        """
+        Up to max_items queued readings, oldest first; waits for at least
+        one. Returns [] when the queue is closed and empty.
+        """
+        while not self.items and not self.closed:
+            self.not_empty.clear()
+            await self.not_empty.wait()
+
+        batch = [self.items[i] for i in range(min(max_items, len(self.items)))]
+        self._remove(len(batch))
+        self.not_full.set()
+        return batch
+
+    def close(self):
+        """
+        No more readings: get_batch() returns what is left, then [];
+        blocked and later put() calls return False.
+        """
+        self.closed = True
+        self.not_empty.set()
+        self.not_full.set()
@@ -0,0 +1,213 @@
+"""
+Kalman filter stage for noisy sensor channels (ultrasonic distance first,
+optionally gas and humidity).
+
+A constant-value Kalman filter per channel with outlier gating, like the
+scalar filter that used to be commented out in PatternRecognition.py:
+    - a reading of 0 (ultrasonic dropout) is not used, the prediction is kept
+    - a reading that jumps more than `threshold` from the prediction is not
+      used either, unless the jump persists for more than MAX_REJECTS
+      readings in a row: then the filter restarts at the new value (someone
+      really moved), instead of ignoring the sensor forever
+    - the first usable reading initializes the filter
+
+All state is kept in NumPy arrays, one element per stream, so one update()
+call filters thousands of streams at once. SensorFilter wraps one filter
+per channel and works on sensor_data dicts (one stream) or on columns of
+many streams.
+
+Usage (one stream, before KNN):
+    sensor_filter = SensorFilter(["us_raw", "gas"])
+    sensor_data = sensor_filter.filter(sensor_data)
+    label, conf = predict_from_sensors(...)
+"""
+import math
+
+import numpy as np
+
+# ======= Configuration =======
+# channel: process noise Q, measurement noise R, outlier threshold, 0 = dropout
+CHANNEL_PARAMS = {
+    "us_raw":   {"Q": 50.0, "R": 300.0, "threshold": 600.0, "reject_zero": True},   # mm
+    "gas":      {"Q": 25.0, "R": 100.0, "threshold": 150.0, "reject_zero": True},   # kOhms
+    "humidity": {"Q": 0.5, "R": 1.0, "threshold": 10.0, "reject_zero": False},      # %
+}
+DEFAULT_CHANNELS = ["us_raw"]
+MAX_REJECTS = 3   # consecutive outliers before the filter jumps to the new value
+
+
+class KalmanFilter:
+    """
+    Vectorized 1-D Kalman filter: one independent filter per stream.
+    """
+
+    def __init__(self, n_streams=1, Q=50.0, R=300.0, threshold=600.0,
+                 reject_zero=True, max_rejects=MAX_REJECTS):
+        self.Q = Q
+        self.R = R
+        self.threshold = threshold
+        self.reject_zero = reject_zero
+        self.max_rejects = max_rejects
+
+        self.x = np.zeros(n_streams)
+        self.P = np.full(n_streams, R)
+        self.initialized = np.zeros(n_streams, dtype=bool)
+        self.rejects = np.zeros(n_streams, dtype=np.int64)
+
+        # Counters
+        self.outliers = 0
+        self.dropouts = 0
+        self.restarts = 0
+
+    @property
+    def n_streams(self):
+        return len(self.x)
+
+    def add_streams(self, n):
+        """
+        Make room for n more streams. Returns the index of the first one.
+        """
+        first = self.n_streams
+        self.x = np.concatenate([self.x, np.zeros(n)])
+        self.P = np.concatenate([self.P, np.full(n, self.R)])
+        self.initialized = np.concatenate([self.initialized, np.zeros(n, dtype=bool)])
+        self.rejects = np.concatenate([self.rejects, np.zeros(n, dtype=np.int64)])
+        return first
+
+    def reset(self, idx=None):
+        idx = slice(None) if idx is None else idx
+        self.x[idx] = 0.0
+        self.P[idx] = self.R
+        self.initialized[idx] = False
+        self.rejects[idx] = 0
+
+    def update(self, z, idx=None):
+        """
+        One predict + update step.
+
+        z:   one reading per stream (NaN = no reading), shape (n_streams,)
+             or, with idx, shape (len(idx),)
+        idx: indexes of the streams the readings belong to (no duplicates)
+
+        Returns:
+            filtered values, same shape as z
+        """
+        z = np.asarray(z, dtype=float)
+        sel = slice(None) if idx is None else np.asarray(idx)
+        x = self.x[sel]
+        P = self.P[sel] + self.Q
+        initialized = self.initialized[sel]
+        rejects = self.rejects[sel]
+
+        usable = np.isfinite(z)
+        if self.reject_zero:
+            dropout = usable & (z == 0)
+            usable &= ~dropout
+            self.dropouts += int(dropout.sum())
+
+        with np.errstate(invalid="ignore"):
+            jump = usable & initialized & (np.abs(z - x) > self.threshold)
+        rejects = np.where(jump, rejects + 1, np.where(usable, 0, rejects))
+        restart = jump & (rejects > self.max_rejects)
+        start = (usable & ~initialized) | restart
+        accept = usable & initialized & ~jump
+
+        # Normal update where accepted, prediction only where not
+        K = P / (P + self.R)
+        x = np.where(accept, x + K * (z - x), x)
+        P = np.where(accept, (1.0 - K) * P, P)
+
+        # (Re)start at the reading
+        x = np.where(start, z, x)
+        P = np.where(start, self.R, P)
+        rejects = np.where(restart, 0, rejects)
+
+        self.x[sel] = x
+        self.P[sel] = P
+        self.initialized[sel] = initialized | usable
+        self.rejects[sel] = rejects
+        self.outliers += int((jump & ~restart).sum())
+        self.restarts += int(restart.sum())
+
+        # Never initialized: pass the reading through
+        return np.where(self.initialized[sel], x, z)
+
+    def step(self, z, i=0):
+        """
+        update() for a single reading of stream i, without array overhead.
+        Same result as update([z], [i])[0].
+        """
+        x = float(self.x[i])
+        P = float(self.P[i]) + self.Q
+        initialized = bool(self.initialized[i])
+        rejects = int(self.rejects[i])
+
+        usable = math.isfinite(z)
+        if usable and self.reject_zero and z == 0:
+            usable = False
+            self.dropouts += 1
+
+        if not usable:
+            pass
+        elif not initialized:
+            x, P, initialized = z, self.R, True
+        elif abs(z - x) > self.threshold:
+            rejects += 1
+            if rejects > self.max_rejects:
+                x, P, rejects = z, self.R, 0
+                self.restarts += 1
+            else:
+                self.outliers += 1
+        else:
+            K = P / (P + self.R)
+            x = x + K * (z - x)
+            P = (1.0 - K) * P
+            rejects = 0
+
+        self.x[i] = x
+        self.P[i] = P
+        self.initialized[i] = initialized
+        self.rejects[i] = rejects
+        return x if initialized else z
+
+
+class SensorFilter:
+    """
+    Kalman filters for several channels of sensor_data.
+
+    filter() is for a single stream, one reading at a time.
+    filter_columns() updates many streams at once: it takes one array per
+    channel with one reading per stream.
+    """
+
+    def __init__(self, channels=None, n_streams=1, params=None):
+        self.channels = list(DEFAULT_CHANNELS if channels is None else channels)
+        params = {**CHANNEL_PARAMS, **(params or {})}
+        unknown = [c for c in self.channels if c not in params]
+        if unknown:
+            raise ValueError(f"No Kalman parameters for channels: {unknown}")
+        self.filters = {c: KalmanFilter(n_streams, **params[c]) for c in self.channels}
+
+    def filter(self, sensor_data):
+        """
+        Copy of sensor_data with the filtered channels replaced.
+        """
+        filtered = dict(sensor_data)
+        for channel, kf in self.filters.items():
+            filtered[channel] = kf.step(float(sensor_data[channel]))
+        return filtered
+
+    def filter_columns(self, columns, idx=None):
+        """
+        Filtered copy of columns (dict channel -> array, one reading per stream).
+        """
+        filtered = dict(columns)
+        for channel, kf in self.filters.items():
+            filtered[channel] = kf.update(columns[channel], idx)
+        return filtered
+
+    def stats(self):
+        return {
+            channel: {"outliers": kf.outliers, "dropouts": kf.dropouts, "restarts": kf.restarts}
+            for channel, kf in self.filters.items()
+        }
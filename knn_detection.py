@@ -1,16 +1,33 @@
+import os
 import numpy as np
-import pandas as pd
-from collections import Counter
 import pickle
 
+from artifacts import artifact_matches, is_artifact, load_artifact, model_mtime, save_artifact
+from sensor_logger import load_sensor_log
+
 # ======= Configuration =======
 # Column names in your CSV file
 FEATURES = ["temperature", "humidity", "us_raw", "gas"]  # change if needed
 LABEL_COL = "status"  # the column with "cooking nearby"/"not cooking"/"cooking away"
 
-# Path to save the trained KNN "model"
+# Path to save the trained KNN "model". A pickle-free copy (artifacts.py)
+# is saved next to it without the .pkl and is what gets loaded.
 MODEL_PATH = "knn_cooking_model.pkl"
 
+# Spatial index over the normalized training set: "kd_tree", "ball_tree",
+# "brute" (no index) or "auto" (kd_tree once the set is large enough)
+INDEX_TYPE = "auto"
+# Below this many training rows a brute-force scan is faster than an index
+# (see benchmarks/knn_index.py)
+INDEX_MIN_SAMPLES = 5000
+INDEX_LEAF_SIZE = 40
+# Bytes of distance matrix (test chunk x training rows) a brute-force scan
+# works on at a time
+DISTANCE_MEMORY = 64 * 1024 * 1024
+
+# Keep only prototypes of the training set (see condense.py): None, "grid" or "cnn"
+CONDENSE_METHOD = None
+
 
 # ======= Helper functions =======
 
@@ -37,6 +54,130 @@ def euclidean_distance(a, b):
     return np.linalg.norm(a - b)
 
 
+def knn_vote(neighbor_labels, k):
+    """
+    Majority vote over the label codes of each row's k nearest neighbors.
+    neighbor_labels: 2D int array (n_samples, k), nearest neighbor first.
+
+    Ties are broken the same way as Counter.most_common: the label that
+    appears first (i.e. closest) among the neighbors wins.
+
+    Returns:
+        codes:       1D array of winning label codes
+        confidences: 1D array of confidence scores (majority ratio)
+    """
+    n, kk = neighbor_labels.shape
+    n_labels = int(neighbor_labels.max()) + 1 if neighbor_labels.size else 1
+    rows = np.arange(n)[:, None]
+
+    counts = np.zeros((n, n_labels), dtype=int)
+    np.add.at(counts, (rows, neighbor_labels), 1)
+
+    # Position of the first neighbor with each label (kk if absent)
+    first_pos = np.full((n, n_labels), kk, dtype=int)
+    positions = np.broadcast_to(np.arange(kk), (n, kk))
+    np.minimum.at(first_pos, (rows, neighbor_labels), positions)
+
+    score = counts * (kk + 1) - first_pos
+    codes = score.argmax(axis=1)
+    confidences = counts[np.arange(n), codes] / k
+    return codes, confidences
+
+
+def nearest_neighbors(X_train, X_test, k, chunk_size=1024, memory=DISTANCE_MEMORY):
+    """
+    Indices of the k nearest training rows for every test row,
+    sorted from nearest to farthest.
+
+    Distances are computed for a whole chunk of test rows at once and the
+    k smallest are picked with a partial selection (argpartition) instead
+    of a full sort. A chunk has at most chunk_size rows, fewer for a large
+    training set, so the distance matrix and its two temporaries of the
+    same size (feature differences, argpartition result) stay within
+    memory bytes.
+    """
+    X_test = np.asarray(X_test, dtype=float)
+    n_train = len(X_train)
+    k = min(k, n_train)
+    indices = np.empty((len(X_test), k), dtype=np.intp)
+    chunk_size = max(1, min(chunk_size, memory // (3 * 8 * max(n_train, 1))))
+
+    for start in range(0, len(X_test), chunk_size):
+        chunk = X_test[start:start + chunk_size]
+        # Squared distances one feature at a time: exact differences (no
+        # a^2 - 2ab + b^2 cancellation), never a chunk x n_train x d array
+        dist = np.zeros((len(chunk), n_train))
+        for j in range(X_train.shape[1]):
+            diff = chunk[:, j, None] - X_train[None, :, j]
+            diff *= diff
+            dist += diff
+
+        if k < n_train:
+            part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(n_train), (len(chunk), n_train))
+        part_dist = np.take_along_axis(dist, part, axis=1)
+        # Order the selected neighbors by (distance, training row)
+        order = np.lexsort((part, part_dist), axis=1)
+        indices[start:start + len(chunk)] = np.take_along_axis(part, order, axis=1)
+
+    return indices
+
+
+def build_index(X_norm, index_type=INDEX_TYPE, leaf_size=INDEX_LEAF_SIZE):
+    """
+    Build a spatial index (KD-tree or ball tree) over normalized features.
+    Returns None when brute force should be used instead.
+    """
+    if index_type == "auto":
+        index_type = "kd_tree" if len(X_norm) >= INDEX_MIN_SAMPLES else "brute"
+
+    if index_type == "brute":
+        return None
+    if index_type == "kd_tree":
+        from sklearn.neighbors import KDTree
+        return KDTree(X_norm, leaf_size=leaf_size)
+    if index_type == "ball_tree":
+        from sklearn.neighbors import BallTree
+        return BallTree(X_norm, leaf_size=leaf_size)
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def index_neighbors(index, X_test, k):
+    """
+    Indices of the k nearest training rows from a spatial index,
+    sorted the same way as nearest_neighbors (distance, then training row).
+    """
+    dist, ind = index.query(np.asarray(X_test, dtype=float), k=k)
+    order = np.lexsort((ind, dist), axis=1)
+    return np.take_along_axis(ind, order, axis=1)
+
+
+def kneighbors(X_train, X_test, k, index_type=INDEX_TYPE):
+    """
+    Indices of the k nearest training rows for every test row, through a
+    spatial index when the training set is large enough (see build_index).
+    """
+    X_train = np.asarray(X_train, dtype=float)
+    k = min(k, len(X_train))
+    index = build_index(X_train, index_type)
+    if index is None:
+        return nearest_neighbors(X_train, X_test, k)
+    return index_neighbors(index, X_test, k)
+
+
+def kneighbors_excluding_self(X, k, index_type=INDEX_TYPE):
+    """
+    Indices of the k nearest other rows of X for every row of X
+    (leave-one-out neighbor lists).
+    """
+    neighbors = kneighbors(X, X, k + 1, index_type)
+    # Drop each row itself; with exact duplicates it is not always first
+    not_self = neighbors != np.arange(len(X))[:, None]
+    columns = np.argsort(~not_self, axis=1, kind="stable")[:, :min(k, len(X) - 1)]
+    return np.take_along_axis(neighbors, columns, axis=1)
+
+
 def knn_predict(X_train, y_train, X_test, k=5):
     """
     Simple KNN classifier.
@@ -49,29 +190,110 @@ def knn_predict(X_train, y_train, X_test, k=5):
         predictions: array of predicted labels
         confidences: array of confidence scores (majority ratio)
     """
-    predictions = []
-    confidences = []
+    labels, y_codes = np.unique(y_train, return_inverse=True)
+    k_indices = nearest_neighbors(np.asarray(X_train, dtype=float), X_test, k)
+    codes, confidences = knn_vote(y_codes[k_indices], k)
+    return labels[codes], confidences
 
-    for test_point in X_test:
-        # Compute distance from test_point to all training points
-        distances = [euclidean_distance(test_point, x) for x in X_train]
 
-        # Indices of the k nearest neighbors
-        k_indices = np.argsort(distances)[:k]
-        k_labels = [y_train[i] for i in k_indices]
-
-        # Majority vote
-        counts = Counter(k_labels)
-        most_common_label, count = counts.most_common(1)[0]
-        confidence = count / k
-
-        predictions.append(most_common_label)
-        confidences.append(confidence)
-
-    return np.array(predictions), np.array(confidences)
+class KNNModel:
+    """
+    In-memory KNN inference engine.
 
+    Loads the saved model once and keeps the normalized training set,
+    the encoded labels and the normalization scale around, so a single
+    sample or a whole batch can be classified without touching the disk.
+    """
 
-def train_and_save_knn(csv_path, k=5, model_path=MODEL_PATH):
+    def __init__(self, X_train, y_train, xmin, xmax, k=5, features=FEATURES,
+                 index=None, labels=None, y_codes=None):
+        # float64 memory-mapped arrays (artifacts) are used as they are, not copied
+        self.X_train = np.asarray(X_train, dtype=float)
+        self.xmin = np.asarray(xmin, dtype=float)
+        self.xmax = np.asarray(xmax, dtype=float)
+        self.k = k
+        self.features = list(features)
+        # Optional KD-tree / ball tree; None means brute force
+        self.index = index
+
+        # Same denominator as normalize_features, computed once
+        self.scale = self.xmax - self.xmin + 1e-8
+        if labels is not None:
+            # Already encoded (artifact)
+            self.labels, self.y_codes = np.asarray(labels), np.asarray(y_codes)
+        else:
+            self.labels, self.y_codes = np.unique(np.asarray(y_train), return_inverse=True)
+
+    @property
+    def y_train(self):
+        return self.labels[self.y_codes]
+
+    @classmethod
+    def from_dict(cls, model):
+        """
+        Build the engine from a model dictionary (see train_and_save_knn
+        and load_knn_model).
+        """
+        return cls(
+            X_train=model["X_train"],
+            y_train=model.get("y_train"),
+            xmin=model["xmin"],
+            xmax=model["xmax"],
+            k=model["k"],
+            features=model.get("features", FEATURES),
+            index=model.get("index"),
+            labels=model.get("labels"),
+            y_codes=model.get("y_codes"),
+        )
+
+    @classmethod
+    def load(cls, model_path=MODEL_PATH):
+        """
+        Load the saved KNN model from disk.
+        """
+        return cls.from_dict(load_knn_model(model_path))
+
+    def normalize(self, X):
+        """
+        Min-max normalize raw feature rows with the training xmin/xmax.
+        """
+        return (np.asarray(X, dtype=float) - self.xmin) / self.scale
+
+    def kneighbors(self, X_norm):
+        """
+        Indices of the k nearest training rows for normalized samples.
+        """
+        if self.index is not None:
+            return index_neighbors(self.index, X_norm, min(self.k, len(self.X_train)))
+        return nearest_neighbors(self.X_train, X_norm, self.k)
+
+    def predict(self, X):
+        """
+        Predict a batch of raw (not normalized) feature rows,
+        columns in the order of self.features.
+
+        Returns:
+            predictions: array of predicted labels
+            confidences: array of confidence scores (majority ratio)
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        k_indices = self.kneighbors(self.normalize(X))
+        codes, confidences = knn_vote(self.y_codes[k_indices], self.k)
+        return self.labels[codes], confidences
+
+    def predict_one(self, temp, rh, distance, air_quality):
+        """
+        Predict the cooking status for one sensor reading.
+
+        Returns:
+            predicted_label, confidence
+        """
+        pred, conf = self.predict([[temp, rh, distance, air_quality]])
+        return pred[0], conf[0]
+
+
+def train_and_save_knn(csv_path, k=5, model_path=MODEL_PATH, index_type=INDEX_TYPE,
+                       condense_method=CONDENSE_METHOD):
     """
     Train KNN on the full labeled dataset and save the "model" information.
     The model here is simply:
@@ -79,9 +301,14 @@ def train_and_save_knn(csv_path, k=5, model_path=MODEL_PATH):
         - labels
         - min and max for each feature (for normalization)
         - k value
+        - spatial index over the normalized features (None for brute force)
+
+    With condense_method, the training features and labels are the
+    prototypes condense.py selects from all rows, and the reduction and
+    held-out accuracy change are printed first.
     """
-    # Read data
-    df = pd.read_csv(csv_path)
+    # Read data (CSV, or logged .npz / .parquet files, see sensor_logger.py)
+    df = load_sensor_log(csv_path)
 
     # Extract features and labels
     X = df[FEATURES].values.astype(float)
@@ -89,6 +316,12 @@ def train_and_save_knn(csv_path, k=5, model_path=MODEL_PATH):
 
     # Normalize features
     X_norm, xmin, xmax = normalize_features(X)
+    n_samples = len(y)
+
+    if condense_method is not None:
+        from condense import condense, evaluate_condensation, print_evaluation
+        print_evaluation(condense_method, evaluate_condensation(X_norm, y, k, condense_method))
+        X_norm, y = condense(X_norm, y, k, condense_method)
 
     # Pack everything into a dictionary
     model = {
@@ -98,51 +331,171 @@ def train_and_save_knn(csv_path, k=5, model_path=MODEL_PATH):
         "xmax": xmax,
         "k": k,
         "features": FEATURES,
+        "index": build_index(X_norm, index_type),
+        "condense_method": condense_method,
+        "n_samples": n_samples,
     }
 
-    # Save model to disk
+    # Save model to disk, and the pickle-free artifact next to it
     with open(model_path, "wb") as f:
         pickle.dump(model, f)
+    save_knn_artifact(model, os.path.splitext(model_path)[0], source=model_path)
+
+    index_name = type(model["index"]).__name__ if model["index"] is not None else "brute force"
+    if condense_method is not None:
+        index_name = f"{len(y)} {condense_method} prototypes, {index_name}"
+    print(f"Model trained with {n_samples} samples ({index_name}) and saved to: {model_path}")
+
+
+def index_type_of(index):
+    if index is None:
+        return "brute"
+    return "kd_tree" if type(index).__name__ == "KDTree" else "ball_tree"
+
+
+def index_arrays(index, X_train):
+    """
+    The node arrays of a KD-tree / ball tree over X_train, for an artifact.
 
-    print(f"Model trained with {len(y)} samples and saved to: {model_path}")
+    Returns:
+        arrays (dict name -> array), meta (dict), or None, None if the
+        tree cannot be stored (not built over X_train, unknown layout)
+    """
+    import sklearn
+
+    state = index.__getstate__()
+    # (data, idx_array, node_data, node_bounds, 7 ints, dist_metric, sample_weight)
+    if len(state) != 13 or state[12] is not None or not np.array_equal(state[0], X_train):
+        return None, None
+    arrays = {"index_idx": state[1], "index_node_data": state[2], "index_node_bounds": state[3]}
+    meta = {"sklearn": sklearn.__version__, "scalars": [int(v) for v in state[4:11]]}
+    return arrays, meta
+
+
+def restore_index(index_type, X_train, arrays, meta):
+    """
+    A KD-tree / ball tree on the stored node arrays and X_train, all used
+    as they are (memory-mapped), or None if they were saved by another
+    scikit-learn version or do not fit.
+    """
+    import sklearn
+    from sklearn.metrics import DistanceMetric
+    from sklearn.neighbors import BallTree, KDTree
+
+    if not meta or meta.get("sklearn") != sklearn.__version__ or "index_idx" not in arrays:
+        return None
+    cls = KDTree if index_type == "kd_tree" else BallTree
+    index = cls.__new__(cls)
+    try:
+        index.__setstate__((X_train, arrays["index_idx"], arrays["index_node_data"],
+                            arrays["index_node_bounds"], *meta["scalars"],
+                            DistanceMetric.get_metric("euclidean"), None))
+    except (TypeError, ValueError):
+        return None
+    return index
+
+
+def save_knn_artifact(model, path, source=None):
+    """
+    Save a KNN model dictionary as a pickle-free artifact (artifacts.py).
+    A KD-tree / ball tree is stored as its node arrays, so loading maps it
+    like the training set instead of rebuilding (and copying) it; it is
+    rebuilt only when the artifact comes from another scikit-learn version.
+    """
+    labels, y_codes = np.unique(np.asarray(model["y_train"]), return_inverse=True)
+    meta = {
+        "k": int(model["k"]),
+        "features": list(model.get("features", FEATURES)),
+        "labels": [str(label) for label in labels],
+        "index_type": index_type_of(model.get("index")),
+        "condense_method": model.get("condense_method"),
+        "n_samples": int(model.get("n_samples", len(y_codes))),
+    }
+    arrays = {
+        "X_train": np.asarray(model["X_train"], dtype=np.float64),
+        "y_codes": y_codes.astype(np.int32),
+        "xmin": np.asarray(model["xmin"], dtype=np.float64),
+        "xmax": np.asarray(model["xmax"], dtype=np.float64),
+    }
+    if model.get("index") is not None:
+        tree_arrays, meta["index"] = index_arrays(model["index"], arrays["X_train"])
+        arrays.update(tree_arrays or {})
+    save_artifact(path, "knn", meta, arrays, source)
 
 
 def load_knn_model(model_path=MODEL_PATH):
     """
-    Load the saved KNN model dictionary from disk.
+    Load the saved KNN model dictionary from disk: a pickle, or an
+    artifact directory (arrays memory-mapped, nothing unpickled).
     """
+    if is_artifact(model_path):
+        meta, arrays = load_artifact(model_path, "knn")
+        index_type = meta["index_type"]
+        index = None
+        if index_type != "brute":
+            index = (restore_index(index_type, arrays["X_train"], arrays, meta.get("index"))
+                     or build_index(arrays["X_train"], index_type))
+        return {
+            "X_train": arrays["X_train"],
+            "labels": np.array(meta["labels"], dtype=object),   # plain str labels, like the pickle
+            "y_codes": arrays["y_codes"],
+            "xmin": arrays["xmin"],
+            "xmax": arrays["xmax"],
+            "k": meta["k"],
+            "features": meta["features"],
+            "condense_method": meta.get("condense_method"),
+            "n_samples": meta.get("n_samples"),
+            "index": index,
+        }
+
     with open(model_path, "rb") as f:
         model = pickle.load(f)
     return model
 
 
-def predict_from_sensors(temp, rh, distance, air_quality, model_path=MODEL_PATH):
+def artifact_path_for(model_path):
     """
-    Load the saved KNN model and predict the cooking status
-    for one new sensor reading.
-
-    Returns:
-        predicted_label: one of "cooking nearby"/"not cooking"/"cooking away"
-        confidence:      majority ratio (0~1)
+    The artifact converted from the pickle model_path (same name without
+    .pkl), if it exists and still matches the pickle; else None.
     """
-    model = load_knn_model(model_path)
+    stem, ext = os.path.splitext(model_path)
+    if ext == ".pkl" and artifact_matches(stem, model_path):
+        return stem
+    return None
+
 
-    X_train = model["X_train"]
-    y_train = model["y_train"]
-    xmin = model["xmin"]
-    xmax = model["xmax"]
-    k = model["k"]
+# Loaded engines, keyed by model path. Reloaded if the file changes.
+_model_cache = {}
 
-    # Build a 2D array for a single sample
-    new_sample = np.array([[temp, rh, distance, air_quality]], dtype=float)
 
-    # Normalize using training xmin/xmax
-    new_sample_norm, _, _ = normalize_features(new_sample, xmin, xmax)
+def get_knn_model(model_path=MODEL_PATH):
+    """
+    Return a cached KNNModel for model_path (a pickle or an artifact).
+    For a pickle, its artifact is loaded instead when it is up to date.
+    The model is only read again if a modification time changed.
+    """
+    stem = os.path.splitext(model_path)[0]
+    mtime = (model_mtime(model_path) if os.path.exists(model_path) else None,
+             model_mtime(stem) if is_artifact(stem) else None)
+    key = os.path.abspath(model_path)
+    cached = _model_cache.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, KNNModel.load(artifact_path_for(model_path) or model_path))
+        _model_cache[key] = cached
+    return cached[1]
+
 
-    # Use the same KNN function as before
-    pred, conf = knn_predict(X_train, y_train, new_sample_norm, k=k)
+def predict_from_sensors(temp, rh, distance, air_quality, model_path=MODEL_PATH):
+    """
+    Predict the cooking status for one new sensor reading,
+    using the cached KNN model for model_path.
 
-    return pred[0], conf[0]
+    Returns:
+        predicted_label: one of "cooking nearby"/"not cooking"/"cooking away"
+        confidence:      majority ratio (0~1)
+    """
+    model = get_knn_model(model_path)
+    return model.predict_one(temp, rh, distance, air_quality)
 
 
 # ======= Example usage =======
@@ -0,0 +1,158 @@
+"""
+Cross-validation and k selection for the KNN model.
+
+Neighbor lists are computed once per fold for the largest candidate k
+(sorted from nearest to farthest, through a KD-tree on large logs), and
+every candidate k is scored from the first k columns of the same lists,
+so trying more values of k costs one vote each instead of one distance
+computation each.
+
+Folds:
+    loo      leave-one-out: every row against all other rows
+    grouped  k-fold with whole recording sessions held out together, so
+             near-duplicate readings of the same session are never on
+             both sides. Sessions come from a "session" column, else from
+             gaps in the timestamp column, else from blocks of
+             consecutive rows.
+
+Reports accuracy per candidate k, the time one reading takes to classify
+with that k (KNNModel.predict, as served), and the confusion matrix of
+the best k.
+
+Usage:
+    python knn_eval.py sensor_log.csv
+    python knn_eval.py sensor_log.csv --folds grouped --n-folds 5 --k 1 3 5 7 9 15
+"""
+import argparse
+import time
+
+import numpy as np
+
+from knn_detection import (FEATURES, LABEL_COL, KNNModel, build_index, kneighbors,
+                           kneighbors_excluding_self, knn_vote,
+                           normalize_features)
+from sensor_logger import TIMESTAMP_COL, load_sensor_log
+
+# ======= Configuration =======
+K_CANDIDATES = [1, 3, 5, 7, 9, 11, 15, 21]
+N_FOLDS = 5
+SESSION_COL = "session"
+SESSION_GAP = 60.0      # seconds without readings that start a new session
+SESSION_BLOCK = 60      # rows per session when there is no timestamp
+COST_SAMPLES = 200      # single readings timed per candidate k
+
+
+def session_ids(df):
+    """
+    Recording session of every row (see module docstring).
+    """
+    if SESSION_COL in df.columns:
+        return np.unique(df[SESSION_COL].values, return_inverse=True)[1]
+    if TIMESTAMP_COL in df.columns:
+        timestamps = df[TIMESTAMP_COL].values.astype(float)
+        return np.concatenate([[0], np.cumsum(np.diff(timestamps) > SESSION_GAP)])
+    return np.arange(len(df)) // SESSION_BLOCK
+
+
+def grouped_folds(groups, n_folds):
+    """
+    Test masks of n_folds folds; every group is in exactly one of them.
+    Groups are dealt to the folds in order (round robin).
+    """
+    fold_of_group = np.arange(groups.max() + 1) % n_folds
+    return [fold_of_group[groups] == fold for fold in range(n_folds)]
+
+
+def cross_validate(X, y_codes, k_values, folds="loo", groups=None, n_folds=N_FOLDS):
+    """
+    Predicted label code of every row for every k in k_values.
+
+    Returns:
+        dict k -> 1D array of predicted codes (one per row of X)
+    """
+    k_max = max(k_values)
+    predictions = {k: np.empty(len(X), dtype=np.intp) for k in k_values}
+
+    if folds == "loo":
+        splits = [(np.arange(len(X)), kneighbors_excluding_self(X, k_max))]
+    elif folds == "grouped":
+        splits = []
+        for test in grouped_folds(groups, n_folds):
+            train_rows, test_rows = np.flatnonzero(~test), np.flatnonzero(test)
+            if len(test_rows) == 0 or len(train_rows) == 0:
+                continue
+            neighbors = kneighbors(X[train_rows], X[test_rows], k_max)
+            splits.append((test_rows, train_rows[neighbors]))
+    else:
+        raise ValueError(f"Unknown folds: {folds}")
+
+    for test_rows, neighbors in splits:
+        neighbor_codes = y_codes[neighbors]
+        for k in k_values:
+            codes, _ = knn_vote(neighbor_codes[:, :k], k)
+            predictions[k][test_rows] = codes
+    return predictions
+
+
+def confusion_matrix(y_true, y_pred, n_labels):
+    """
+    counts[true, predicted]
+    """
+    return np.bincount(y_true * n_labels + y_pred, minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+
+
+def inference_cost(model, k, samples=COST_SAMPLES):
+    """
+    Seconds to classify one raw reading with model (trained on all rows)
+    when it uses k neighbors.
+    """
+    rows = np.linspace(0, len(model.X_train) - 1, min(samples, len(model.X_train))).astype(int)
+    X_raw = model.X_train[rows] * model.scale + model.xmin
+    model.k = k
+    model.predict(X_raw[:1])     # warm up
+    start = time.perf_counter()
+    for row in X_raw:
+        model.predict(row[None, :])
+    return (time.perf_counter() - start) / len(rows)
+
+
+def print_confusion(labels, counts):
+    width = max(len(str(label)) for label in labels)
+    print(f"{'true/pred':>{width}s}  " + "  ".join(f"{str(label):>{width}s}" for label in labels))
+    for label, row in zip(labels, counts):
+        print(f"{str(label):>{width}s}  " + "  ".join(f"{n:>{width}d}" for n in row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validate the KNN model and pick k")
+    parser.add_argument("csv", nargs="?", default="sensor_log.csv")
+    parser.add_argument("--k", type=int, nargs="+", default=K_CANDIDATES, help="candidate k values")
+    parser.add_argument("--folds", choices=["loo", "grouped"], default="loo")
+    parser.add_argument("--n-folds", type=int, default=N_FOLDS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = load_sensor_log(args.csv)
+    X_norm, xmin, xmax = normalize_features(df[FEATURES].values.astype(float))
+    labels, y_codes = np.unique(df[LABEL_COL].values, return_inverse=True)
+    groups = session_ids(df) if args.folds == "grouped" else None
+    k_values = sorted(set(args.k))
+
+    predictions = cross_validate(X_norm, y_codes, k_values, args.folds, groups, args.n_folds)
+    elapsed = time.perf_counter() - start
+
+    fold_name = "leave-one-out" if args.folds == "loo" else \
+        f"{args.n_folds}-fold grouped by session ({groups.max() + 1} sessions)"
+    print(f"{len(X_norm)} rows, {len(labels)} labels, {fold_name}, {elapsed:.2f} s")
+    print(f"{'k':>4s} {'accuracy':>9s} {'us/reading':>11s}")
+    model = KNNModel(X_norm, df[LABEL_COL].values, xmin, xmax, index=build_index(X_norm))
+    accuracy = {}
+    for k in k_values:
+        accuracy[k] = float(np.mean(predictions[k] == y_codes))
+        cost = inference_cost(model, k)
+        print(f"{k:4d} {accuracy[k]:9.3f} {cost * 1e6:11.1f}")
+
+    # Highest accuracy; the smallest (cheapest) k on ties
+    best_k = max(k_values, key=lambda k: (accuracy[k], -k))
+    print(f"\nBest k = {best_k} (accuracy {accuracy[best_k]:.3f}). Confusion matrix:")
+    print_confusion(labels, confusion_matrix(y_codes, predictions[best_k], len(labels)))
@@ -2,6 +2,8 @@
 #include "WinPipe.h"
 #include <sstream>
 #include <iomanip>
+#include <cstdint>
+#include <cstring>
 
 
 struct SensorData
@@ -164,12 +166,83 @@ string sensorDataToJson(const SensorData& data) {
 }
 
 
-[[noreturn]] int main()
+/***
+ * Binary sensor frame: header + the SensorData fields, packed little-endian.
+ * Must match the layout in sensor_frame.py.
+ */
+const uint8_t FRAME_MAGIC = 0xB5;
+const uint8_t FRAME_VERSION = 1;
+
+#pragma pack(push, 1)
+struct SensorFrame
+{
+    uint8_t magic;
+    uint8_t version;
+    uint16_t length;    // payload size in bytes
+    float temperature;
+    float humidity;
+    float pressure;
+    float gas;
+    float altitude;
+    float xg;
+    float yg;
+    float zg;
+    int32_t mic;
+    int32_t emf;
+    int32_t light;
+    int32_t ain;
+    float vMic;
+    float vEmf;
+    float vLight;
+    float vAin;
+    float us_raw;
+    float us_compensated;
+    double time_of_flight;
+};
+#pragma pack(pop)
+
+static_assert(sizeof(SensorFrame) == 84, "SensorFrame layout must match sensor_frame.py");
+
+
+/***
+ * Convert sensor data to a binary frame
+ */
+string sensorDataToBinary(const SensorData& data) {
+    SensorFrame frame{};
+    frame.magic = FRAME_MAGIC;
+    frame.version = FRAME_VERSION;
+    frame.length = sizeof(SensorFrame) - 4;
+    frame.temperature = data.temperature;
+    frame.humidity = data.humidity;
+    frame.pressure = data.pressure;
+    frame.gas = data.gas;
+    frame.altitude = data.altitude;
+    frame.xg = data.xg;
+    frame.yg = data.yg;
+    frame.zg = data.zg;
+    frame.mic = data.mic;
+    frame.emf = data.emf;
+    frame.light = data.light;
+    frame.ain = data.ain;
+    frame.vMic = data.vMic;
+    frame.vEmf = data.vEmf;
+    frame.vLight = data.vLight;
+    frame.vAin = data.vAin;
+    frame.us_raw = data.us_raw;
+    frame.us_compensated = data.us_compensated;
+    frame.time_of_flight = data.time_of_flight;
+    return {reinterpret_cast<const char*>(&frame), sizeof(frame)};
+}
+
+
+[[noreturn]] int main(int argc, char* argv[])
 {
     SerialReader reader;
     WinPipe pipe;
     const char* port = "COM4";
     const char* pipeName = R"(\\.\pipe\test_pipe)";
+    // Send binary frames instead of JSON (pass --binary)
+    bool useBinary = argc > 1 && strcmp(argv[1], "--binary") == 0;
 
     if (reader.connect(port))
     {
@@ -182,8 +255,15 @@ string sensorDataToJson(const SensorData& data) {
                 {
                     SensorData sensor_data{};
                     parseData(raw_data, sensor_data);
-                    string json_data = sensorDataToJson(sensor_data);
-                    pipe.send(json_data.c_str(), json_data.length()+1);
+                    if (useBinary)
+                    {
+                        string frame = sensorDataToBinary(sensor_data);
+                        pipe.send(frame.data(), frame.length());
+                    } else
+                    {
+                        string json_data = sensorDataToJson(sensor_data);
+                        pipe.send(json_data.c_str(), json_data.length()+1);
+                    }
                 }
             }
         }
@@ -0,0 +1,252 @@
+"""
+Low-overhead counters, gauges and latency histograms for the recognition service.
+
+Metrics live in one process-wide registry (metrics). Histograms have
+fixed buckets, so observe() is a binary search and two additions, well
+under a microsecond; nothing is locked (every metric is updated from one
+thread at a time in this service; a rare lost update under contention is
+acceptable for monitoring).
+
+They can be read three ways:
+    - serve_metrics(port): localhost HTTP endpoint, GET /metrics returns
+      the Prometheus text exposition format
+    - start_summary(interval): a one-line summary printed periodically
+    - metrics.render() / metrics.summary() directly
+
+metrics.disable() turns every observe() / inc() into a no-op.
+
+Usage:
+    from metrics import metrics
+    DECODE = metrics.histogram("sensor_stage_seconds", "Time per stage", stage="decode")
+    MESSAGES = metrics.counter("sensor_messages_total", "Messages received")
+
+    t0 = time.perf_counter()
+    ...
+    DECODE.observe(time.perf_counter() - t0)
+    MESSAGES.inc()
+"""
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ======= Configuration =======
+# Upper bounds in seconds (a last +Inf bucket is implied)
+BUCKETS = [
+    5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+]
+METRICS_HOST = "127.0.0.1"
+
+
+class Counter:
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = 0
+        self.enabled = True
+
+    def inc(self, amount=1):
+        if self.enabled:
+            self.value += amount
+
+
+class Gauge(Counter):
+    """
+    A value that goes up and down (e.g. queue depth).
+    """
+
+    def dec(self, amount=1):
+        if self.enabled:
+            self.value -= amount
+
+    def set(self, value):
+        if self.enabled:
+            self.value = value
+
+
+class Histogram:
+    def __init__(self, labels, buckets=BUCKETS):
+        self.labels = labels
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # per bucket, not cumulative
+        self.count = 0
+        self.sum = 0.0
+        self.enabled = True
+
+    def observe(self, seconds):
+        if self.enabled:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-quantile (None if empty).
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + [float("inf")], self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return "-"
+    if seconds == float("inf"):
+        return f">{BUCKETS[-1]:g}s"
+    return f"{seconds * 1e3:g}ms"
+
+
+class Metrics:
+    """
+    Registry of counters, gauges and histograms, grouped by metric name; every
+    distinct set of label values of a name is a separate series.
+    """
+
+    def __init__(self):
+        self.families = {}    # name -> (type, help, {labels: metric})
+        self.collectors = []  # called before metrics are read
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.collect_lock = threading.Lock()    # /metrics and the summary may collect at once
+
+    def _get(self, kind, factory, name, help, labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.families.setdefault(name, (kind, help, {}))
+            if family[0] != kind:
+                raise ValueError(f"{name} is already a {family[0]}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = factory(key)
+                metric.enabled = self.enabled
+        return metric
+
+    def counter(self, name, help="", **labels):
+        return self._get("counter", Counter, name, help, labels)
+
+    def gauge(self, name, help="", **labels):
+        return self._get("gauge", Gauge, name, help, labels)
+
+    def histogram(self, name, help="", **labels):
+        return self._get("histogram", Histogram, name, help, labels)
+
+    def add_collector(self, fn):
+        """
+        fn() runs before every render() / summary(), to update metrics
+        kept elsewhere (e.g. counters of another process).
+        """
+        self.collectors.append(fn)
+
+    def _collect(self):
+        if self.enabled:
+            with self.collect_lock:
+                for fn in self.collectors:
+                    fn()
+
+    def disable(self):
+        with self.lock:
+            self.enabled = False
+            for _, _, series in self.families.values():
+                for metric in series.values():
+                    metric.enabled = False
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        self._collect()
+        lines = []
+        with self.lock:
+            families = sorted(self.families.items())
+        for name, (kind, help, series) in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in sorted(series.items()):
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+                    continue
+                cumulative = 0
+                for bound, n in zip(metric.buckets + ["+Inf"], metric.counts):
+                    cumulative += n
+                    le = bound if bound == "+Inf" else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum:.9g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        One line: every counter and gauge, and count / p50 / p99 of every histogram.
+        """
+        self._collect()
+        parts = []
+        with self.lock:
+            families = sorted(self.families.items())
+        for name, (kind, _, series) in families:
+            for labels, metric in sorted(series.items()):
+                label = name + ("[" + ",".join(str(v) for _, v in labels) + "]" if labels else "")
+                if kind != "histogram":
+                    parts.append(f"{label}={metric.value}")
+                elif metric.count:
+                    parts.append(f"{label} n={metric.count} p50={_format_seconds(metric.quantile(0.5))} "
+                                 f"p99={_format_seconds(metric.quantile(0.99))}")
+        return " | ".join(parts)
+
+
+# One registry per process
+metrics = Metrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # No access log lines between the sensor output
+        pass
+
+
+def serve_metrics(port, host=METRICS_HOST):
+    """
+    Serve GET /metrics on host:port from a daemon thread.
+    Returns the server (server.shutdown() stops it).
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_summary(interval):
+    """
+    Print metrics.summary() every interval seconds from a daemon thread.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            print(f"[METRICS] {metrics.summary()}")
+
+    thread = threading.Thread(target=run, name="metrics-summary", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,156 @@
+"""
+Gap-free microphone capture with overlapping windows.
+
+A sounddevice InputStream callback writes every block into a preallocated
+ring buffer, so audio keeps arriving while a window is being classified.
+windows() hands out overlapping windows (e.g. 3 s every 0.5 s) copied into
+one preallocated array: no samples are lost between windows and nothing
+is allocated per window.
+
+If the consumer falls so far behind that a window has already been
+overwritten, it skips ahead to the newest audio and counts the skipped
+windows (overruns). Input overflows reported by the audio driver are
+counted separately.
+
+Usage:
+    capture = StreamingAudioCapture(16000, window_seconds=3.0, hop_seconds=0.5)
+    capture.start()
+    for window in capture.windows():
+        ...   # window is reused: use it before asking for the next one
+"""
+import threading
+
+import numpy as np
+
+# ======= Configuration =======
+BLOCK_SIZE = 1024      # frames per callback
+BUFFER_WINDOWS = 4     # ring buffer holds this many windows
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size float32 ring buffer addressed by absolute sample position.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.written = 0  # total samples written since start
+
+    def write(self, samples):
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.written += n
+
+    def read(self, end, out):
+        """
+        Copy the len(out) samples ending at absolute position end into out.
+        The caller checks that they are still in the buffer.
+        """
+        n = len(out)
+        start = (end - n) % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        out[first:] = self.data[:n - first]
+        return out
+
+
+class StreamingAudioCapture:
+    """
+    Callback-driven microphone capture producing overlapping windows.
+    """
+
+    def __init__(self, sample_rate, window_seconds=3.0, hop_seconds=0.5,
+                 block_size=BLOCK_SIZE, buffer_windows=BUFFER_WINDOWS, device=None):
+        self.sample_rate = sample_rate
+        self.window = int(round(window_seconds * sample_rate))
+        self.hop = max(int(round(hop_seconds * sample_rate)), 1)
+        self.block_size = block_size
+        self.device = device
+
+        self.ring = AudioRingBuffer(self.window * buffer_windows + block_size)
+        self.out = np.zeros(self.window, dtype=np.float32)
+        self.cond = threading.Condition()
+        self.stream = None
+        self.running = False
+
+        # Counters
+        self.overflows = 0       # input overflows reported by the driver
+        self.overruns = 0        # windows skipped because the reader fell behind
+        self.windows_read = 0
+        # Absolute sample position of the end of the last window handed out
+        self.window_end = 0
+
+    def _callback(self, indata, frames, time_info, status):
+        if status and status.input_overflow:
+            self.overflows += 1
+        with self.cond:
+            self.ring.write(indata[:, 0])
+            self.cond.notify()
+
+    def start(self):
+        import sounddevice as sd
+
+        self.stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=self.block_size,
+            device=self.device,
+            callback=self._callback
+        )
+        self.running = True
+        self.stream.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        with self.cond:
+            self.cond.notify_all()
+
+    def windows(self):
+        """
+        Yield overlapping windows, one every hop samples, as soon as the
+        audio for them has arrived. The same array is yielded every time.
+        """
+        next_end = self.window
+        while self.running:
+            with self.cond:
+                while self.running and self.ring.written < next_end:
+                    self.cond.wait(timeout=1.0)
+                if not self.running:
+                    return
+
+                written = self.ring.written
+                oldest = written - self.ring.capacity
+                if next_end - self.window < oldest:
+                    # Window already overwritten: jump to the newest full one
+                    skipped = (written - next_end) // self.hop
+                    self.overruns += skipped
+                    next_end += skipped * self.hop
+
+                self.ring.read(next_end, self.out)
+
+            self.windows_read += 1
+            self.window_end = next_end
+            next_end += self.hop
+            yield self.out
+
+    def stats(self):
+        return {
+            "windows": self.windows_read,
+            "overruns": self.overruns,
+            "overflows": self.overflows,
+        }
@@ -0,0 +1,117 @@
+"""
+Array-based inference for the audio RandomForest.
+
+export_forest() flattens the trees of a trained RandomForestClassifier
+(sound_model.pkl from train.py) into one set of contiguous NumPy node
+arrays: split feature, threshold, child indexes and the normalized class
+distribution of every leaf. ForestModel evaluates all trees at once with
+vectorized gathers, one step per tree level, and needs neither sklearn
+nor joblib, so serving does not import them. The arrays are stored as a
+memory-mapped artifact (artifacts.py save_audio_artifact), which train.py
+writes next to sound_model.pkl; load it with
+audio_process.load_audio_classifier().
+
+Probabilities are the same as rf.predict_proba: the same leaves are
+reached (samples compared as float32, like sklearn) and their class
+distributions are averaged over the trees. They compare equal on the
+shipped model; at most they could differ in float summation order.
+"""
+import numpy as np
+
+FOREST_FORMAT = 1
+CHUNK_SIZE = 64      # samples evaluated together
+
+
+def export_forest(model_obj) -> dict:
+    """
+    Node arrays of the forest in model_obj ({"rf", "label_encoder", "sample_rate"}).
+
+    Leaves point to themselves as both children, so every tree can be
+    walked for max_depth steps without checking for leaves.
+    """
+    rf = model_obj["rf"]
+    le = model_obj["label_encoder"]
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    for estimator in rf.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        ids = np.arange(n)
+        is_leaf = tree.children_left == -1
+
+        left = np.where(is_leaf, ids, tree.children_left) + offset
+        right = np.where(is_leaf, ids, tree.children_right) + offset
+        value = tree.value[:, 0, :].astype(np.float64)
+        total = value.sum(axis=1, keepdims=True)
+        total[total == 0] = 1.0
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        children.append(np.stack([left, right], axis=1))
+        values.append(value / total)
+        roots.append(offset)
+        offset += n
+
+    return {
+        "format": np.int64(FOREST_FORMAT),
+        "feature": np.concatenate(features).astype(np.intp),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children": np.concatenate(children).astype(np.intp),
+        "value": np.concatenate(values),
+        "roots": np.array(roots, dtype=np.intp),
+        "max_depth": np.int64(max(e.tree_.max_depth for e in rf.estimators_)),
+        "n_features": np.int64(rf.n_features_in_),
+        "classes": np.array([str(c) for c in le.inverse_transform(rf.classes_)]),
+        "sample_rate": np.int64(model_obj.get("sample_rate", 0)),
+    }
+
+
+class ForestModel:
+    """
+    RandomForest evaluator on flat node arrays (see export_forest).
+    """
+
+    def __init__(self, arrays):
+        if int(arrays["format"]) != FOREST_FORMAT:
+            raise ValueError(f"Unsupported forest format: {int(arrays['format'])}")
+        self.feature = np.ascontiguousarray(arrays["feature"], dtype=np.intp)
+        self.threshold = np.ascontiguousarray(arrays["threshold"], dtype=np.float64)
+        # children[2 * node] = left, children[2 * node + 1] = right
+        self.children = np.ascontiguousarray(arrays["children"], dtype=np.intp).ravel()
+        self.value = np.ascontiguousarray(arrays["value"], dtype=np.float64)
+        self.roots = np.asarray(arrays["roots"], dtype=np.intp)
+        self.max_depth = int(arrays["max_depth"])
+        self.n_features = int(arrays["n_features"])
+        self.classes_ = np.asarray(arrays["classes"])
+        self.sample_rate = int(arrays["sample_rate"])
+
+    def apply(self, X):
+        """
+        Leaf index reached in every tree, shape (n_samples, n_trees).
+        """
+        # sklearn compares float32 samples against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n = X.shape[0]
+        row_offset = (np.arange(n) * self.n_features)[:, None]
+        X_flat = X.ravel()
+
+        nodes = np.repeat(self.roots[None, :], n, axis=0)
+        for _ in range(self.max_depth):
+            go_right = X_flat[row_offset + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        proba = np.empty((X.shape[0], self.value.shape[1]))
+        # Chunks keep the (samples x trees) node arrays in cache
+        for start in range(0, X.shape[0], CHUNK_SIZE):
+            leaves = self.apply(X[start:start + CHUNK_SIZE])
+            proba[start:start + CHUNK_SIZE] = self.value[leaves].sum(axis=1) / leaves.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
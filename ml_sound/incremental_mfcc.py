@@ -0,0 +1,232 @@
+"""
+Incremental MFCC mean+std features over overlapping audio windows.
+
+Produces the same 2 * n_mfcc vector as extract_features_from_raw
+(peak normalization, librosa.feature.mfcc with its defaults, mean and std
+over time), but for a window that moved forward by one hop it only
+computes the STFT / mel / log frames that are new, and updates running
+sums and sums of squares of the MFCC frames.
+
+How the window-global steps are handled:
+    - Peak normalization scales the power spectrum by 1 / peak^2, which
+      only shifts every log-mel value by -20*log10(peak). The DCT turns a
+      constant shift into a shift of the MFCCs along dct(ones), so the
+      frames are kept un-normalized and the shift is applied to the mean.
+    - power_to_db clips at (window max - top_db) and at amin. When nothing
+      in the window falls below that floor the clip is a no-op and the
+      running sums are used. Otherwise the window is rebuilt from the
+      stored log-mel frames (still no STFT work).
+    - With center=True the first and last frames of a window include zero
+      padding, so those few edge frames are computed per window.
+
+Frames are reused on a fixed grid of hop_length samples, so the window
+hop is rounded to a multiple of hop_length (0.5 s at 16 kHz -> 0.512 s).
+
+Tolerance: the frames are computed in float64 while librosa works in
+float32; features agree with extract_features_from_raw to within 1e-4
+absolute (see check() at the bottom of this file).
+"""
+import numpy as np
+import librosa
+from scipy.fft import dct
+
+# ======= Configuration (librosa.feature.mfcc defaults) =======
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+TOP_DB = 80.0
+AMIN = 1e-10
+RESYNC_WINDOWS = 64   # recompute the running sums from scratch this often
+
+
+def aligned_hop(hop_seconds, sample_rate, hop_length=HOP_LENGTH):
+    """
+    Window hop in samples, rounded to a whole number of STFT frames.
+    """
+    frames = max(int(round(hop_seconds * sample_rate / hop_length)), 1)
+    return frames * hop_length
+
+
+class IncrementalMFCC:
+    """
+    Rolling MFCC mean+std extractor for consecutive overlapping windows.
+
+    Call update(window, window_end) for every window, where window_end is
+    the absolute sample position of the end of the window (e.g.
+    StreamingAudioCapture.window_end). If a window does not follow the
+    previous one by a whole number of frames, all frames are recomputed.
+    """
+
+    def __init__(self, sample_rate=16000, n_mfcc=20, window_seconds=3.0, hop_seconds=0.5,
+                 n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS, top_db=TOP_DB):
+        self.sample_rate = sample_rate
+        self.n_mfcc = n_mfcc
+        self.window_len = int(round(window_seconds * sample_rate))
+        self.hop = aligned_hop(hop_seconds, sample_rate, hop_length)
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.top_db = top_db
+
+        self.fft_window = librosa.filters.get_window("hann", n_fft, fftbins=True)
+        self.mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_mels).astype(np.float64)
+        self.dct_matrix = dct(np.eye(n_mels), type=2, norm="ortho", axis=0)[:n_mfcc]
+        # MFCC change for a +1 dB shift of every mel band
+        self.dct_ones = self.dct_matrix.sum(axis=1)
+
+        # Window frame t covers samples [t*hop_length - n_fft/2, t*hop_length + n_fft/2)
+        pad = n_fft // 2
+        self.n_frames = 1 + self.window_len // hop_length
+        self.t_lo = -(-pad // hop_length)                   # first frame without padding
+        self.t_hi = (self.window_len - pad) // hop_length   # last frame without padding
+        self.capacity = self.t_hi - self.t_lo + 1
+
+        # Interior frames, stored by absolute frame index modulo capacity
+        self.ring_logmel = np.zeros((self.capacity, n_mels))
+        self.ring_mfcc = np.zeros((self.capacity, n_mfcc))
+        self.ring_max = np.zeros(self.capacity)
+        self.ring_min = np.zeros(self.capacity)
+        self.sum = np.zeros(n_mfcc)
+        self.sumsq = np.zeros(n_mfcc)
+
+        self.start_frame = None   # absolute frame index of the previous window start
+        self.windows = 0
+
+        # Counters
+        self.frames_computed = 0
+        self.clipped_windows = 0
+
+    def reset(self):
+        self.start_frame = None
+
+    def _logmel(self, y, t0, t1):
+        """
+        Un-normalized log-mel (dB) of window frames t0..t1-1, zero padded
+        outside the window like librosa's center=True.
+        """
+        pad = self.n_fft // 2
+        a = t0 * self.hop_length - pad
+        b = (t1 - 1) * self.hop_length + pad
+        if a >= 0 and b <= len(y):
+            seg = np.asarray(y[a:b], dtype=np.float64)
+        else:
+            seg = np.zeros(b - a)
+            lo, hi = max(a, 0), min(b, len(y))
+            seg[lo - a:hi - a] = y[lo:hi]
+
+        frames = np.lib.stride_tricks.sliding_window_view(seg, self.n_fft)[::self.hop_length]
+        power = np.abs(np.fft.rfft(frames * self.fft_window, axis=1)) ** 2
+        mel = power @ self.mel_basis.T
+        self.frames_computed += len(frames)
+        return 10.0 * np.log10(np.maximum(mel, 1e-30))
+
+    def _store(self, y, j, t0, t1):
+        """
+        Compute interior frames t0..t1-1 of the window starting at frame j
+        and add them to the ring and the running sums.
+        """
+        logmel = self._logmel(y, t0, t1)
+        mfcc = logmel @ self.dct_matrix.T
+        slots = (j + np.arange(t0, t1)) % self.capacity
+        self.ring_logmel[slots] = logmel
+        self.ring_mfcc[slots] = mfcc
+        self.ring_max[slots] = logmel.max(axis=1)
+        self.ring_min[slots] = logmel.min(axis=1)
+        self.sum += mfcc.sum(axis=0)
+        self.sumsq += (mfcc ** 2).sum(axis=0)
+
+    def _drop(self, j, t0, t1):
+        slots = (j + np.arange(t0, t1)) % self.capacity
+        mfcc = self.ring_mfcc[slots]
+        self.sum -= mfcc.sum(axis=0)
+        self.sumsq -= (mfcc ** 2).sum(axis=0)
+
+    def _rebuild(self, y, j):
+        self.sum[:] = 0.0
+        self.sumsq[:] = 0.0
+        self._store(y, j, self.t_lo, self.t_hi + 1)
+
+    def update(self, y, window_end=None):
+        """
+        Features (mean + std of each MFCC, length 2 * n_mfcc) of window y.
+        """
+        if y.ndim > 1:
+            y = y[:, 0]
+
+        if window_end is None:
+            start = 0 if self.start_frame is None else (self.start_frame * self.hop_length + self.hop)
+        else:
+            start = window_end - len(y)
+
+        j, misaligned = divmod(start, self.hop_length)
+        prev = self.start_frame
+        if misaligned or prev is None or j <= prev or j - prev >= self.capacity \
+                or self.windows % RESYNC_WINDOWS == 0:
+            self._rebuild(y, j)
+        else:
+            moved = j - prev
+            self._drop(prev, self.t_lo, self.t_lo + moved)
+            self._store(y, j, self.t_hi + 1 - moved, self.t_hi + 1)
+        self.start_frame = None if misaligned else j
+        self.windows += 1
+
+        # Edge frames (include zero padding, so they are per window)
+        edges = np.vstack([
+            self._logmel(y, 0, self.t_lo),
+            self._logmel(y, self.t_hi + 1, self.n_frames),
+        ])
+
+        # Peak normalization as a dB shift
+        peak = float(np.max(np.abs(y)))
+        shift = 20.0 * np.log10(peak) if peak > 0 else 0.0
+
+        window_max = max(self.ring_max.max(), edges.max()) - shift
+        window_min = min(self.ring_min.min(), edges.min()) - shift
+        floor = 10.0 * np.log10(AMIN)
+        if self.top_db is not None:
+            floor = max(floor, window_max - self.top_db)
+
+        if window_min >= floor:
+            edge_mfcc = edges @ self.dct_matrix.T
+            total = self.sum + edge_mfcc.sum(axis=0)
+            total_sq = self.sumsq + (edge_mfcc ** 2).sum(axis=0)
+            mean = total / self.n_frames
+            std = np.sqrt(np.maximum(total_sq / self.n_frames - mean ** 2, 0.0))
+            mean = mean - shift * self.dct_ones
+        else:
+            # Clipping changes some frames: rebuild from the stored log-mels
+            self.clipped_windows += 1
+            logmel = np.maximum(np.vstack([self.ring_logmel, edges]) - shift, floor)
+            mfcc = logmel @ self.dct_matrix.T
+            mean = mfcc.mean(axis=0)
+            std = mfcc.std(axis=0)
+
+        return np.concatenate([mean, std]).astype(np.float32)
+
+
+def check(seconds=30.0, sample_rate=16000):
+    """
+    Compare against extract_features_from_raw on synthetic audio and
+    print the largest absolute difference per window.
+    """
+    from realtime_pred import N_MFCC, WINDOW_SECONDS, extract_features_from_raw
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    audio = (0.3 * np.sin(2 * np.pi * 440 * t) * (1 + np.sin(2 * np.pi * 0.2 * t))
+             + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+    audio[len(audio) // 3:len(audio) // 3 + sample_rate] = 0.0   # a silent second
+
+    extractor = IncrementalMFCC(sample_rate, N_MFCC, WINDOW_SECONDS, 0.5)
+    worst = 0.0
+    for end in range(extractor.window_len, len(audio) + 1, extractor.hop):
+        y = audio[end - extractor.window_len:end]
+        diff = np.abs(extractor.update(y, end) - extract_features_from_raw(y, sample_rate)).max()
+        worst = max(worst, diff)
+    print(f"Windows: {extractor.windows}, frames computed: {extractor.frames_computed} "
+          f"(full recompute: {extractor.windows * extractor.n_frames}), "
+          f"clipped windows: {extractor.clipped_windows}")
+    print(f"Max abs difference vs extract_features_from_raw: {worst:.2e}")
+
+
+if __name__ == "__main__":
+    check()
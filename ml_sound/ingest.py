@@ -0,0 +1,167 @@
+"""
+Single-pass audio ingestion (replaces wav.py + cutwav.py).
+
+Each source recording (m4a, wav, ...) is decoded once, converted to
+16 kHz mono and cut into 5-second chunks in memory. The chunks are either
+written as wav files (same layout as cutwav.py: <output>/<name>/<name>_<sec>.wav)
+or, with --features, turned directly into feature vectors and saved as
+<output>/<name>.npz, which train.py picks up next to wav files.
+
+Sources are processed in parallel. A small <name>.ingest.json manifest is
+written after each source; sources whose size, mtime and ingestion
+parameters match their manifest are skipped.
+
+Subfolders of the input folder (e.g. one per class) are kept in the output.
+
+Usage:
+    python ingest.py INPUT_FOLDER OUTPUT_FOLDER [--features] [--workers N]
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+from pydub import AudioSegment
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from train import SAMPLE_RATE, extract_features_from_array
+
+input_folder = r"C:\Users\shuqi\UofT\MIE1050\Project\data_m4a"
+output_folder = r"C:\Users\shuqi\UofT\MIE1050\Project\data_chunks_5s"
+
+CHUNK_SECONDS = 5.0
+SOURCE_EXTENSIONS = (".m4a", ".wav", ".mp3", ".flac", ".ogg")
+
+
+def find_sources(folder):
+    """
+    All audio files under folder, as paths relative to it.
+    """
+    sources = []
+    for root, _, files in os.walk(folder):
+        for file in sorted(files):
+            if file.lower().endswith(SOURCE_EXTENSIONS):
+                sources.append(os.path.relpath(os.path.join(root, file), folder))
+    return sorted(sources)
+
+
+def manifest_path(out_dir, name):
+    return os.path.join(out_dir, name + ".ingest.json")
+
+
+def source_info(src_path, mode, chunk_seconds):
+    st = os.stat(src_path)
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "mode": mode,
+        "sample_rate": SAMPLE_RATE,
+        "chunk_seconds": chunk_seconds,
+    }
+
+
+def is_up_to_date(src_path, out_dir, name, mode, chunk_seconds):
+    try:
+        with open(manifest_path(out_dir, name)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    info = source_info(src_path, mode, chunk_seconds)
+    return all(manifest.get(k) == v for k, v in info.items())
+
+
+def decode(src_path):
+    """
+    Decode a source once and convert it to 16 kHz mono 16-bit.
+    """
+    ext = os.path.splitext(src_path)[1][1:].lower()
+    audio = AudioSegment.from_file(src_path, format=ext)
+    return audio.set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(2)
+
+
+def ingest_one(src_path, out_dir, mode, chunk_seconds):
+    """
+    Runs in a worker process. Returns (src_path, number of chunks, error).
+    """
+    name = os.path.splitext(os.path.basename(src_path))[0]
+    try:
+        audio = decode(src_path)
+        chunk_ms = int(chunk_seconds * 1000)
+        os.makedirs(out_dir, exist_ok=True)
+
+        if mode == "wav":
+            chunk_folder = os.path.join(out_dir, name)
+            os.makedirs(chunk_folder, exist_ok=True)
+            n_chunks = 0
+            for i in range(0, len(audio), chunk_ms):
+                chunk = audio[i:i + chunk_ms]
+                chunk.export(os.path.join(chunk_folder, f"{name}_{i // 1000}.wav"), format="wav")
+                n_chunks += 1
+        else:
+            # same scaling as librosa.load on the 16-bit chunk wavs
+            y = np.array(audio.get_array_of_samples(), dtype=np.float32) / 32768.0
+            chunk_len = int(chunk_seconds * SAMPLE_RATE)
+            starts = np.arange(0, len(y), chunk_len)
+            X = np.array([extract_features_from_array(y[s:s + chunk_len], SAMPLE_RATE) for s in starts])
+            np.savez(
+                os.path.join(out_dir, name + ".npz"),
+                X=X,
+                start_seconds=starts / SAMPLE_RATE,
+                sample_rate=SAMPLE_RATE,
+                source=os.path.abspath(src_path),
+            )
+            n_chunks = len(starts)
+
+        # manifest last: an interrupted run is redone next time
+        with open(manifest_path(out_dir, name), "w") as f:
+            json.dump({**source_info(src_path, mode, chunk_seconds), "chunks": n_chunks}, f)
+        return src_path, n_chunks, None
+    except Exception as e:
+        return src_path, 0, str(e)
+
+
+def ingest(in_folder, out_folder, mode="wav", chunk_seconds=CHUNK_SECONDS, workers=None, force=False):
+    start = time.perf_counter()
+    jobs = []
+    skipped = 0
+    for rel in find_sources(in_folder):
+        src_path = os.path.join(in_folder, rel)
+        out_dir = os.path.join(out_folder, os.path.dirname(rel))
+        name = os.path.splitext(os.path.basename(rel))[0]
+        if not force and is_up_to_date(src_path, out_dir, name, mode, chunk_seconds):
+            skipped += 1
+            continue
+        jobs.append((src_path, out_dir))
+
+    print(f"{len(jobs) + skipped} sources: {skipped} up to date, {len(jobs)} to ingest")
+
+    total_chunks = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(ingest_one, src, out_dir, mode, chunk_seconds) for src, out_dir in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            src_path, n_chunks, error = future.result()
+            if error is not None:
+                print(f"[WARN] Failed on {src_path}: {error}")
+            else:
+                total_chunks += n_chunks
+                print(f"[{done}/{len(jobs)}] {src_path}: {n_chunks} chunks")
+
+    print(f"Ingested {len(jobs)} sources ({total_chunks} chunks) in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", nargs="?", default=input_folder)
+    parser.add_argument("output", nargs="?", default=output_folder)
+    parser.add_argument(
+        "--features",
+        action="store_true",
+        help="Write feature vectors (.npz per source) instead of chunk wav files"
+    )
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS)
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Re-ingest sources that are up to date")
+    args = parser.parse_args()
+
+    ingest(args.input, args.output, "features" if args.features else "wav",
+           args.chunk_seconds, args.workers, args.force)
@@ -1,11 +1,20 @@
+import os
+import sys
 import time
 import numpy as np
-import sounddevice as sd
 import librosa
-import joblib
+
+from audio_stream import StreamingAudioCapture
+from incremental_mfcc import IncrementalMFCC
+
+# audio_process.py and artifacts.py live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_process import load_audio_classifier
 
 MODEL_PATH = "sound_model.pkl"
+ARTIFACT_PATH = "sound_model"  # same forest as node arrays (train.py), used when it matches the pickle
 WINDOW_SECONDS = 3.0          # length of each audio window in seconds
+HOP_SECONDS = 0.5             # a new (overlapping) window every hop (~0.512 s, whole STFT frames)
 SAMPLE_RATE = 16000           # training rate
 N_MFCC = 20
 CONF_THRESHOLD = 0.6          # if max probability < threshold -> treat as Unknown
@@ -36,46 +45,31 @@ def extract_features_from_raw(y: np.ndarray, sr: int) -> np.ndarray:
 
 
 def main():
-    # Load trained model object
-    model_obj = joblib.load(MODEL_PATH)
-
-    # RandomForest model
-    rf = model_obj["rf"]
-    # LabelEncoder used during training
-    le = model_obj["label_encoder"]
+    # RandomForest as flat node arrays (no sklearn), or the pickle if the artifact is out of date
+    rf, class_names, sr_model = load_audio_classifier(MODEL_PATH, ARTIFACT_PATH)
     # The sample rate used in training (for sanity check)
-    sr_model = model_obj.get("sample_rate", SAMPLE_RATE)
+    sr_model = sr_model or SAMPLE_RATE
 
     if sr_model != SAMPLE_RATE:
         print(f"[WARN] MODEL sample_rate={sr_model}, but we use {SAMPLE_RATE}")
 
-    # Class names are stored inside the LabelEncoder
-    class_names = le.classes_
-
     print("=== Real-time cooking sound detection ===")
 
+    extractor = IncrementalMFCC(SAMPLE_RATE, N_MFCC, WINDOW_SECONDS, HOP_SECONDS)
+    capture = StreamingAudioCapture(SAMPLE_RATE, WINDOW_SECONDS, extractor.hop / SAMPLE_RATE).start()
+
     try:
-        while True:
-            # Record one audio window
-            frames = int(WINDOW_SECONDS * SAMPLE_RATE)
-            audio = sd.rec(
-                frames,
-                samplerate=SAMPLE_RATE,
-                channels=1,
-                dtype="float32"
-            )
-            sd.wait()  # wait until recording is finished
-
-            y = audio.squeeze()
-            feat = extract_features_from_raw(y, SAMPLE_RATE).reshape(1, -1)
+        for y in capture.windows():
+            # Same features as extract_features_from_raw, only new frames computed
+            feat = extractor.update(y, capture.window_end).reshape(1, -1)
 
             # Predict probabilities with RF
             proba = rf.predict_proba(feat)[0]
             pred_idx = int(np.argmax(proba))          # integer class index
             confidence = float(proba[pred_idx])
 
-            # Map index -> string label using LabelEncoder
-            pred_label = le.inverse_transform([pred_idx])[0]
+            # Map index -> string label
+            pred_label = class_names[pred_idx]
 
             timestamp = time.strftime("%H:%M:%S")
             if confidence < CONF_THRESHOLD:
@@ -84,6 +78,11 @@ def main():
                 print(f"{timestamp}  ->  {pred_label:<12s} (p={confidence:.2f})")
     except KeyboardInterrupt:
         print("\nStopped.")
+    finally:
+        capture.stop()
+        stats = capture.stats()
+        print(f"Windows: {stats['windows']}, overruns: {stats['overruns']}, "
+              f"input overflows: {stats['overflows']}")
 
 
 if __name__ == "__main__":
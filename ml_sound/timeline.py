@@ -0,0 +1,220 @@
+"""
+Batch audio inference over long recordings and folders (train.py --predict).
+
+Every file is split into segments of SEGMENT_SECONDS. Segments are
+processed across a process pool: a worker reads its segment in blocks of
+BLOCK_SECONDS (so a multi-hour file is never loaded whole), converts it
+to 16 kHz mono and slides the 3 s window over it with IncrementalMFCC,
+hop by hop, like realtime_pred.py. The parent scores each segment's
+windows with one predict_proba call on the forest and writes the
+timeline in order.
+
+Output, one row per window (CSV, or a JSON list with --output *.json):
+    file, start_s, end_s, label, confidence, p_<class> ...
+
+Window hops are whole STFT frames (0.5 s -> 0.512 s at 16 kHz, see
+incremental_mfcc.py). Files shorter than one window get a single window
+over the whole file (same features as predict_one). Files are read with
+soundfile (wav, flac, ogg, ...); convert m4a / mp3 with ingest.py first.
+
+Usage:
+    python train.py --predict kitchen_3h.wav --output timeline.csv
+    python train.py --predict recordings/ --output timeline.json --workers 8
+"""
+import os
+import sys
+import csv
+import json
+import time
+import numpy as np
+import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor
+
+# audio_process.py and artifacts.py live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_process import load_audio_classifier
+
+# ======= Configuration =======
+MODEL_PATH = "sound_model.pkl"
+ARTIFACT_PATH = "sound_model"
+SAMPLE_RATE = 16000
+N_MFCC = 20
+WINDOW_SECONDS = 3.0
+HOP_SECONDS = 0.5
+SEGMENT_SECONDS = 600.0      # audio per worker task
+BLOCK_SECONDS = 30.0         # audio decoded at a time
+RESAMPLE_MARGIN = 1.0        # seconds read around a segment when resampling
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".aiff", ".aif")
+
+
+def find_audio(paths):
+    """
+    Audio files among paths; folders are searched recursively.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, name) for name in sorted(names)
+                          if name.lower().endswith(AUDIO_EXTENSIONS)]
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def window_grid(window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS):
+    """
+    Window and hop length in samples at SAMPLE_RATE (hop aligned to frames).
+    """
+    from incremental_mfcc import aligned_hop
+    return int(round(window_seconds * SAMPLE_RATE)), aligned_hop(hop_seconds, SAMPLE_RATE)
+
+
+def plan_segments(path, window, hop, segment_seconds=SEGMENT_SECONDS):
+    """
+    Worker tasks for one file: (path, first window, end window) ranges.
+    """
+    info = sf.info(path)
+    n = int(info.frames * SAMPLE_RATE / info.samplerate)   # length at SAMPLE_RATE
+    n_windows = 1 if n < window else (n - window) // hop + 1
+    per_segment = max(int(segment_seconds * SAMPLE_RATE) // hop, 1)
+    return [(path, w0, min(w0 + per_segment, n_windows)) for w0 in range(0, n_windows, per_segment)]
+
+
+def read_segment(path, start, stop):
+    """
+    Samples start..stop (at SAMPLE_RATE) of a file as mono float32, read
+    in blocks and resampled when the file has another sample rate.
+    """
+    with sf.SoundFile(path) as f:
+        sr = f.samplerate
+        if sr == SAMPLE_RATE:
+            src_start, src_stop = start, stop
+        else:
+            margin = int(RESAMPLE_MARGIN * sr)
+            src_start = max(int(start * sr / SAMPLE_RATE) - margin, 0)
+            src_stop = int(np.ceil(stop * sr / SAMPLE_RATE)) + margin
+
+        src_stop = min(src_stop, f.frames)
+        f.seek(src_start)
+        blocks = [block.mean(axis=1) for block in f.blocks(
+            blocksize=int(BLOCK_SECONDS * sr), frames=src_stop - src_start, dtype="float32", always_2d=True)]
+    y = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+    if sr != SAMPLE_RATE:
+        import librosa
+        y = librosa.resample(y, orig_sr=sr, target_sr=SAMPLE_RATE)
+        offset = start - int(round(src_start * SAMPLE_RATE / sr))
+        y = y[offset:offset + (stop - start)]
+    return y
+
+
+def _segment_job(path, w0, w1, window_seconds, hop_seconds):
+    """
+    Worker: features of windows w0..w1-1 of a file.
+    Returns (path, w0, features (n, 2 * N_MFCC), window seconds, error).
+    """
+    try:
+        from incremental_mfcc import IncrementalMFCC
+        from train import extract_features_from_array
+
+        window, hop = window_grid(window_seconds, hop_seconds)
+        start = w0 * hop
+        y = read_segment(path, start, (w1 - 1) * hop + window)
+        if len(y) < window:
+            # shorter than one window: the whole file, like predict_one
+            return path, w0, extract_features_from_array(y, SAMPLE_RATE)[None, :], len(y) / SAMPLE_RATE, None
+
+        extractor = IncrementalMFCC(SAMPLE_RATE, N_MFCC, window_seconds, hop_seconds)
+        features = np.empty((w1 - w0, 2 * N_MFCC), dtype=np.float32)
+        for i in range(w1 - w0):
+            a = i * hop
+            features[i] = extractor.update(y[a:a + window], start + a + window)
+        return path, w0, features, window_seconds, None
+    except Exception as e:
+        return path, w0, None, None, str(e)
+
+
+class TimelineWriter:
+    """
+    Write timeline rows as CSV, or as a JSON list (by the output extension).
+    """
+
+    def __init__(self, path, class_names):
+        self.class_names = [str(c) for c in class_names]
+        self.json = path.lower().endswith(".json")
+        self.f = open(path, "w", encoding="utf-8", newline="")
+        self.first = True
+        if self.json:
+            self.f.write("[\n")
+        else:
+            self.csv = csv.writer(self.f)
+            self.csv.writerow(["file", "start_s", "end_s", "label", "confidence"]
+                              + [f"p_{c}" for c in self.class_names])
+
+    def write(self, path, starts, ends, proba):
+        best = proba.argmax(axis=1)
+        for start, end, idx, p in zip(starts, ends, best, proba):
+            label, confidence = self.class_names[idx], float(p[idx])
+            if self.json:
+                row = {"file": path, "start_s": round(float(start), 3), "end_s": round(float(end), 3),
+                       "label": label, "confidence": round(confidence, 4),
+                       "proba": {c: round(float(v), 4) for c, v in zip(self.class_names, p)}}
+                self.f.write(("" if self.first else ",\n") + json.dumps(row))
+            else:
+                self.csv.writerow([path, f"{start:.3f}", f"{end:.3f}", label, f"{confidence:.4f}"]
+                                  + [f"{v:.4f}" for v in p])
+            self.first = False
+
+    def close(self):
+        if self.json:
+            self.f.write("\n]\n")
+        self.f.close()
+
+
+def predict_timeline(paths, output, workers=None, model_path=MODEL_PATH, artifact_path=ARTIFACT_PATH,
+                     window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS):
+    """
+    Classify every window of every audio file under paths and write the
+    timeline to output. Returns the number of windows written.
+    """
+    rf, class_names, sr_model = load_audio_classifier(model_path, artifact_path)
+    if sr_model and sr_model != SAMPLE_RATE:
+        print(f"[WARN] MODEL sample_rate={sr_model}, but we use {SAMPLE_RATE}")
+
+    files = find_audio(paths)
+    window, hop = window_grid(window_seconds, hop_seconds)
+    tasks = []
+    for path in files:
+        try:
+            tasks += plan_segments(path, window, hop)
+        except RuntimeError as e:   # soundfile cannot read it
+            print(f"[WARN] Skipping {path}: {e}")
+    print(f"{len(files)} files, {len(tasks)} segments")
+
+    start = time.perf_counter()
+    writer = TimelineWriter(output, class_names)
+    n_windows = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # results are written in task order, so the timeline is in file / time order
+            jobs = [pool.submit(_segment_job, path, w0, w1, window_seconds, hop_seconds)
+                    for path, w0, w1 in tasks]
+            for done, job in enumerate(jobs, 1):
+                path, w0, features, seconds, error = job.result()
+                if error is not None:
+                    print(f"[WARN] Failed on {path} (window {w0}): {error}")
+                    continue
+                proba = rf.predict_proba(features)
+                starts = (w0 + np.arange(len(features))) * hop / SAMPLE_RATE
+                writer.write(path, starts, starts + seconds, proba)
+                n_windows += len(features)
+                print(f"  segment {done}/{len(jobs)}: {n_windows} windows "
+                      f"({time.perf_counter() - start:.1f} s)")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    audio_hours = n_windows * hop / SAMPLE_RATE / 3600
+    print(f"Wrote {n_windows} windows (~{audio_hours:.2f} h of audio) to {output} in {elapsed:.1f} s")
+    return n_windows
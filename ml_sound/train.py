@@ -1,7 +1,10 @@
 import os
 import glob
+import time
+import hashlib
 import numpy as np
 import librosa
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
@@ -9,10 +12,27 @@ from sklearn.metrics import classification_report
 from sklearn.preprocessing import LabelEncoder
 import joblib
 import argparse
+import sys
+
+# artifacts.py lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from artifacts import save_audio_artifact
 
 # ====== Your data path ======
 DATA_DIR = r"C:\Users\shuqi\UofT\MIE1050\Project\sound_data"
 SAMPLE_RATE = 16000  # keep consistent across training / inference
+N_MFCC = 20
+
+# ====== Feature cache ======
+CACHE_DIR = "feature_cache"
+FEATURE_VERSION = 1  # bump when extract_features changes
+
+# Same forest as memory-mapped node arrays, loaded by the service and the
+# ml_sound tools while it matches sound_model.pkl (artifacts.py)
+ARTIFACT_PATH = "sound_model"
+
+# --predict on a longer file writes a per-window timeline (timeline.py)
+TIMELINE_MIN_SECONDS = 10.0
 
 
 def extract_features(file_path: str) -> np.ndarray:
@@ -23,13 +43,20 @@ def extract_features(file_path: str) -> np.ndarray:
     - take mean and std over time axis -> fixed-length vector
     """
     y, sr = librosa.load(file_path, sr=SAMPLE_RATE, mono=True)
+    return extract_features_from_array(y, sr)
+
 
+def extract_features_from_array(y: np.ndarray, sr: int) -> np.ndarray:
+    """
+    Same features as extract_features, for audio already in memory
+    (mono float array at sample rate sr).
+    """
     # simple amplitude normalization
     if np.max(np.abs(y)) > 0:
         y = y / np.max(np.abs(y))
 
     # 20-dim MFCC is enough here
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=N_MFCC)
 
     # mean and std along time axis
     mfcc_mean = mfcc.mean(axis=1)
@@ -39,19 +66,108 @@ def extract_features(file_path: str) -> np.ndarray:
     return features
 
 
-def load_dataset(data_dir: str):
+def feature_cache_key(file_path: str) -> str:
+    """
+    Cache key of a wav file: path, size and modification time plus the
+    feature parameters, so changed clips or parameters are recomputed.
+    """
+    st = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{st.st_size}|{st.st_mtime_ns}|" \
+          f"{SAMPLE_RATE}|{N_MFCC}|{FEATURE_VERSION}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def load_cached_features(cache_dir: str, key: str):
+    path = os.path.join(cache_dir, key + ".npy")
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_features(cache_dir: str, key: str, feat: np.ndarray):
+    # write to a temp file first so a crash never leaves a half-written entry
+    path = os.path.join(cache_dir, key + ".npy")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, feat)
+    os.replace(tmp_path, path)
+
+
+def _extract_job(wav_path: str):
+    """
+    Runs in a worker process. Returns (wav_path, features or None, error).
+    """
+    try:
+        return wav_path, extract_features(wav_path), None
+    except Exception as e:
+        return wav_path, None, str(e)
+
+
+def extract_all(wav_paths, workers=None, cache_dir=CACHE_DIR):
+    """
+    Features for every wav file. Cached features are reused; the rest are
+    extracted across a process pool and added to the cache.
+
+    Returns:
+      dict wav_path -> feature vector (failed files are left out)
+    """
+    start = time.perf_counter()
+    features = {}
+    keys = {}
+    todo = []
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    for wav_path in wav_paths:
+        if cache_dir:
+            keys[wav_path] = feature_cache_key(wav_path)
+            feat = load_cached_features(cache_dir, keys[wav_path])
+            if feat is not None:
+                features[wav_path] = feat
+                continue
+        todo.append(wav_path)
+
+    print(f"{len(wav_paths)} files: {len(features)} cached, {len(todo)} to extract")
+
+    if todo:
+        extract_start = time.perf_counter()
+        progress_every = max(len(todo) // 20, 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = [pool.submit(_extract_job, p) for p in todo]
+            for done, job in enumerate(as_completed(jobs), 1):
+                wav_path, feat, error = job.result()
+                if error is not None:
+                    print(f"[WARN] Failed on {wav_path}: {error}")
+                else:
+                    features[wav_path] = feat
+                    if cache_dir:
+                        save_cached_features(cache_dir, keys[wav_path], feat)
+
+                if done % progress_every == 0 or done == len(todo):
+                    elapsed = time.perf_counter() - extract_start
+                    print(f"  extracted {done}/{len(todo)} "
+                          f"({elapsed:.1f} s, {done / elapsed:.1f} files/s)")
+
+    print(f"Feature extraction took {time.perf_counter() - start:.1f} s")
+    return features
+
+
+def load_dataset(data_dir: str, workers=None, cache_dir=CACHE_DIR):
     """
     Walk through each subfolder under data_dir:
       subfolder name = class name (e.g., boiling / searing / stirfrying)
       all wav files inside that subfolder are treated as that class.
+    Features are extracted in parallel and cached (see extract_all).
+    .npz feature files from ingest.py --features are used as they are.
     Returns:
       X: np.ndarray, shape (N_samples, N_features)
       y_str: list of string labels (class names for each sample)
       class_names: sorted list of unique class names
     """
-    X = []
-    y_str = []
     class_names = []
+    labeled_files = []
+    precomputed = []
 
     # use sorted() so class order is stable
     for class_name in sorted(os.listdir(data_dir)):
@@ -60,24 +176,41 @@ def load_dataset(data_dir: str):
             continue
 
         class_names.append(class_name)
-        wav_files = glob.glob(os.path.join(class_path, "*.wav"))
+        wav_files = sorted(glob.glob(os.path.join(class_path, "*.wav")))
         print(f"Found {len(wav_files)} files in class '{class_name}'")
+        labeled_files += [(wav_path, class_name) for wav_path in wav_files]
+
+        # feature files written by ingest.py --features
+        n_chunks = 0
+        for npz_path in sorted(glob.glob(os.path.join(class_path, "*.npz"))):
+            with np.load(npz_path) as data:
+                if int(data["sample_rate"]) != SAMPLE_RATE or data["X"].shape[1] != 2 * N_MFCC:
+                    print(f"[WARN] Skipping {npz_path}: different feature parameters")
+                    continue
+                precomputed += [(feat, class_name) for feat in data["X"]]
+                n_chunks += len(data["X"])
+        if n_chunks:
+            print(f"Found {n_chunks} precomputed chunk features in class '{class_name}'")
 
-        for wav_path in wav_files:
-            try:
-                feat = extract_features(wav_path)
-                X.append(feat)
-                y_str.append(class_name)  # keep string label here
-            except Exception as e:
-                print(f"[WARN] Failed on {wav_path}: {e}")
+    features = extract_all([p for p, _ in labeled_files], workers, cache_dir)
+
+    X = []
+    y_str = []
+    for wav_path, class_name in labeled_files:
+        if wav_path in features:
+            X.append(features[wav_path])
+            y_str.append(class_name)  # keep string label here
+    for feat, class_name in precomputed:
+        X.append(feat)
+        y_str.append(class_name)
 
     X = np.array(X)
     y_str = np.array(y_str)
     return X, y_str, class_names
 
 
-def train_model():
-    X, y_str, class_names = load_dataset(DATA_DIR)
+def train_model(workers=None, cache_dir=CACHE_DIR):
+    X, y_str, class_names = load_dataset(DATA_DIR, workers, cache_dir)
 
     print("Total samples:", len(X))
     if len(X) < 10:
@@ -114,6 +247,9 @@ def train_model():
     joblib.dump(model_obj, "sound_model.pkl")
     print("\nModel saved to sound_model.pkl")
 
+    save_audio_artifact(model_obj, ARTIFACT_PATH, source="sound_model.pkl")
+    print(f"Forest arrays saved to {ARTIFACT_PATH}/")
+
 
 def predict_one(model_path: str, wav_path: str):
     """
@@ -142,11 +278,36 @@ if __name__ == "__main__":
     parser.add_argument(
         "--predict",
         type=str,
-        help="Path to a wav file to classify. If not set, will train the model."
+        nargs="+",
+        help="Wav file(s) or folders to classify. If not set, will train the model."
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="With --predict: write a per-window timeline to this .csv / .json "
+             "(default for folders, several files or long recordings: timeline.csv)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes for feature extraction (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Extract features for every file, ignoring the feature cache"
     )
     args = parser.parse_args()
 
     if args.predict:
-        predict_one("sound_model.pkl", args.predict)
+        single = args.predict[0]
+        if len(args.predict) == 1 and os.path.isfile(single) and args.output is None \
+                and librosa.get_duration(path=single) <= TIMELINE_MIN_SECONDS:
+            predict_one("sound_model.pkl", single)
+        else:
+            from timeline import predict_timeline
+            predict_timeline(args.predict, args.output or "timeline.csv", args.workers)
     else:
-        train_model()
+        train_model(args.workers, None if args.no_cache else CACHE_DIR)
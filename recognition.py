@@ -0,0 +1,104 @@
+"""
+Sensor recognition pipeline: decode a sensor message, classify the reading
+with KNN and vote over the last few readings.
+
+Used by PatternRecognition.py and by the replay tool (replay.py), so both
+run exactly the same code path.
+"""
+import json
+
+from sensor_frame import decode_frame, is_binary_frame
+from voting import VOTE_WINDOW, VotingEngine
+
+
+def decode_sensor_message(data):
+    """
+    Decode one sensor message into a dict.
+    data is either JSON text or a binary frame (bytes / memoryview).
+    Raises json.JSONDecodeError for text that is not JSON and
+    sensor_frame.FrameError for a bad binary frame.
+    """
+    if isinstance(data, str):
+        return json.loads(data)
+    if is_binary_frame(data):
+        return decode_frame(data)
+    return json.loads(bytes(data).decode("utf-8").strip("\x00"))
+
+
+def knn_inputs(sensor_data):
+    """
+    Pick the KNN inputs out of a sensor_data dict.
+
+    Returns:
+        temp, rh, distance, air_quality
+    """
+    temp = float(sensor_data["temperature"])
+    rh = float(sensor_data["humidity"])
+    distance = float(sensor_data["us_raw"])
+    air_quality = float(sensor_data["gas"])
+    return temp, rh, distance, air_quality
+
+
+class SensorPipeline:
+    """
+    Classify readings and vote over the last vote_window readings.
+
+    Keeps the voting state (a voting.VotingEngine) of one sensor stream;
+    the KNN model can be shared by many pipelines. Extra keyword arguments
+    (hop, seconds, weighted, hysteresis) go to the VotingEngine; without
+    them it votes every vote_window readings, as before.
+    """
+
+    def __init__(self, knn_model, vote_window=VOTE_WINDOW, **voting):
+        self.knn_model = knn_model
+        self.vote_window = vote_window
+        self.voter = VotingEngine(window=vote_window, **voting)
+
+    @property
+    def current_status(self):
+        return self.voter.current_status
+
+    def classify(self, sensor_data):
+        """
+        KNN prediction for one decoded reading.
+
+        Returns:
+            label, confidence
+        """
+        temp, rh, distance, air_quality = knn_inputs(sensor_data)
+        return self.knn_model.predict_one(
+            temp=temp,
+            rh=rh,
+            distance=distance,
+            air_quality=air_quality
+        )
+
+    def classify_batch(self, readings):
+        """
+        KNN predictions for a list of decoded readings in one vectorized call.
+
+        Returns:
+            labels, confidences (arrays)
+        """
+        X = [knn_inputs(sensor_data) for sensor_data in readings]
+        return self.knn_model.predict(X)
+
+    def vote(self, label, confidence=1.0, timestamp=None):
+        """
+        Add one KNN label (and its confidence) to the voting window.
+
+        Returns:
+            None, or (voted_label, counts) when a vote happened
+        """
+        return self.voter.add(label, confidence, timestamp)
+
+    def process(self, data):
+        """
+        Run one raw message through decode -> KNN -> vote.
+
+        Returns:
+            sensor_data, label, confidence, vote (None or (voted_label, counts))
+        """
+        sensor_data = decode_sensor_message(data)
+        label, conf = self.classify(sensor_data)
+        return sensor_data, label, conf, self.vote(label, conf)
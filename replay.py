@@ -0,0 +1,300 @@
+"""
+Replay a sensor CSV (sensor_log.csv or any CSV with the SensorData columns)
+through the recognition pipeline, without the Arduino, main.cpp or the pipe.
+
+Every row is turned into the same JSON text (or binary frame, with
+--format binary) main.cpp sends, then goes
+through decode -> KNN -> 5-sample vote, in process. At the end it reports
+throughput, per-stage latency and the votes, and compares the votes with
+the "status" column when the CSV has one.
+
+Examples:
+    python replay.py sensor_log.csv                 # as fast as possible
+    python replay.py sensor_log.csv --speed 1       # real time (1 reading/s)
+    python replay.py sensor_log.csv --speed 20      # 20x real time
+    python replay.py sensor_log.csv --send unix     # feed a running service
+    python replay.py sensor_log.csv --format binary # binary frames instead of JSON
+"""
+import argparse
+import socket
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from kalman import CHANNEL_PARAMS, DEFAULT_CHANNELS, SensorFilter
+from knn_detection import LABEL_COL, MODEL_PATH, get_knn_model
+from recognition import SensorPipeline, decode_sensor_message
+from sensor_frame import INT_FIELDS, SENSOR_FIELDS, encode_frame
+from transport import (DEFAULT_TCP_ADDRESS, DEFAULT_UNIX_PATH, DELIMITER,
+                       parse_tcp_address)
+from voting import add_voting_arguments, voting_options
+
+# ======= Configuration =======
+READING_INTERVAL = 1.0  # seconds between readings at real time (Arduino rate)
+STAGES = ["decode", "filter", "knn", "vote", "total"]
+
+
+def load_readings(csv_path):
+    """
+    Read a sensor CSV. Missing SensorData columns are filled with 0.
+
+    Returns:
+        rows:   list of sensor dicts (SensorData fields only)
+        status: array of ground truth labels, or None without a status column
+    """
+    df = pd.read_csv(csv_path)
+    for field in SENSOR_FIELDS:
+        if field not in df.columns:
+            df[field] = 0
+    rows = df[SENSOR_FIELDS].to_dict("records")
+    status = df[LABEL_COL].values if LABEL_COL in df.columns else None
+    return rows, status
+
+
+def format_sensor_json(sensor_data):
+    """
+    Same text as sensorDataToJson in main.cpp: fixed 6 decimals for the
+    float fields (stored as float32 in the struct), plain ints otherwise.
+    """
+    parts = []
+    for field in SENSOR_FIELDS:
+        value = sensor_data[field]
+        if field in INT_FIELDS:
+            parts.append(f"\"{field}\":{int(value)}")
+        elif field == "time_of_flight":
+            parts.append(f"\"{field}\":{float(value):.6f}")
+        else:
+            parts.append(f"\"{field}\":{float(np.float32(value)):.6f}")
+    return "{" + ",".join(parts) + "}"
+
+
+def pace(start, i, interval):
+    """
+    Sleep until reading i is due. interval <= 0 means no pacing.
+    """
+    if interval <= 0:
+        return
+    delay = start + i * interval - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def replay(messages, pipeline, interval=0.0, sensor_filter=None):
+    """
+    Run every message through the pipeline, timing each stage.
+    sensor_filter (kalman.SensorFilter) is applied before KNN when given.
+    Readings are timestamped READING_INTERVAL apart (sensor time), so
+    time-based voting windows behave as in real time at any speed.
+
+    Returns:
+        labels:  per-reading KNN labels
+        votes:   list of (reading index, voted label, counts)
+        timings: dict stage -> array of seconds per reading
+        elapsed: wall time in seconds
+    """
+    n = len(messages)
+    timings = {stage: np.zeros(n) for stage in STAGES}
+    labels = []
+    votes = []
+    clock = time.perf_counter
+
+    start = clock()
+    for i, data in enumerate(messages):
+        pace(start, i, interval)
+
+        t0 = clock()
+        sensor_data = decode_sensor_message(data)
+        t1 = clock()
+        if sensor_filter is not None:
+            sensor_data = sensor_filter.filter(sensor_data)
+        t2 = clock()
+        label, conf = pipeline.classify(sensor_data)
+        t3 = clock()
+        vote = pipeline.vote(label, conf, i * READING_INTERVAL)
+        t4 = clock()
+
+        timings["decode"][i] = t1 - t0
+        timings["filter"][i] = t2 - t1
+        timings["knn"][i] = t3 - t2
+        timings["vote"][i] = t4 - t3
+        timings["total"][i] = t4 - t0
+        labels.append(label)
+        if vote is not None:
+            votes.append((i, vote[0], vote[1]))
+    elapsed = clock() - start
+
+    return labels, votes, timings, elapsed
+
+
+def send(messages, kind, address, interval=0.0):
+    """
+    Stream the messages to a running recognition service over a socket
+    (JSON NUL-terminated like main.cpp, binary frames as they are).
+    Returns the wall time in seconds.
+    """
+    if kind == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address or DEFAULT_UNIX_PATH)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.connect(parse_tcp_address(address or DEFAULT_TCP_ADDRESS))
+
+    start = time.perf_counter()
+    try:
+        for i, data in enumerate(messages):
+            pace(start, i, interval)
+            if isinstance(data, str):
+                sock.sendall(data.encode("utf-8") + DELIMITER)
+            else:
+                sock.sendall(data)
+    finally:
+        sock.close()
+    return time.perf_counter() - start
+
+
+def print_latency(timings):
+    print(f"{'stage':>8s} {'mean us':>9s} {'p50 us':>9s} {'p95 us':>9s} {'p99 us':>9s} {'max us':>9s}")
+    for stage in STAGES:
+        t = timings[stage] * 1e6
+        p50, p95, p99 = np.percentile(t, [50, 95, 99])
+        print(f"{stage:>8s} {t.mean():9.1f} {p50:9.1f} {p95:9.1f} {p99:9.1f} {t.max():9.1f}")
+
+
+def compare_votes(votes, status, vote_window):
+    """
+    Compare each vote with the majority status of the readings it covered.
+    Returns (accuracy, Counter of (true, voted) pairs).
+    """
+    confusion = Counter()
+    for i, voted_label, _ in votes:
+        window = status[max(i - vote_window + 1, 0):i + 1]
+        true_label = Counter(window).most_common(1)[0][0]
+        confusion[(true_label, voted_label)] += 1
+    correct = sum(c for (t, v), c in confusion.items() if t == v)
+    return correct / max(len(votes), 1), confusion
+
+
+def detection_delays(votes, status):
+    """
+    For every change of the true status, the number of readings until the
+    voted status shows the new value (None if it never does before the
+    next change).
+    """
+    voted = np.empty(len(status), dtype=object)   # voted status after each reading
+    current = None
+    j = 0
+    for i in range(len(status)):
+        while j < len(votes) and votes[j][0] == i:
+            current = votes[j][1]
+            j += 1
+        voted[i] = current
+
+    changes = [i for i in range(1, len(status)) if status[i] != status[i - 1]]
+    delays = []
+    for c, end in zip(changes, changes[1:] + [len(status)]):
+        hits = np.flatnonzero(voted[c:end] == status[c])
+        delays.append(int(hits[0]) + 1 if len(hits) else None)
+    return delays
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", default="sensor_log.csv")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0.0,
+        help="1 = real time, N = N times real time, 0 = as fast as possible"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "binary"],
+        default="json",
+        help="wire format of the replayed messages (see sensor_frame.py)"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="replay the CSV this many times")
+    parser.add_argument("--votes-out", type=str, default=None, help="write the votes to this CSV")
+    parser.add_argument("--quiet", action="store_true", help="do not print every vote")
+    parser.add_argument(
+        "--send",
+        choices=["unix", "tcp"],
+        default=None,
+        help="stream to a running PatternRecognition service instead of in process"
+    )
+    parser.add_argument("--address", default=None, help="socket path or host:port for --send")
+    parser.add_argument(
+        "--kalman",
+        nargs="*",
+        choices=list(CHANNEL_PARAMS),
+        default=None,
+        help="Kalman filter these channels before KNN (no value: us_raw)"
+    )
+    add_voting_arguments(parser)
+    args = parser.parse_args()
+    if args.kalman == []:
+        args.kalman = DEFAULT_CHANNELS
+
+    rows, status = load_readings(args.csv)
+    encode = encode_frame if args.format == "binary" else format_sensor_json
+    messages = [encode(r) for r in rows] * args.repeat
+    if status is not None:
+        status = np.tile(status, args.repeat)
+    interval = READING_INTERVAL / args.speed if args.speed > 0 else 0.0
+
+    if args.send:
+        elapsed = send(messages, args.send, args.address, interval)
+        print(f"Sent {len(messages)} readings in {elapsed:.3f} s "
+              f"({len(messages) / elapsed:.0f} readings/s)")
+        return
+
+    pipeline = SensorPipeline(get_knn_model(args.model), args.vote_window, **voting_options(args))
+    sensor_filter = SensorFilter(args.kalman) if args.kalman else None
+    labels, votes, timings, elapsed = replay(messages, pipeline, interval, sensor_filter)
+
+    if not args.quiet:
+        for i, voted_label, counts in votes:
+            print(f"[vote @ {i:6d}] {voted_label}  |  Votes = {dict(counts)}")
+        print()
+
+    n = len(messages)
+    busy = timings["total"].sum()
+    print(f"Readings:   {n}")
+    print(f"Wall time:  {elapsed:.3f} s ({n / elapsed:.0f} readings/s)")
+    print(f"Busy time:  {busy:.3f} s ({n / busy:.0f} readings/s of pipeline capacity)")
+    print(f"Votes:      {len(votes)}")
+    print(f"Vote flips: {sum(a[1] != b[1] for a, b in zip(votes, votes[1:]))}")
+    if sensor_filter is not None:
+        print(f"Kalman:     {sensor_filter.stats()}")
+    print()
+    print_latency(timings)
+
+    if status is not None:
+        knn_acc = np.mean(np.array(labels) == status)
+        window = args.vote_window
+        if args.vote_seconds is not None:
+            window = max(int(args.vote_seconds / READING_INTERVAL), 1)
+        vote_acc, confusion = compare_votes(votes, status, window)
+        delays = detection_delays(votes, status)
+        found = [d for d in delays if d is not None]
+        print()
+        print(f"KNN accuracy (per reading): {knn_acc:.3f}")
+        print(f"Vote accuracy:              {vote_acc:.3f}")
+        if found:
+            print(f"Detection delay (readings): mean {np.mean(found):.1f}, max {max(found)}, "
+                  f"missed {len(delays) - len(found)} of {len(delays)} status changes")
+        for (true_label, voted_label), count in sorted(confusion.items()):
+            print(f"  {true_label:>16s} -> {voted_label:<16s} {count}")
+
+    if args.votes_out:
+        pd.DataFrame(
+            [(i, v, dict(c)) for i, v, c in votes],
+            columns=["reading", "status", "votes"]
+        ).to_csv(args.votes_out, index=False)
+        print(f"\nVotes saved to: {args.votes_out}")
+
+
+if __name__ == "__main__":
+    main()
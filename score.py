@@ -0,0 +1,179 @@
+"""
+Batch scoring of sensor CSV archives with the KNN model.
+
+Every file is read in chunks of --chunk-size rows. The KNN inputs of each
+chunk go to a pool of worker processes, each holding the model once
+(memory-mapped when there is an artifact, see artifacts.py), where they
+are normalized with the model's xmin/xmax and classified in one
+vectorized call. Results come back in order and the parent runs the
+voting window over them, so the vote column is exactly what the service
+would have printed for the same readings.
+
+Chunks of all files share one pool, so both many files and one large
+file use every core. At most --workers * 2 chunks are in flight at any
+time, so memory stays bounded whatever the file sizes.
+
+Output: the input columns (empty "Unnamed" columns from trailing commas
+are dropped) plus
+    knn_label        per-reading KNN label (empty if a feature is missing)
+    knn_confidence   majority ratio of the k neighbors
+    vote_status      voted status after this reading (empty before the
+                     first vote)
+
+Usage:
+    python score.py sensor_log.csv
+    python score.py archive/*.csv --output-dir scored --workers 8
+    python score.py big.csv --vote-window 5 --vote-hop 1 --hysteresis 0.2
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from knn_detection import FEATURES, MODEL_PATH, get_knn_model
+from sensor_logger import TIMESTAMP_COL
+from voting import VOTE_WINDOW, VotingEngine, add_voting_arguments, voting_options
+
+# ======= Configuration =======
+CHUNK_SIZE = 50000        # rows read and scored at a time
+OUTPUT_SUFFIX = "_scored"
+READING_INTERVAL = 1.0    # seconds between rows without a timestamp column (time-based votes)
+
+_worker_model = None
+
+
+def _init_worker(model_path):
+    global _worker_model
+    _worker_model = get_knn_model(model_path)
+
+
+def _score_chunk(X):
+    """
+    Worker: KNN labels and confidences for the rows of X without NaNs.
+    """
+    valid = ~np.isnan(X).any(axis=1)
+    labels = np.full(len(X), "", dtype=object)
+    confs = np.full(len(X), np.nan)
+    if valid.any():
+        labels[valid], confs[valid] = _worker_model.predict(X[valid])
+    return labels, confs
+
+
+def read_chunks(paths, chunk_size):
+    """
+    Yield (file index, chunk DataFrame) for every chunk of every file.
+    Values are kept as the text in the file, so they are written back
+    unchanged whatever the chunk boundaries are.
+    """
+    for i, path in enumerate(paths):
+        for chunk in pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False):
+            yield i, chunk.loc[:, ~chunk.columns.str.startswith("Unnamed:")]
+
+
+def feature_matrix(chunk):
+    """
+    KNN inputs of a chunk as float rows (NaN where a value is missing).
+    """
+    missing = [name for name in FEATURES if name not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+    return chunk[FEATURES].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+
+def output_path_for(path, output_dir=None):
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(output_dir or os.path.dirname(path), stem + OUTPUT_SUFFIX + (ext or ".csv"))
+
+
+class ScoredFile:
+    """
+    Output side of one input file: its voting window and the output CSV.
+    """
+
+    def __init__(self, path, vote_window, voting):
+        self.path = path
+        self.voter = VotingEngine(window=vote_window, **voting)
+        self.rows = 0
+        self.header = True
+
+    def write(self, chunk, labels, confs):
+        if TIMESTAMP_COL in chunk.columns:
+            timestamps = pd.to_numeric(chunk[TIMESTAMP_COL], errors="coerce").to_numpy(dtype=float)
+        else:
+            timestamps = (self.rows + np.arange(len(chunk))) * READING_INTERVAL
+
+        status = []
+        for label, conf, timestamp in zip(labels, confs, timestamps):
+            if label != "":
+                self.voter.add(label, conf, float(timestamp))
+            status.append(self.voter.current_status or "")
+
+        chunk = chunk.assign(knn_label=labels, knn_confidence=np.round(confs, 4), vote_status=status)
+        chunk.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+        self.rows += len(chunk)
+
+
+def score_files(paths, model_path=MODEL_PATH, output_dir=None, workers=None,
+                chunk_size=CHUNK_SIZE, vote_window=VOTE_WINDOW, voting=None):
+    """
+    Score every file; returns the number of rows written per output path.
+    workers=0 scores in this process.
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    outputs = [ScoredFile(output_path_for(path, output_dir), vote_window, voting or {}) for path in paths]
+
+    if workers == 0:
+        _init_worker(model_path)
+        for i, chunk in read_chunks(paths, chunk_size):
+            outputs[i].write(chunk, *_score_chunk(feature_matrix(chunk)))
+        return {out.path: out.rows for out in outputs}
+
+    # Spawn (not fork) so workers start the same way on every platform
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(model_path,)) as pool:
+        pending = deque()   # (file index, chunk, future), in file / chunk order
+        for i, chunk in read_chunks(paths, chunk_size):
+            pending.append((i, chunk, pool.submit(_score_chunk, feature_matrix(chunk))))
+            while len(pending) >= workers * 2:
+                i_done, chunk_done, future = pending.popleft()
+                outputs[i_done].write(chunk_done, *future.result())
+        while pending:
+            i_done, chunk_done, future = pending.popleft()
+            outputs[i_done].write(chunk_done, *future.result())
+    return {out.path: out.rows for out in outputs}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score sensor CSV files with the KNN model")
+    parser.add_argument("inputs", nargs="+", help="CSV files or glob patterns")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output-dir", default=None, help="default: next to each input")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (0 = in process)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per chunk")
+    add_voting_arguments(parser)
+    args = parser.parse_args()
+
+    paths = []
+    for pattern in args.inputs:
+        matches = sorted(glob.glob(pattern))
+        paths += matches or [pattern]
+
+    start = time.perf_counter()
+    rows = score_files(paths, args.model, args.output_dir, args.workers, args.chunk_size,
+                       args.vote_window, voting_options(args))
+    elapsed = time.perf_counter() - start
+
+    for path, n in rows.items():
+        print(f"{path}: {n} rows")
+    total = sum(rows.values())
+    print(f"Scored {total} rows from {len(paths)} file(s) in {elapsed:.2f} s ({total / elapsed:.0f} rows/s)")
@@ -0,0 +1,130 @@
+"""
+Fixed-layout binary frames for sensor readings (see sensorDataToBinary in
+main.cpp).
+
+Frame layout, little-endian, no padding:
+    uint8   magic    0xB5 (never the first byte of a JSON message)
+    uint8   version  FRAME_VERSION
+    uint16  length   payload size in bytes
+    payload          the SensorData fields in declaration order:
+                     8 x float32, 4 x int32, 6 x float32, 1 x float64
+
+JSON messages stay valid on the same connection: the first byte of every
+message tells the two formats apart, so a sender can switch back to JSON
+at any time.
+"""
+import struct
+
+import numpy as np
+
+# Fields of the SensorData struct in main.cpp, in declaration order
+SENSOR_FIELDS = [
+    "temperature", "humidity", "pressure", "gas", "altitude",
+    "xg", "yg", "zg",
+    "mic", "emf", "light", "ain",
+    "vMic", "vEmf", "vLight", "vAin",
+    "us_raw", "us_compensated", "time_of_flight",
+]
+INT_FIELDS = {"mic", "emf", "light", "ain"}
+
+# ======= Frame layout =======
+FRAME_MAGIC = 0xB5
+FRAME_VERSION = 1
+
+HEADER = struct.Struct("<BBH")
+PAYLOAD = struct.Struct("<8f4i6fd")
+
+PAYLOAD_DTYPE = np.dtype([
+    (name, "<i4" if name in INT_FIELDS else "<f8" if name == "time_of_flight" else "<f4")
+    for name in SENSOR_FIELDS
+])
+FRAME_DTYPE = np.dtype(
+    [("magic", "u1"), ("version", "u1"), ("length", "<u2")] + PAYLOAD_DTYPE.descr
+)
+FRAME_SIZE = HEADER.size + PAYLOAD.size
+
+assert PAYLOAD_DTYPE.itemsize == PAYLOAD.size
+assert FRAME_DTYPE.itemsize == FRAME_SIZE
+
+
+class FrameError(ValueError):
+    """
+    A binary frame with an unknown version or a wrong length.
+    """
+
+
+def is_binary_frame(data):
+    """
+    True if data starts with a binary frame header (otherwise it is JSON).
+    """
+    return len(data) > 0 and data[0] == FRAME_MAGIC
+
+
+def frame_length(data, offset=0):
+    """
+    Total size (header + payload) of the frame starting at offset,
+    or None if the header is not complete yet.
+    """
+    if len(data) - offset < HEADER.size:
+        return None
+    _, _, length = HEADER.unpack_from(data, offset)
+    return HEADER.size + length
+
+
+def encode_frame(sensor_data):
+    """
+    Pack one sensor_data dict into a binary frame.
+    """
+    values = [sensor_data[name] for name in SENSOR_FIELDS]
+    return HEADER.pack(FRAME_MAGIC, FRAME_VERSION, PAYLOAD.size) + PAYLOAD.pack(
+        *[int(v) if name in INT_FIELDS else float(v) for name, v in zip(SENSOR_FIELDS, values)]
+    )
+
+
+def encode_frames(columns, n):
+    """
+    Pack n readings into one buffer of back-to-back frames.
+    columns: mapping field name -> array of n values.
+    """
+    frames = np.zeros(n, dtype=FRAME_DTYPE)
+    frames["magic"] = FRAME_MAGIC
+    frames["version"] = FRAME_VERSION
+    frames["length"] = PAYLOAD.size
+    for name in SENSOR_FIELDS:
+        frames[name] = columns[name]
+    return frames.tobytes()
+
+
+def check_header(data, offset=0):
+    magic, version, length = HEADER.unpack_from(data, offset)
+    if magic != FRAME_MAGIC:
+        raise FrameError(f"Not a binary frame (first byte {magic:#04x})")
+    if version != FRAME_VERSION or length != PAYLOAD.size:
+        raise FrameError(f"Unsupported frame version {version} (length {length})")
+
+
+def decode_frame(data, offset=0):
+    """
+    Unpack one binary frame into a sensor_data dict.
+    data can be bytes, bytearray or a memoryview; nothing is copied.
+    """
+    check_header(data, offset)
+    values = PAYLOAD.unpack_from(data, offset + HEADER.size)
+    return dict(zip(SENSOR_FIELDS, values))
+
+
+def decode_frames(data):
+    """
+    View a buffer of back-to-back frames as a NumPy structured array
+    (one record per reading, one field per SensorData member).
+    The array shares memory with data; no per-reading work is done.
+    """
+    n, rest = divmod(len(data), FRAME_SIZE)
+    if rest:
+        raise FrameError(f"Buffer of {len(data)} bytes is not a whole number of frames")
+    frames = np.frombuffer(data, dtype=FRAME_DTYPE, count=n)
+    if n and (np.any(frames["magic"] != FRAME_MAGIC)
+              or np.any(frames["version"] != FRAME_VERSION)
+              or np.any(frames["length"] != PAYLOAD.size)):
+        raise FrameError("Buffer contains frames with a bad header")
+    return frames
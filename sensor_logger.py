@@ -0,0 +1,352 @@
+"""
+Background sensor logger.
+
+Readings are put on a bounded queue and written by a background thread in
+batches (every batch_size readings or flush_interval seconds), so logging
+never blocks the receive / inference loop. Files can be rotated by size
+or by date, and the readings can also be written in a columnar format
+(chunked .npz or Parquet) that loads much faster than CSV for training.
+
+A CSV file is only appended to if its header matches the readings; when
+it does not (an older file, or a reading with new keys) the logger moves
+on to a new part instead, so columns never shift.
+
+Usage:
+    logger = SensorLogger("sensor_log.csv", rotate="daily", columnar="npz")
+    logger.start()
+    logger.log(sensor_data)     # never blocks; drops if the queue is full
+    logger.close()              # flushes what is left
+"""
+import csv
+import glob
+import numbers
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# ======= Configuration =======
+QUEUE_SIZE = 10000        # readings waiting for the writer at most
+BATCH_SIZE = 256          # write after this many readings...
+FLUSH_INTERVAL = 5.0      # ...or after this many seconds
+MAX_BYTES = 64 * 1024 * 1024  # size rotation threshold per CSV file
+TIMESTAMP_COL = "timestamp"
+CLOSE_TIMEOUT = 10.0      # seconds close() waits for the writer
+COLUMNAR_ROWS = 50000     # rows per .npz file / Parquet row group
+
+_STOP = object()
+
+
+class SensorLogger:
+    """
+    Log sensor_data dicts to CSV (and optionally .npz / Parquet) from a
+    background thread.
+
+    rotate:   None (one file), "size" (new part after max_bytes) or "daily"
+    columnar: None, "npz" (one .npz per columnar_rows readings) or "parquet"
+              (one file per CSV file, one row group per columnar_rows
+              readings; needs pyarrow). A chunk also ends when the CSV
+              file rotates and on close().
+    """
+
+    def __init__(self, csv_path="sensor_log.csv", rotate=None, columnar=None,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_bytes=MAX_BYTES, queue_size=QUEUE_SIZE, columnar_rows=COLUMNAR_ROWS):
+        if rotate not in (None, "size", "daily"):
+            raise ValueError(f"Unknown rotation: {rotate}")
+        if columnar not in (None, "npz", "parquet"):
+            raise ValueError(f"Unknown columnar format: {columnar}")
+        if columnar == "parquet":
+            # Fail now rather than on the writer thread
+            import pyarrow  # noqa: F401
+
+        self.csv_path = csv_path
+        self.rotate = rotate
+        self.columnar = columnar
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.columnar_rows = columnar_rows
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.fieldnames = None
+
+        self.current_path = None
+        self.headers = {}
+        self.part = 0
+        self.chunk = 0
+        self.parquet_writer = None
+
+        # Columnar rows not written yet, one list of values per column
+        self.pending = {}
+        self.pending_rows = 0
+        self.pending_path = None
+
+        # Counters
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    # ---------- producer side ----------
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="sensor-logger", daemon=True)
+        self.thread.start()
+        return self
+
+    def log(self, sensor_data, timestamp=None):
+        """
+        Queue one reading. Never blocks: if the writer falls behind and
+        the queue is full, the reading is dropped and counted.
+        """
+        row = dict(sensor_data)
+        row[TIMESTAMP_COL] = time.time() if timestamp is None else timestamp
+        try:
+            self.queue.put_nowait(row)
+            self.logged += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """
+        Write everything still queued and stop the writer thread.
+        Gives up after CLOSE_TIMEOUT seconds rather than hang on a stuck writer.
+        """
+        if self.thread is not None:
+            try:
+                if self.thread.is_alive():
+                    self.queue.put(_STOP, timeout=CLOSE_TIMEOUT)
+                    self.thread.join(timeout=CLOSE_TIMEOUT)
+            except queue.Full:
+                pass
+            if self.thread.is_alive():
+                print(f"[LOGGER] Writer did not finish; {self.queue.qsize()} readings not written")
+            self.thread = None
+
+    # ---------- writer thread ----------
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                row = self.queue.get(timeout=max(deadline - time.monotonic(), 0.0))
+            except queue.Empty:
+                row = None
+
+            if row is _STOP:
+                break
+            if row is not None:
+                batch.append(row)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._write_batch(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+        # Drain whatever arrived before the stop marker
+        while True:
+            try:
+                row = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                batch.append(row)
+        if batch:
+            self._write_batch(batch)
+        self._flush_columnar()
+        self._close_parquet()
+
+    def _write_batch(self, batch):
+        # Columns of this run so far plus any key first seen in this batch
+        fieldnames = list(self.fieldnames or [])
+        known = set(fieldnames)
+        for row in batch:
+            for key in row:
+                if key not in known:
+                    known.add(key)
+                    fieldnames.append(key)
+        self.fieldnames = fieldnames
+
+        try:
+            path = self._select_path(batch[0][TIMESTAMP_COL], fieldnames)
+            file_exists = os.path.isfile(path)
+            with open(path, mode="a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                if not file_exists:
+                    writer.writeheader()
+                    self.headers[path] = fieldnames
+                writer.writerows(batch)
+        except Exception as e:
+            # A bad batch (disk error, odd values) must not end the writer thread
+            print(f"[LOGGER] Failed to write {len(batch)} readings: {e!r}")
+            self.failed += len(batch)
+            return
+
+        self.written += len(batch)
+        self.batches += 1
+        if self.columnar is not None:
+            self._buffer_columnar(path, batch)
+
+    # ---------- rotation ----------
+
+    def _path_for(self, timestamp, part):
+        stem, ext = os.path.splitext(self.csv_path)
+        if self.rotate == "daily":
+            stem += time.strftime("_%Y-%m-%d", time.localtime(timestamp))
+        if part > 0:
+            stem += f".{part}"
+        return stem + ext
+
+    def _header(self, path):
+        if path not in self.headers:
+            with open(path, newline="", encoding="utf-8") as f:
+                self.headers[path] = next(csv.reader(f), [])
+        return self.headers[path]
+
+    def _select_path(self, timestamp, fieldnames):
+        """
+        File the next batch goes to. Moves on to a new file when the date
+        changes (daily), the current file is full (size) or its header is
+        not exactly fieldnames.
+        """
+        path = self._path_for(timestamp, self.part)
+        while os.path.isfile(path) and (
+                (self.rotate == "size" and os.path.getsize(path) >= self.max_bytes)
+                or self._header(path) != fieldnames):
+            self.part += 1
+            path = self._path_for(timestamp, self.part)
+
+        if path != self.current_path:
+            if self.current_path is not None and self.headers.get(self.current_path) != fieldnames:
+                print(f"[LOGGER] Columns changed; writing to {path}")
+            self._flush_columnar()
+            self._close_parquet()
+            self.current_path = path
+        return path
+
+    # ---------- columnar output ----------
+
+    def _buffer_columnar(self, csv_path, batch):
+        if self.pending_rows and set(self.pending) != set(self.fieldnames):
+            self._flush_columnar()
+        if not self.pending_rows:
+            self.pending = {name: [] for name in self.fieldnames}
+            self.pending_path = csv_path
+        for name, values in self.pending.items():
+            values.extend(row.get(name) for row in batch)
+        self.pending_rows += len(batch)
+        if self.pending_rows >= self.columnar_rows:
+            self._flush_columnar()
+
+    def _flush_columnar(self):
+        """
+        Write the buffered rows as one .npz file / Parquet row group.
+        """
+        if not self.pending_rows:
+            return
+        rows = self.pending_rows
+        try:
+            columns = {name: column_array(values) for name, values in self.pending.items()}
+            if self.columnar == "npz":
+                self._write_npz(self.pending_path, columns)
+            else:
+                self._write_parquet(self.pending_path, columns)
+        except Exception as e:
+            # The rows are in the CSV file; only the columnar copy is lost
+            print(f"[LOGGER] Failed to write {rows} readings as {self.columnar}: {e!r}")
+        finally:
+            self.pending = {}
+            self.pending_rows = 0
+
+    def _write_npz(self, csv_path, columns):
+        stem, _ = os.path.splitext(csv_path)
+        while True:
+            npz_path = f"{stem}.{self.chunk:06d}.npz"
+            self.chunk += 1
+            if not os.path.exists(npz_path):
+                break
+        np.savez(npz_path, **columns)
+
+    def _write_parquet(self, csv_path, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table(columns)
+        if self.parquet_writer is not None and not table.schema.equals(self.parquet_writer.schema):
+            try:
+                # e.g. a column that was all integers in the first chunk
+                table = table.cast(self.parquet_writer.schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError):
+                self._close_parquet()
+        if self.parquet_writer is None:
+            stem, _ = os.path.splitext(csv_path)
+            parquet_path = stem + ".parquet"
+            while os.path.exists(parquet_path):
+                # Never overwrite the output of an earlier run
+                self.chunk += 1
+                parquet_path = f"{stem}.{self.chunk:06d}.parquet"
+            self.parquet_writer = pq.ParquetWriter(parquet_path, table.schema)
+        self.parquet_writer.write_table(table)
+
+    def _close_parquet(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+
+
+def column_array(values):
+    """
+    One column of a batch with a fixed dtype, so .npz files load with
+    allow_pickle=False: float (None -> NaN) if every value is a number,
+    else text (None -> "").
+    """
+    if all(v is None or (isinstance(v, numbers.Number) and not isinstance(v, complex)) for v in values):
+        if all(isinstance(v, (bool, np.bool_)) for v in values):
+            return np.array(values, dtype=bool)
+        if all(isinstance(v, numbers.Integral) for v in values):
+            return np.array(values, dtype=np.int64)
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+    return np.array(["" if v is None else str(v) for v in values], dtype=str)
+
+
+def load_sensor_log(path):
+    """
+    Load logged readings into one DataFrame.
+
+    path can be a CSV, .npz or .parquet file, a glob pattern, or a
+    directory (all .parquet files in it, else all .npz, else all .csv).
+    Columnar files load much faster than the equivalent CSV.
+    """
+    # pandas only here: the service imports this module just for logging
+    import pandas as pd
+
+    if os.path.isdir(path):
+        for ext in (".parquet", ".npz", ".csv"):
+            files = sorted(glob.glob(os.path.join(path, "*" + ext)))
+            if files:
+                break
+    elif any(c in path for c in "*?["):
+        files = sorted(glob.glob(path))
+    else:
+        files = [path]
+
+    if not files:
+        raise FileNotFoundError(f"No sensor logs found at: {path}")
+
+    frames = []
+    for f in files:
+        if f.endswith(".parquet"):
+            frames.append(pd.read_parquet(f))
+        elif f.endswith(".npz"):
+            with np.load(f, allow_pickle=False) as data:
+                frames.append(pd.DataFrame({name: data[name] for name in data.files}))
+        else:
+            frames.append(pd.read_csv(f))
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
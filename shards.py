@@ -0,0 +1,264 @@
+"""
+Sharded multi-process KNN inference for many sensor streams.
+
+Sensor streams are assigned to worker processes by a stable hash of their
+stream id. Every worker loads its own copy of the KNN model and keeps the
+voting state (one SensorPipeline per stream) of the streams assigned to
+it, so KNN runs on all cores instead of under one GIL.
+
+A worker handles its requests in the order they were submitted, and all
+requests of a stream go to the same worker, so the results of a stream
+come back in order.
+
+If a worker process dies (killed, out of memory, crashed), the requests
+it had not answered fail with ShardError and the shard is restarted with
+a fresh worker (the voting state of its streams starts over).
+
+Usage:
+    pool = ShardPool("knn_cooking_model.pkl", workers=4).start()
+    labels, confs, votes, knn_seconds, vote_seconds = await pool.process(stream_id, readings)
+    pool.close_stream(stream_id)      # forget the voting state
+    pool.close()
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+
+import numpy as np
+
+from knn_detection import MODEL_PATH, get_knn_model
+from recognition import VOTE_WINDOW, SensorPipeline, knn_inputs
+
+# ======= Configuration =======
+LIVENESS_INTERVAL = 1.0     # seconds between checks that the workers are alive
+
+
+class ShardError(RuntimeError):
+    """
+    A shard worker died before answering a request.
+    """
+
+
+def shard_of(stream_id, n_shards):
+    """
+    Worker index of a stream. Stable across runs (unlike hash()).
+    """
+    return zlib.crc32(str(stream_id).encode("utf-8")) % n_shards
+
+
+def _shard_worker(shard, model_path, vote_window, voting, requests, results):
+    """
+    Worker process: classify batches and vote for the streams of one shard.
+
+    requests: (request_id, stream_id, X, timestamps) with X the raw KNN
+              inputs and one arrival time per row, or
+              (None, stream_id, None, None) to drop a stream;
+              None stops the worker
+    results:  (request_id, (labels, confs, votes, knn_seconds, vote_seconds), error)
+    """
+    # Ctrl-C reaches the whole process group; the pool stops its workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        knn_model = get_knn_model(model_path)
+    except Exception as e:
+        results.put((("ready", shard), None, f"Failed to load {model_path}: {e}"))
+        return
+    results.put((("ready", shard), None, None))
+
+    pipelines = {}
+    while True:
+        msg = requests.get()
+        if msg is None:
+            break
+        request_id, stream_id, X, timestamps = msg
+        if request_id is None:
+            pipelines.pop(stream_id, None)
+            continue
+
+        pipeline = pipelines.get(stream_id)
+        if pipeline is None:
+            pipeline = pipelines[stream_id] = SensorPipeline(knn_model, vote_window, **voting)
+        try:
+            t0 = time.perf_counter()
+            labels, confs = knn_model.predict(X)
+            t1 = time.perf_counter()
+            votes = [pipeline.vote(label, conf, timestamp)
+                     for label, conf, timestamp in zip(labels, confs, timestamps)]
+            t2 = time.perf_counter()
+            results.put((request_id, (labels, confs, votes, t1 - t0, t2 - t1), None))
+        except Exception as e:
+            results.put((request_id, None, repr(e)))
+
+
+class ShardPool:
+    """
+    Pool of KNN worker processes, with sensor streams sharded by stream id.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, workers=None, vote_window=VOTE_WINDOW, voting=None):
+        self.model_path = model_path
+        self.workers = workers or os.cpu_count() or 1
+        self.vote_window = vote_window
+        self.voting = voting or {}
+
+        self.processes = []
+        self.requests = []
+        self.results = None
+        self.collector = None
+
+        self.ctx = None
+        self.request_ids = itertools.count()
+        self.pending = {}     # request id -> (shard, future)
+        self.lock = threading.Lock()
+        self.closing = False
+
+        # Counters
+        self.submitted = 0
+        self.readings = 0
+        self.restarts = 0
+
+    def _start_worker(self, shard):
+        """
+        Start the worker of a shard, with a new request queue.
+        """
+        requests = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=_shard_worker,
+            args=(shard, self.model_path, self.vote_window, self.voting, requests, self.results),
+            name=f"knn-shard-{shard}",
+            daemon=True
+        )
+        process.start()
+        return requests, process
+
+    def start(self):
+        # spawn on every platform: the front end already runs threads
+        self.ctx = multiprocessing.get_context("spawn")
+        self.results = self.ctx.Queue()
+        for shard in range(self.workers):
+            requests, process = self._start_worker(shard)
+            self.requests.append(requests)
+            self.processes.append(process)
+
+        # Wait until every worker has loaded the model
+        errors = []
+        for _ in range(self.workers):
+            _, _, error = self.results.get()
+            if error is not None:
+                errors.append(error)
+        if errors:
+            self.close()
+            raise RuntimeError(errors[0])
+
+        self.collector = threading.Thread(target=self._collect, name="knn-shard-results", daemon=True)
+        self.collector.start()
+        return self
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while True:
+            if time.monotonic() - last_check >= LIVENESS_INTERVAL:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                msg = self.results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                continue
+            if msg is None:
+                break
+            request_id, result, error = msg
+            with self.lock:
+                _, future = self.pending.pop(request_id, (None, None))
+            if future is None:
+                if error is not None:
+                    # a restarted worker could not load the model
+                    print(f"[SHARDS] {error}")
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(result)
+
+    def _check_workers(self):
+        """
+        Fail the requests of dead workers and restart their shards.
+        """
+        for shard, process in enumerate(self.processes):
+            if process.is_alive() or self.closing:
+                continue
+            with self.lock:
+                lost = [request_id for request_id, (s, _) in self.pending.items() if s == shard]
+                futures = [self.pending.pop(request_id)[1] for request_id in lost]
+                # new requests go to the new worker's queue from here on
+                self.requests[shard], self.processes[shard] = self._start_worker(shard)
+                self.restarts += 1
+            print(f"[SHARDS] Worker {shard} died (exit code {process.exitcode}); "
+                  f"failed {len(futures)} requests, restarted it")
+            for future in futures:
+                future.set_exception(ShardError(f"KNN worker {shard} died (exit code {process.exitcode})"))
+
+    def submit(self, stream_id, readings, timestamps=None):
+        """
+        Classify a list of decoded readings of one stream and vote.
+        timestamps (time.monotonic() of each reading's arrival, default
+        now) are used by time-based voting windows.
+
+        Returns:
+            concurrent.futures.Future of (labels, confs, votes, knn_seconds,
+            vote_seconds), where votes has one entry per reading: None or
+            (voted_label, counts), and the seconds are the time the worker
+            spent in KNN and in voting
+        """
+        X = np.array([knn_inputs(sensor_data) for sensor_data in readings], dtype=float)
+        future = Future()
+        request_id = next(self.request_ids)
+        if timestamps is None:
+            timestamps = [time.monotonic()] * len(readings)
+        shard = shard_of(stream_id, self.workers)
+        with self.lock:
+            self.pending[request_id] = (shard, future)
+            self.requests[shard].put((request_id, stream_id, X, list(timestamps)))
+        self.submitted += 1
+        self.readings += len(readings)
+        return future
+
+    async def process(self, stream_id, readings, timestamps=None):
+        """
+        submit() for asyncio code.
+        """
+        return await asyncio.wrap_future(self.submit(stream_id, readings, timestamps))
+
+    def close_stream(self, stream_id):
+        """
+        Drop the voting state of a disconnected stream.
+        """
+        with self.lock:
+            self.requests[shard_of(stream_id, self.workers)].put((None, stream_id, None, None))
+
+    def close(self):
+        self.closing = True
+        for requests in self.requests:
+            requests.put(None)
+        for process in self.processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        if self.collector is not None:
+            self.results.put(None)
+            self.collector.join()
+            self.collector = None
+        self.processes = []
+        self.requests = []
+
+        # Nothing answers these any more
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for _, future in pending.values():
+            future.set_exception(RuntimeError("Shard pool closed"))
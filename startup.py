@@ -0,0 +1,64 @@
+"""
+Startup timing for PatternRecognition.
+
+Import this module first: the clock starts when it is imported. Stages
+(imports, model loads, first inference, ...) are timed with stage() from
+any thread, and report() prints when each one started and how long it
+took, so the time until the service accepts sensor data, and the time
+until audio is online, can be read off directly.
+
+Usage:
+    from startup import startup
+    with startup.stage("load KNN model"):
+        ...
+    startup.mark("accepting sensor connections")
+    startup.report()
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.stages = []   # (start, duration, name, thread name) in seconds since t0
+        self.lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.t0
+
+    def record(self, name, start, duration=None):
+        """
+        Add a stage timed elsewhere (start in seconds since the clock started).
+        """
+        with self.lock:
+            self.stages.append((start, duration, name, threading.current_thread().name))
+
+    @contextmanager
+    def stage(self, name):
+        start = self.elapsed()
+        try:
+            yield
+        finally:
+            self.record(name, start, self.elapsed() - start)
+
+    def mark(self, name):
+        """
+        A milestone (no duration), e.g. "accepting sensor connections".
+        """
+        self.record(name, self.elapsed())
+
+    def report(self, title="Startup"):
+        with self.lock:
+            stages = sorted(self.stages, key=lambda s: s[0])
+        print(f"[STARTUP] {title}")
+        print(f"[STARTUP] {'at ms':>9s} {'took ms':>9s}  stage")
+        for start, duration, name, thread in stages:
+            took = "" if duration is None else f"{duration * 1e3:9.1f}"
+            where = "" if thread == "MainThread" else f"  ({thread})"
+            print(f"[STARTUP] {start * 1e3:9.1f} {took:>9s}  {name}{where}")
+
+
+# One timer per process, started at first import
+startup = StartupTimer()
@@ -0,0 +1,614 @@
+"""
+Transports that deliver sensor messages to the pattern recognition service.
+
+main.cpp sends every JSON message followed by its NUL terminator, so
+NUL is used as the message delimiter on every stream transport; binary
+frames carry their own length instead (see sensor_frame.py). One
+receive() call drains everything that is already queued and returns a
+list of messages, instead of one message per read.
+
+serve_streams() runs the same backends under asyncio with any number of
+concurrent clients, each handed to its own coroutine.
+
+Backends:
+    pipe  - Win32 named pipe (the original transport, Windows only)
+    unix  - Unix domain socket
+    tcp   - localhost TCP socket
+    stdin - standard input (NUL- or newline-delimited)
+    file  - a file (NUL- or newline-delimited), e.g. a captured session
+"""
+import asyncio
+import itertools
+import os
+import socket
+import sys
+import threading
+
+from sensor_frame import FRAME_MAGIC, frame_length
+
+# ======= Configuration =======
+DELIMITER = b"\x00"
+DEFAULT_PIPE_NAME = "\\\\.\\pipe\\test_pipe"
+DEFAULT_UNIX_PATH = "/tmp/rangehood_sensor.sock"
+DEFAULT_TCP_ADDRESS = "127.0.0.1:5757"
+
+PIPE_BUFFER_SIZE = 512        # same as the pipe buffers in WinPipe
+READ_SIZE = 64 * 1024         # bytes per socket / file read
+MAX_FRAME_SIZE = 1024 * 1024  # drop a frame that grows beyond this
+MAX_BATCH = 1024              # messages returned by one receive() at most
+RECEIVE_AHEAD = 2             # batches a reader thread receives before they are taken
+
+FRAME_MAGIC_BYTE = bytes([FRAME_MAGIC])
+
+
+class TransportClosed(Exception):
+    """
+    The connected client went away (or the input reached EOF).
+    """
+
+
+class FrameDecoder:
+    """
+    Split a byte stream into messages.
+
+    JSON messages are delimited (NUL, or newline for files). Binary frames
+    (see sensor_frame.py) are recognized by their first byte and cut by
+    their length header; they are handed out as memoryview slices of the
+    received data, without copying.
+
+    Keeps the incomplete tail of a read until the rest of it arrives, and
+    complete messages until they are taken with pop().
+    """
+
+    def __init__(self, delimiters=(DELIMITER,), max_frame_size=MAX_FRAME_SIZE):
+        self.delimiter = delimiters[0]
+        self.other_delimiters = delimiters[1:]
+        self.max_frame_size = max_frame_size
+        self.buffer = b""
+        self.pending = []
+
+    def feed(self, data, final=False):
+        """
+        Add received bytes; complete messages are queued for pop().
+        final=True means no more bytes belong to the current message
+        (end of input, or the end of a Win32 pipe message).
+        """
+        buf = self.buffer + data
+        if FRAME_MAGIC_BYTE not in buf:
+            self._feed_text(buf, final)
+            return
+
+        pos = 0
+        view = memoryview(buf)
+        while pos < len(buf):
+            if buf[pos] == FRAME_MAGIC:
+                size = frame_length(buf, pos)
+                if size is None or pos + size > len(buf):
+                    break
+                self.pending.append(view[pos:pos + size])
+                pos += size
+            else:
+                end = self._find_delimiter(buf, pos)
+                if end < 0:
+                    break
+                self._append_text(buf[pos:end])
+                pos = end + 1
+
+        rest = buf[pos:]
+        if final and rest:
+            if rest[0] == FRAME_MAGIC:
+                print(f"[TRANSPORT] Dropping truncated binary frame ({len(rest)} bytes)")
+            else:
+                self._append_text(rest)
+            rest = b""
+        self._keep(rest)
+
+    def _feed_text(self, buf, final):
+        # Fast path: text only, split on the delimiter in one go
+        for d in self.other_delimiters:
+            buf = buf.replace(d, self.delimiter)
+        parts = buf.split(self.delimiter)
+        rest = b"" if final else parts.pop()
+        for p in parts:
+            self._append_text(p)
+        self._keep(rest)
+
+    def _find_delimiter(self, buf, pos):
+        ends = [buf.find(d, pos) for d in (self.delimiter,) + self.other_delimiters]
+        ends = [e for e in ends if e >= 0]
+        return min(ends) if ends else -1
+
+    def _append_text(self, data):
+        message = decode_message(data)
+        if message:
+            self.pending.append(message)
+
+    def _keep(self, rest):
+        if len(rest) > self.max_frame_size:
+            print(f"[TRANSPORT] Dropping oversized frame ({len(rest)} bytes)")
+            rest = b""
+        self.buffer = rest
+
+    def flush(self):
+        """
+        End of input: treat whatever is left in the buffer as a last message.
+        """
+        self.feed(b"", final=True)
+
+    def pop(self, max_messages=MAX_BATCH):
+        """
+        Take up to max_messages complete messages.
+        """
+        messages = self.pending[:max_messages]
+        del self.pending[:max_messages]
+        return messages
+
+    def reset(self):
+        self.buffer = b""
+        self.pending = []
+
+
+def decode_message(data):
+    """
+    Decode one raw message into a string (NUL padding removed).
+    """
+    return data.decode("utf-8", errors="replace").strip("\x00\r\n ")
+
+
+class Transport:
+    """
+    Server side of a sensor connection.
+
+    Usage:
+        transport.open()
+        transport.accept()           # wait for a client
+        messages = transport.receive()
+        transport.disconnect()       # after TransportClosed, then accept() again
+        transport.close()
+    """
+    name = "transport"
+    # False if a new client can never arrive after the first one is gone
+    reconnectable = True
+
+    def open(self):
+        pass
+
+    def accept(self):
+        raise NotImplementedError
+
+    def receive(self, max_messages=MAX_BATCH):
+        """
+        Block until at least one message is available and return all
+        queued messages (up to max_messages). Raises TransportClosed.
+        """
+        raise NotImplementedError
+
+    def disconnect(self):
+        pass
+
+    def close(self):
+        self.disconnect()
+
+
+class Win32PipeTransport(Transport):
+    """
+    Win32 named pipe in message mode, one pipe instance per connection.
+    """
+    name = "pipe"
+
+    def __init__(self, pipe_name=DEFAULT_PIPE_NAME, buffer_size=PIPE_BUFFER_SIZE):
+        # Imported here so the other transports work without pywin32
+        import win32pipe
+        import win32file
+        import winerror
+        self.win32pipe = win32pipe
+        self.win32file = win32file
+        self.winerror = winerror
+        self.pipe_name = pipe_name
+        self.buffer_size = buffer_size
+        self.handle = None
+        self.decoder = FrameDecoder()
+
+    def accept(self):
+        win32pipe = self.win32pipe
+        self.handle = win32pipe.CreateNamedPipe(
+            self.pipe_name,
+            win32pipe.PIPE_ACCESS_DUPLEX,
+            win32pipe.PIPE_TYPE_MESSAGE | win32pipe.PIPE_WAIT | win32pipe.PIPE_READMODE_MESSAGE,
+            win32pipe.PIPE_UNLIMITED_INSTANCES,
+            self.buffer_size,
+            self.buffer_size,
+            0,
+            None
+        )
+        win32pipe.ConnectNamedPipe(self.handle, None)
+        self.decoder.reset()
+
+    def _read_message(self):
+        """
+        Read one whole pipe message, following ERROR_MORE_DATA for
+        messages longer than the buffer.
+        """
+        chunks = []
+        while True:
+            try:
+                result, data = self.win32file.ReadFile(self.handle, self.buffer_size)
+            except self.win32file.error as e:
+                raise TransportClosed(str(e))
+            chunks.append(data)
+            if result != self.winerror.ERROR_MORE_DATA:
+                return b"".join(chunks)
+
+    def receive(self, max_messages=MAX_BATCH):
+        while len(self.decoder.pending) < max_messages:
+            if self.decoder.pending:
+                try:
+                    _, available, _ = self.win32pipe.PeekNamedPipe(self.handle, 0)
+                except self.win32file.error:
+                    # Hand out what we have; the next read reports the close
+                    available = 0
+                if available == 0:
+                    break
+            # One pipe message holds one JSON message or one or more binary frames
+            self.decoder.feed(self._read_message(), final=True)
+        return self.decoder.pop(max_messages)
+
+    def disconnect(self):
+        if self.handle is not None:
+            try:
+                self.win32pipe.DisconnectNamedPipe(self.handle)
+                self.win32file.CloseHandle(self.handle)
+            except self.win32file.error:
+                pass
+            self.handle = None
+
+
+class SocketTransport(Transport):
+    """
+    Stream socket server accepting one client at a time.
+    """
+
+    def __init__(self):
+        self.server = None
+        self.conn = None
+        self.decoder = FrameDecoder()
+
+    def _create_server(self):
+        raise NotImplementedError
+
+    def open(self):
+        self.server = self._create_server()
+        self.server.listen()
+
+    def accept(self):
+        self.conn, _ = self.server.accept()
+        self.decoder.reset()
+
+    def receive(self, max_messages=MAX_BATCH):
+        while not self.decoder.pending:
+            try:
+                data = self.conn.recv(READ_SIZE)
+            except OSError as e:
+                raise TransportClosed(str(e))
+            if not data:
+                raise TransportClosed("client disconnected")
+            self.decoder.feed(data)
+        return self.decoder.pop(max_messages)
+
+    def disconnect(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def close(self):
+        self.disconnect()
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+
+class UnixSocketTransport(SocketTransport):
+    name = "unix"
+
+    def __init__(self, path=DEFAULT_UNIX_PATH):
+        super().__init__()
+        self.path = path
+
+    def _create_server(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        return server
+
+    def close(self):
+        super().close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class TcpTransport(SocketTransport):
+    name = "tcp"
+
+    def __init__(self, address=DEFAULT_TCP_ADDRESS):
+        super().__init__()
+        self.host, self.port = parse_tcp_address(address)
+
+    def _create_server(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, self.port))
+        return server
+
+
+class FileTransport(Transport):
+    """
+    Read messages from a file or from stdin, NUL- or newline-delimited.
+    """
+    name = "file"
+    reconnectable = False
+
+    def __init__(self, path=None):
+        self.path = path
+        self.stream = None
+        self.decoder = FrameDecoder(delimiters=(DELIMITER, b"\n"))
+        if path is None:
+            self.name = "stdin"
+
+    def accept(self):
+        if self.stream is not None:
+            raise TransportClosed("input already consumed")
+        if self.path is None:
+            self.stream = sys.stdin.buffer
+        else:
+            self.stream = open(self.path, "rb")
+
+    def receive(self, max_messages=MAX_BATCH):
+        while not self.decoder.pending:
+            # read1 returns what is available instead of waiting for READ_SIZE
+            data = self.stream.read1(READ_SIZE)
+            if not data:
+                self.decoder.flush()
+                if self.decoder.pending:
+                    break
+                raise TransportClosed("end of input")
+            self.decoder.feed(data)
+        return self.decoder.pop(max_messages)
+
+    def disconnect(self):
+        if self.stream is not None and self.path is not None:
+            self.stream.close()
+
+
+def parse_tcp_address(address):
+    """
+    "host:port" or "port" -> (host, port). The host defaults to localhost.
+    """
+    host, _, port = str(address).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def default_transport():
+    return "pipe" if os.name == "nt" else "unix"
+
+
+def create_transport(kind=None, address=None):
+    """
+    Create a transport by name ("pipe", "unix", "tcp", "stdin", "file").
+    address is the pipe name, socket path, "host:port" or file path.
+    """
+    kind = kind or default_transport()
+    if kind == "pipe":
+        return Win32PipeTransport(address or DEFAULT_PIPE_NAME)
+    if kind == "unix":
+        return UnixSocketTransport(address or DEFAULT_UNIX_PATH)
+    if kind == "tcp":
+        return TcpTransport(address or DEFAULT_TCP_ADDRESS)
+    if kind == "stdin":
+        return FileTransport(None)
+    if kind == "file":
+        if address is None:
+            raise ValueError("file transport needs a path")
+        return FileTransport(address)
+    raise ValueError(f"Unknown transport: {kind}")
+
+
+# ======= asyncio: many concurrent clients =======
+
+async def serve_streams(kind, address, on_stream, on_ready=None):
+    """
+    Accept clients until cancelled and run on_stream(stream_id, receive)
+    as a separate task for each one. receive() is a coroutine returning
+    the next list of messages; it raises TransportClosed when the client
+    goes away. stdin / file serve exactly one stream and then return.
+    on_ready() is called once clients can connect.
+
+    Stream ids are never reused; receive.peer is where the client connects
+    from (the client host for TCP, else the socket path / pipe name / file),
+    to recognize a sensor that comes back after a disconnect.
+    """
+    kind = kind or default_transport()
+    if kind in ("unix", "tcp"):
+        await _serve_sockets(kind, address, on_stream, on_ready)
+    elif kind == "pipe":
+        await _serve_pipe(address or DEFAULT_PIPE_NAME, on_stream, on_ready)
+    else:
+        transport = create_transport(kind, address)
+        if on_ready is not None:
+            on_ready()
+        transport.accept()
+        await _run_blocking_stream(transport.name, transport, on_stream)
+
+
+async def _serve_sockets(kind, address, on_stream, on_ready=None):
+    counter = itertools.count(1)
+
+    async def client_connected(reader, writer):
+        stream_id = f"{kind}-{next(counter)}"
+        peername = writer.get_extra_info("peername")
+        decoder = FrameDecoder()
+
+        async def receive(max_messages=MAX_BATCH):
+            while not decoder.pending:
+                try:
+                    data = await reader.read(READ_SIZE)
+                except OSError as e:
+                    raise TransportClosed(str(e))
+                if not data:
+                    raise TransportClosed("client disconnected")
+                decoder.feed(data)
+            return decoder.pop(max_messages)
+
+        if kind == "tcp" and peername:
+            receive.peer = peername[0]
+        else:
+            receive.peer = address or (DEFAULT_UNIX_PATH if kind == "unix" else DEFAULT_TCP_ADDRESS)
+        try:
+            await on_stream(stream_id, receive)
+        except asyncio.CancelledError:
+            # The service is shutting down. Nothing awaits this task, and
+            # asyncio's connection callback reports a cancelled one as an
+            # error, so end it normally.
+            pass
+        finally:
+            writer.close()
+
+    if kind == "unix":
+        path = address or DEFAULT_UNIX_PATH
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(client_connected, path=path)
+    else:
+        host, port = parse_tcp_address(address or DEFAULT_TCP_ADDRESS)
+        server = await asyncio.start_server(client_connected, host, port)
+
+    if on_ready is not None:
+        on_ready()
+    async with server:
+        await server.serve_forever()
+
+
+def _blocking_receiver(transport, loop):
+    """
+    Run a blocking transport's receive() on its own thread and return an
+    async receive() fed from it.
+
+    The thread only calls receive() while fewer than RECEIVE_AHEAD batches
+    wait to be taken, so when the stream stops taking them the transport
+    is no longer read and the sender sees the backpressure. receive.close()
+    stops the thread (after the receive() it may be blocked in).
+    """
+    batches = asyncio.Queue()
+    room = threading.Semaphore(RECEIVE_AHEAD)
+    stopped = threading.Event()
+
+    def hand_over(item):
+        try:
+            loop.call_soon_threadsafe(batches.put_nowait, item)
+        except RuntimeError:
+            # the event loop is closed (shutting down): nobody receives
+            return False
+        return True
+
+    def reader():
+        while True:
+            room.acquire()
+            if stopped.is_set():
+                transport.disconnect()
+                return
+            try:
+                batch = transport.receive()
+            except Exception as e:
+                hand_over(e)
+                transport.disconnect()
+                return
+            if stopped.is_set() or not hand_over(batch):
+                transport.disconnect()
+                return
+
+    threading.Thread(target=reader, name=f"{transport.name}-reader", daemon=True).start()
+
+    async def receive(max_messages=MAX_BATCH):
+        batch = await batches.get()
+        room.release()
+        if isinstance(batch, Exception):
+            raise batch if isinstance(batch, TransportClosed) else TransportClosed(str(batch))
+        return batch
+
+    def close():
+        stopped.set()
+        room.release()
+
+    receive.close = close
+    return receive
+
+
+async def _run_blocking_stream(stream_id, transport, on_stream):
+    """
+    on_stream() for a blocking transport; its reader thread stops with it.
+    """
+    receive = _blocking_receiver(transport, asyncio.get_running_loop())
+    receive.peer = getattr(transport, "path", None) or getattr(transport, "pipe_name", None) or transport.name
+    try:
+        await on_stream(stream_id, receive)
+    finally:
+        receive.close()
+
+
+def _in_daemon_thread(loop, fn):
+    """
+    Run a blocking call on a daemon thread (so a pending ConnectNamedPipe
+    never keeps the process alive) and return a future for its result.
+    """
+    future = loop.create_future()
+
+    def run():
+        try:
+            result = fn()
+        except Exception as e:
+            loop.call_soon_threadsafe(_set_future, future, None, e)
+        else:
+            loop.call_soon_threadsafe(_set_future, future, result, None)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def _set_future(future, result, error):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _report_stream_error(task):
+    """
+    Done callback of a pipe stream task: show why it failed (nothing else
+    awaits it).
+    """
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[TRANSPORT] Stream {task.get_name()} failed: {task.exception()!r}")
+
+
+async def _serve_pipe(pipe_name, on_stream, on_ready=None):
+    """
+    One pipe instance per client: a new instance waits for the next client
+    as soon as one connects (PIPE_UNLIMITED_INSTANCES).
+    """
+    loop = asyncio.get_running_loop()
+    counter = itertools.count(1)
+    tasks = set()
+    while True:
+        transport = Win32PipeTransport(pipe_name)
+        if on_ready is not None:
+            # the first instance is created as soon as accept() starts
+            on_ready()
+            on_ready = None
+        await _in_daemon_thread(loop, transport.accept)
+        stream_id = f"pipe-{next(counter)}"
+        task = asyncio.create_task(_run_blocking_stream(stream_id, transport, on_stream), name=stream_id)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        task.add_done_callback(_report_stream_error)
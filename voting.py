@@ -0,0 +1,165 @@
+"""
+Incremental voting over the most recent KNN labels.
+
+VotingEngine keeps the labels of the current window in a ring buffer
+(deque) together with a running count (and confidence weight) per label,
+so adding a reading and dropping the oldest one are O(1). The window can be
+
+    - count based:  the last `window` readings, a vote every `hop` readings
+                    (hop == window is the old 5-readings-then-clear vote,
+                    hop=1 updates the status on every reading)
+    - time based:   the readings of the last `seconds` seconds, whatever
+                    the sensor rate is
+
+Votes can be weighted by the KNN confidence of each reading. With
+`hysteresis`, a new label only replaces the current status when its share
+of the window beats the current status by more than that margin, so the
+status can be updated on every reading without flapping between two
+labels.
+
+Usage:
+    voter = VotingEngine(window=5, hop=1, weighted=True, hysteresis=0.2)
+    vote = voter.add(label, confidence)   # None or (status, counts)
+"""
+import time
+from collections import deque
+
+# ======= Configuration =======
+VOTE_WINDOW = 5  # readings per vote (one reading per second -> 5-second vote)
+
+
+class VotingEngine:
+    """
+    Sliding-window majority vote with O(1) incremental counts.
+    """
+
+    def __init__(self, window=VOTE_WINDOW, hop=None, seconds=None, weighted=False, hysteresis=None):
+        if seconds is None and window < 1:
+            raise ValueError("window must be at least 1 reading")
+        self.window = None if seconds is not None else window
+        self.seconds = seconds
+        self.hop = hop or (1 if seconds is not None else window)
+        self.weighted = weighted
+        self.hysteresis = hysteresis
+
+        self.entries = deque()     # (label, weight, timestamp), oldest first
+        self.counts = {}           # label -> readings in the window
+        self.weights = {}          # label -> sum of weights in the window
+        self.total = 0.0
+        self.since_vote = 0
+        self.current_status = None
+
+    def reset(self):
+        self.entries.clear()
+        self.counts.clear()
+        self.weights.clear()
+        self.total = 0.0
+        self.since_vote = 0
+        self.current_status = None
+
+    def _push(self, label, weight, timestamp):
+        self.entries.append((label, weight, timestamp))
+        self.counts[label] = self.counts.get(label, 0) + 1
+        self.weights[label] = self.weights.get(label, 0.0) + weight
+        self.total += weight
+
+    def _pop(self):
+        label, weight, _ = self.entries.popleft()
+        self.total -= weight
+        if self.counts[label] == 1:
+            # Deleting (not subtracting) keeps float sums from drifting
+            del self.counts[label]
+            del self.weights[label]
+        else:
+            self.counts[label] -= 1
+            self.weights[label] -= weight
+
+    def _evict(self, now):
+        if self.seconds is not None:
+            oldest = now - self.seconds
+            while self.entries and self.entries[0][2] <= oldest:
+                self._pop()
+        else:
+            while len(self.entries) > self.window:
+                self._pop()
+
+    def majority(self):
+        """
+        Label with the highest count (or weight). Ties go to the label
+        that appears first in the window, like Counter.most_common.
+        """
+        scores = self.weights if self.weighted else self.counts
+        if not scores:
+            return None
+        best = max(scores.values())
+        tied = [label for label, score in scores.items() if score == best]
+        if len(tied) == 1:
+            return tied[0]
+        for label, _, _ in self.entries:
+            if label in tied:
+                return label
+
+    def add(self, label, confidence=1.0, timestamp=None):
+        """
+        Add one KNN label. Every hop labels, vote over the window.
+
+        Returns:
+            None, or (status, counts) when a vote happened
+        """
+        now = time.monotonic() if timestamp is None else timestamp
+        self._push(label, float(confidence) if self.weighted else 1.0, now)
+        self._evict(now)
+
+        self.since_vote += 1
+        if self.since_vote < self.hop:
+            return None
+        self.since_vote = 0
+
+        candidate = self.majority()
+        current = self.current_status
+        if self.hysteresis is None or current is None or candidate == current:
+            self.current_status = candidate
+        else:
+            scores = self.weights if self.weighted else self.counts
+            margin = scores[candidate] - scores.get(current, 0.0)
+            if margin > self.hysteresis * self.total:
+                self.current_status = candidate
+        return self.current_status, dict(self.counts)
+
+
+def add_voting_arguments(parser):
+    """
+    Command line options for the voting window (see voting_options).
+    """
+    parser.add_argument("--vote-window", type=int, default=VOTE_WINDOW, help="readings per vote")
+    parser.add_argument(
+        "--vote-hop",
+        type=int,
+        default=None,
+        help="vote every N readings (default: once per window; 1 = every reading)"
+    )
+    parser.add_argument(
+        "--vote-seconds",
+        type=float,
+        default=None,
+        help="vote over the readings of the last N seconds instead of the last --vote-window"
+    )
+    parser.add_argument("--vote-weighted", action="store_true", help="weight votes by KNN confidence")
+    parser.add_argument(
+        "--hysteresis",
+        type=float,
+        default=None,
+        help="share of the window a new status must lead by to replace the current one (e.g. 0.2)"
+    )
+
+
+def voting_options(args):
+    """
+    VotingEngine keyword arguments (besides the window) from parsed options.
+    """
+    return {
+        "hop": args.vote_hop,
+        "seconds": args.vote_seconds,
+        "weighted": args.vote_weighted,
+        "hysteresis": args.hysteresis,
+    }